@@ -0,0 +1,97 @@
+"""配置加载基准测试
+
+比较以下几种加载路径的耗时：
+  - 纯 Python 的 yaml.SafeLoader
+  - libyaml 的 yaml.CSafeLoader（如果可用）
+  - ConfigManager 冷启动（无缓存）与命中解析缓存的启动
+
+用法: python benchmarks/bench_config_load.py [--scripts 1000 5000] [--repeat 3]
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import yaml
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.config_manager import ConfigManager, _yaml  # noqa: E402
+
+
+def make_config(n_scripts):
+    """生成包含 n_scripts 个脚本条目的配置"""
+    categories = [f"分类{i}" for i in range(20)] + ["其他"]
+    scripts = {c: [] for c in categories}
+    for i in range(n_scripts):
+        category = categories[i % len(categories)]
+        scripts[category].append({
+            "name": f"脚本{i}",
+            "path": f"/opt/scripts/{category}/script_{i}.py",
+            "category": category,
+            "env": "Python 3.11",
+            "description": f"第 {i} 个示例脚本，用于基准测试",
+            "tags": ["etl", f"tag{i % 17}"],
+            "arguments": f"--input data_{i}.csv --verbose",
+            "working_dir": "",
+            "script_type": "python",
+        })
+    return {
+        "version": "1.0",
+        "scripts": scripts,
+        "python_environments": [{"name": "Python 3.11", "path": sys.executable, "description": ""}],
+        "settings": {"backup_enabled": False},
+    }
+
+
+def best_of(repeat, func):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run(n_scripts, repeat):
+    with tempfile.TemporaryDirectory() as tmp:
+        config_path = Path(tmp) / "script_manager_config.yaml"
+        _, _, dumper = _yaml()
+        text = yaml.dump(make_config(n_scripts), Dumper=dumper, allow_unicode=True,
+                         sort_keys=False, default_flow_style=False)
+        config_path.write_text(text, encoding="utf-8")
+
+        results = [("yaml.SafeLoader", best_of(repeat, lambda: yaml.load(text, Loader=yaml.SafeLoader)))]
+        if hasattr(yaml, "CSafeLoader"):
+            results.append(("yaml.CSafeLoader", best_of(repeat, lambda: yaml.load(text, Loader=yaml.CSafeLoader))))
+
+        cache_path = config_path.with_name(f".{config_path.name}.cache")
+
+        def cold():
+            if cache_path.exists():
+                cache_path.unlink()
+            ConfigManager(config_path=config_path)
+
+        results.append(("ConfigManager（无缓存）", best_of(repeat, cold)))
+        ConfigManager(config_path=config_path)
+        results.append(("ConfigManager（命中缓存）",
+                        best_of(repeat, lambda: ConfigManager(config_path=config_path))))
+
+    print(f"\n{n_scripts} 个脚本，配置大小 {len(text.encode('utf-8')) / 1024:.0f} KB")
+    baseline = results[0][1]
+    for name, seconds in results:
+        print(f"  {name:<24} {seconds * 1000:9.1f} ms  ({baseline / seconds:5.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="配置加载基准测试")
+    parser.add_argument("--scripts", type=int, nargs="+", default=[1000, 5000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    for n in args.scripts:
+        run(n, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""输出管线基准测试：测量每秒处理/渲染的行数
+
+比较旧实现（逐行 readline + 每行一次 Text.insert/see）与新输出管线
+（分块读取 + 增量解码 + 每帧一次批量 insert）。有图形界面时同时测量渲染到
+Text 控件的吞吐量，否则只测量读取与合并部分。最后测量多个进程同时输出时
+读取线程数和总吞吐量（每管道一个线程 vs 进程监视器），以及 \\r 进度条输出
+原样插入与合并为原地更新的当前行时插入文本框的字符数。
+
+用法: python benchmarks/bench_output.py [--lines 100000] [--procs 50] [--updates 100000]
+"""
+import argparse
+import queue
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.output_pipeline import OutputPump, OutputBuffer, FrameBudget, LineCoalescer  # noqa: E402
+
+CHILD = (
+    "import sys\n"
+    "n = int(sys.argv[1])\n"
+    "w = sys.stdout.write\n"
+    "for i in range(n):\n"
+    "    w(f'line {i}: the quick brown fox jumps over the lazy dog\\n')\n"
+    "    if i % 1000 == 0:\n"
+    "        sys.stderr.write(f'progress {i}\\n')\n"
+)
+
+# 模拟 tqdm：以 \r 开头原地更新进度，每 1000 次更新换一行
+PROGRESS_CHILD = (
+    "import sys\n"
+    "n = int(sys.argv[1])\n"
+    "w = sys.stderr.write\n"
+    "for i in range(n):\n"
+    "    w(f'\\r{i % 1000 / 10:5.1f}%|' + '#' * (i % 1000 // 20) + ' ' * (50 - i % 1000 // 20) + f'| {i}/{n}')\n"
+    "    if i % 1000 == 999:\n"
+    "        w('\\n')\n"
+)
+
+
+def spawn(n_lines, text):
+    kwargs = dict(text=True, errors="replace", bufsize=1) if text else dict(bufsize=0)
+    return subprocess.Popen([sys.executable, "-c", CHILD, str(n_lines)],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, **kwargs)
+
+
+def legacy(n_lines, sink):
+    """旧实现：两个线程逐行读取到队列，消费者逐行处理"""
+    process = spawn(n_lines, text=True)
+    out_q, err_q = queue.Queue(), queue.Queue()
+
+    def reader(pipe, q):
+        for line in iter(pipe.readline, ''):
+            q.put(line)
+        pipe.close()
+
+    threads = [threading.Thread(target=reader, args=(process.stdout, out_q)),
+               threading.Thread(target=reader, args=(process.stderr, err_q))]
+    for t in threads:
+        t.start()
+    start = time.perf_counter()
+    while True:
+        alive = any(t.is_alive() for t in threads)
+        for q, tag in ((out_q, ''), (err_q, 'error')):
+            try:
+                while True:
+                    sink.line(q.get_nowait(), tag)
+            except queue.Empty:
+                pass
+        if not alive and out_q.empty() and err_q.empty():
+            break
+        time.sleep(0.001)
+    process.wait()
+    return time.perf_counter() - start
+
+
+def pipeline(n_lines, sink):
+    """新实现：分块读取，缓冲合并，每帧一次批量插入"""
+    process = spawn(n_lines, text=False)
+    buffer = OutputBuffer()
+    budget = FrameBudget()
+    closed = threading.Event()
+    pump = OutputPump(process)
+    pump.subscribe(buffer.append)
+    pump.on_close(closed.set)
+    start = time.perf_counter()
+    pump.start()
+    while True:
+        budget.begin()
+        spans = buffer.drain(budget.chars)
+        if spans:
+            sink.batch(spans)
+            budget.end(sum(len(t) for _, t in spans))
+        elif closed.is_set():
+            break
+        else:
+            time.sleep(0.001)
+    process.wait()
+    return time.perf_counter() - start
+
+
+def concurrent(n_procs, n_lines, per_pipe_threads):
+    """n_procs 个进程同时输出，返回 (耗时, 读取期间的最大线程数)"""
+    from src import supervisor
+    supported = supervisor.is_supported
+    if per_pipe_threads:
+        # 模拟旧实现：不使用进程监视器，每个管道一个读取线程
+        supervisor.is_supported = lambda: False
+    try:
+        closed = []
+        start = time.perf_counter()
+        processes = []
+        for _ in range(n_procs):
+            process = spawn(n_lines, text=False)
+            pump = OutputPump(process)
+            event = threading.Event()
+            pump.on_close(event.set)
+            pump.start()
+            processes.append(process)
+            closed.append(event)
+        peak = threading.active_count()
+        for event in closed:
+            while not event.wait(0.01):
+                peak = max(peak, threading.active_count())
+        for process in processes:
+            process.wait()
+        return time.perf_counter() - start, peak
+    finally:
+        supervisor.is_supported = supported
+
+
+def progress(n_updates, coalesce, refresh=0.05):
+    """进度条输出：返回 (耗时, 插入文本框的字符数, 插入次数)
+
+    coalesce 为 True 时只插入已换行的内容，当前行最多每 refresh 秒重绘一次。
+    """
+    process = subprocess.Popen([sys.executable, "-c", PROGRESS_CHILD, str(n_updates)],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, bufsize=0)
+    buffer = OutputBuffer()
+    closed = threading.Event()
+    pump = OutputPump(process)
+    pump.subscribe(buffer.append)
+    pump.on_close(closed.set)
+    coalescer = LineCoalescer()
+    chars = inserts = 0
+    drawn, drawn_at = "", 0.0
+    start = time.perf_counter()
+    pump.start()
+    while True:
+        finished = closed.is_set()
+        for _, text in buffer.drain():
+            if coalesce:
+                text = coalescer.feed(text)
+            if text:
+                chars += len(text)
+                inserts += 1
+        now = time.perf_counter()
+        if coalesce and coalescer.line != drawn and (finished or now - drawn_at >= refresh):
+            drawn, drawn_at = coalescer.line, now
+            chars += len(drawn)
+            inserts += 1
+        if finished:
+            break
+        time.sleep(0.001)
+    process.wait()
+    return time.perf_counter() - start, chars, inserts
+
+
+class NullSink:
+    def line(self, text, tag):
+        pass
+
+    def batch(self, spans):
+        pass
+
+
+class TextSink:
+    def __init__(self, root):
+        import tkinter as tk
+        self.tk = tk
+        self.root = root
+        self.text = tk.Text(root)
+        self.text.tag_configure('error', foreground='red')
+        self.text.pack()
+
+    def line(self, text, tag):
+        self.text.insert(self.tk.END, text, tag)
+        self.text.see(self.tk.END)
+        self.root.update_idletasks()
+
+    def batch(self, spans):
+        args = []
+        for stream, text in spans:
+            args.extend((text, 'error' if stream == "stderr" else ''))
+        self.text.insert(self.tk.END, *args)
+        self.text.see(self.tk.END)
+        self.root.update_idletasks()
+
+    def reset(self):
+        self.text.delete('1.0', self.tk.END)
+
+
+def report(label, n_lines, seconds):
+    print(f"  {label:<28} {seconds:7.2f} s  {n_lines / seconds:12,.0f} 行/秒")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="输出管线基准测试")
+    parser.add_argument("--lines", type=int, default=100000)
+    parser.add_argument("--procs", type=int, default=50)
+    parser.add_argument("--updates", type=int, default=100000)
+    args = parser.parse_args()
+    n = args.lines
+
+    print(f"{n} 行输出：读取与合并（不渲染）")
+    report("旧实现（逐行）", n, legacy(n, NullSink()))
+    report("输出管线（分块+批量）", n, pipeline(n, NullSink()))
+
+    per_proc = max(1, n // args.procs)
+    print(f"\n{args.procs} 个进程同时输出，每个 {per_proc} 行")
+    for label, threads in (("每管道一个线程", True), ("进程监视器", False)):
+        seconds, peak = concurrent(args.procs, per_proc, threads)
+        report(label, per_proc * args.procs, seconds)
+        print(f"  {'':<28} 最大线程数 {peak}")
+
+    print(f"\n{args.updates} 次 \\r 进度条更新")
+    for label, coalesce in (("原样插入", False), ("合并为当前行", True)):
+        seconds, chars, inserts = progress(args.updates, coalesce)
+        print(f"  {label:<28} {seconds:7.2f} s  插入 {inserts:8,} 次 {chars:12,} 字符")
+
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except Exception as e:
+        print(f"\n跳过渲染测试（需要图形界面环境）: {e}")
+        return
+    sink = TextSink(root)
+    print(f"\n{n} 行输出：渲染到 Text 控件")
+    report("旧实现（每行 insert+see）", n, legacy(n, sink))
+    sink.reset()
+    report("输出管线（每帧一次 insert）", n, pipeline(n, sink))
+    root.destroy()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""启动耗时基准测试
+
+每次测量都在新的解释器进程中进行（模块缓存不共享）：
+  - 导入耗时：import src.cli（命令行模式）、import src.script_manager（图形界面）
+  - 命令行：python main.py list 的总耗时（含解释器启动，另列出空解释器的耗时作对照）
+  - 首次绘制：创建 ScriptManager 并处理完首批绘制事件的耗时（需要图形界面环境）
+配置文件写入临时 HOME 目录，不影响用户自己的配置。
+
+用法: python benchmarks/bench_startup.py [--runs 10] [--scripts 0 1000 10000]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+sys.path.insert(0, str(ROOT))
+
+from src.config_manager import ConfigManager  # noqa: E402
+
+IMPORT_SNIPPET = (
+    "import sys, time\n"
+    "sys.path.insert(0, {root!r})\n"
+    "start = time.perf_counter()\n"
+    "import {module}\n"
+    "print(time.perf_counter() - start)\n"
+)
+
+PAINT_SNIPPET = (
+    "import sys, time\n"
+    "sys.path.insert(0, {root!r})\n"
+    "start = time.perf_counter()\n"
+    "from src.script_manager import ScriptManager\n"
+    "app = ScriptManager()\n"
+    "app.root.update()\n"
+    "print(time.perf_counter() - start)\n"
+    "app.on_app_close()\n"
+)
+
+
+def make_config(n_scripts, types=("python", "batch", "powershell", "executable")):
+    categories = [f"分类{i}" for i in range(20)] + ["其他"]
+    scripts = {c: [] for c in categories}
+    for i in range(n_scripts):
+        category = categories[i % len(categories)]
+        scripts[category].append({
+            "name": f"脚本{i}",
+            "path": f"/opt/scripts/{category}/script_{i}.py",
+            "env": "py311",
+            "description": f"示例脚本 {i}",
+            "script_type": types[i % len(types)],
+        })
+    return {"version": "1.0", "scripts": scripts,
+            "python_environments": [{"name": "py311", "path": sys.executable}]}
+
+
+def write_config(home, n_scripts):
+    """写入配置并预热解析缓存（与日常启动一致）"""
+    manager = ConfigManager(save_delay=0, config_path=Path(home) / "script_manager_config.yaml")
+    manager.config = make_config(n_scripts)
+    manager.ensure_config_structure()
+    manager.config["settings"]["run_log_path"] = str(Path(home) / "runs")
+    manager.config["settings"]["metrics_path"] = str(Path(home) / "metrics.sqlite")
+    manager.flush()
+    ConfigManager(config_path=manager.config_path)
+
+
+def run_snippet(snippet, home, **fmt):
+    env = dict(os.environ, HOME=home, USERPROFILE=home)
+    result = subprocess.run([sys.executable, "-c", snippet.format(root=str(ROOT), **fmt)],
+                            capture_output=True, text=True, env=env, timeout=120)
+    if result.returncode != 0:
+        return None, result.stderr.strip().splitlines()[-1:] or [""]
+    return [float(v) for v in result.stdout.split()], None
+
+
+def time_command(cmd, home, runs):
+    env = dict(os.environ, HOME=home, USERPROFILE=home)
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env, timeout=120)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def report(label, times):
+    print(f"  {label:<24} 中位数 {statistics.median(times) * 1000:7.1f} ms   "
+          f"最小 {min(times) * 1000:7.1f} ms   最大 {max(times) * 1000:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--scripts", type=int, nargs="+", default=[0, 1000, 10000])
+    args = parser.parse_args()
+
+    for n_scripts in args.scripts:
+        print(f"脚本数: {n_scripts}")
+        with tempfile.TemporaryDirectory() as home:
+            write_config(home, n_scripts)
+            for module in ("src.cli", "src.script_manager"):
+                times, error = [], None
+                for _ in range(args.runs):
+                    values, error = run_snippet(IMPORT_SNIPPET, home, module=module)
+                    if values is None:
+                        break
+                    times.append(values[0])
+                if times:
+                    report(f"import {module}", times)
+                else:
+                    print(f"  import {module:<17} 失败: {error[0]}")
+
+            report("空解释器", time_command([sys.executable, "-c", "pass"], home, args.runs))
+            report("main.py list", time_command([sys.executable, str(ROOT / "main.py"), "list"],
+                                                home, args.runs))
+
+            painted, error = [], None
+            for _ in range(args.runs):
+                values, error = run_snippet(PAINT_SNIPPET, home)
+                if values is None:
+                    break
+                painted.append(values[0])
+            if painted:
+                report("首次绘制", painted)
+            else:
+                # 没有图形界面环境（如 DISPLAY 未设置）时跳过
+                print(f"  首次绘制 不可用: {error[0]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""脚本树刷新基准测试（需要图形界面环境）
+
+比较旧的“删除并重建整棵树”、ScriptTreeSync 增量同步和 VirtualScriptList
+虚拟列表在模拟搜索输入时的耗时，以及虚拟列表滚动一页的耗时。
+
+用法: python benchmarks/bench_tree_refresh.py [--scripts 1000 10000 50000]
+"""
+import argparse
+import sys
+import time
+import tkinter as tk
+from pathlib import Path
+from tkinter import ttk
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.registry import ScriptRegistry  # noqa: E402
+from src.tree_sync import ScriptTreeSync  # noqa: E402
+from src.virtual_list import VirtualScriptList  # noqa: E402
+
+# 模拟逐字输入再逐字删除
+KEYSTROKES = ["1", "12", "123", "12", "1", ""]
+
+
+def make_config(n_scripts, n_categories=20):
+    categories = [f"分类{i}" for i in range(n_categories)]
+    scripts = {c: [] for c in categories}
+    for i in range(n_scripts):
+        category = categories[i % n_categories]
+        scripts[category].append({
+            "name": f"脚本{i}",
+            "path": f"/opt/scripts/script_{i}.py",
+            "description": f"示例脚本 {i}",
+            "env": "py311",
+            "script_type": "python",
+        })
+    return {"scripts": scripts, "settings": {}}
+
+
+def full_rebuild(tree, registry, categories, filter_text):
+    """旧实现：每次删除所有节点并重新插入"""
+    tree.delete(*tree.get_children())
+    for category in categories:
+        sids = registry.ids_in(category, "python")
+        if sids:
+            node = tree.insert("", "end", text=category, open=True)
+            for sid in sids:
+                script = registry.get(sid)
+                if filter_text and filter_text not in script["name"].lower():
+                    continue
+                tree.insert(node, "end", text=script["name"],
+                            values=(script["env"], script["description"]))
+
+
+def incremental(sync, categories, filter_text):
+    if filter_text:
+        sync.set_matcher(lambda sid, script: filter_text in script["name"].lower())
+    else:
+        sync.set_matcher(None)
+    sync.sync(categories)
+
+
+def measure(root, func):
+    start = time.perf_counter()
+    func()
+    root.update_idletasks()
+    return time.perf_counter() - start
+
+
+def run(root, n_scripts):
+    config = make_config(n_scripts)
+    registry = ScriptRegistry(config)
+    categories = list(config["scripts"])
+
+    tree = ttk.Treeview(root, columns=("env", "description"))
+    tree.pack()
+    initial_full = measure(root, lambda: full_rebuild(tree, registry, categories, ""))
+    full = [measure(root, lambda t=t: full_rebuild(tree, registry, categories, t)) for t in KEYSTROKES]
+    tree.destroy()
+
+    tree = ttk.Treeview(root, columns=("env", "description"))
+    tree.pack()
+    sync = ScriptTreeSync(tree, registry, "python",
+                          values_of=lambda s: (s["env"], s["description"]))
+    initial_sync = measure(root, lambda: incremental(sync, categories, ""))
+    inc = [measure(root, lambda t=t: incremental(sync, categories, t)) for t in KEYSTROKES]
+    noop = measure(root, lambda: incremental(sync, categories, ""))
+    tree_items = len(tree.get_children()) + sum(len(tree.get_children(c)) for c in tree.get_children())
+    tree.destroy()
+
+    tree = ttk.Treeview(root, columns=("env", "description"), height=30)
+    scrollbar = ttk.Scrollbar(root, orient="vertical")
+    tree.pack()
+    virtual = VirtualScriptList(tree, registry, "python",
+                                values_of=lambda s: (s["env"], s["description"]),
+                                scrollbar=scrollbar)
+    initial_virtual = measure(root, lambda: incremental(virtual, categories, ""))
+    virt = [measure(root, lambda t=t: incremental(virtual, categories, t)) for t in KEYSTROKES]
+    page = measure(root, lambda: virtual.yview("scroll", 1, "pages"))
+    jump = measure(root, lambda: virtual.yview("moveto", 0.5))
+    virtual_items = len(tree.get_children())
+    virtual.close()
+    tree.destroy()
+    scrollbar.destroy()
+
+    print(f"\n{n_scripts} 个脚本")
+    print(f"  首次填充:   重建 {initial_full * 1000:9.1f} ms   增量 {initial_sync * 1000:9.1f} ms"
+          f"   虚拟 {initial_virtual * 1000:9.1f} ms")
+    for text, a, b, c in zip(KEYSTROKES, full, inc, virt):
+        print(f"  搜索 {text!r:<7} 重建 {a * 1000:9.1f} ms   增量 {b * 1000:9.1f} ms   虚拟 {c * 1000:9.1f} ms")
+    print(f"  无变化刷新: 增量 {noop * 1000:9.1f} ms")
+    print(f"  虚拟列表滚动一页 {page * 1000:.1f} ms，跳到中间 {jump * 1000:.1f} ms")
+    print(f"  树节点数: 增量 {tree_items}   虚拟 {virtual_items}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="脚本树刷新基准测试")
+    parser.add_argument("--scripts", type=int, nargs="+", default=[1000, 10000, 50000])
+    args = parser.parse_args()
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"无法创建窗口（需要图形界面环境）: {e}")
+        return 1
+    root.withdraw()
+    for n in args.scripts:
+        run(root, n)
+    root.destroy()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
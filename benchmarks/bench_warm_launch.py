@@ -0,0 +1,109 @@
+"""脚本启动延迟基准测试：比较冷启动与预热解释器池
+
+对每个解释器分别测量：
+  - 冷启动：每次运行 [python, script]
+  - 预热池：从预热的工作进程 fork 子进程，用 runpy 运行同一脚本
+测试脚本导入若干常用模块后输出一行，测量从启动到进程退出（输出读完）的耗时。
+
+用法: python benchmarks/bench_warm_launch.py [--runs 20] [python路径 ...]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.warm_pool import WarmPool, is_supported  # noqa: E402
+
+SCRIPT = (
+    "import argparse, json, logging, pathlib, subprocess, tempfile\n"
+    "parser = argparse.ArgumentParser()\n"
+    "parser.add_argument('name')\n"
+    "args = parser.parse_args()\n"
+    "print(json.dumps({'hello': args.name}))\n"
+)
+
+
+def cold(python, script, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        process = subprocess.Popen([python, script, "bench"], stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE)
+        process.communicate()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def warm(pool, python, script, runs):
+    # 等待工作进程完成预加载
+    pool.warm(python)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        process = pool.launch(python, script, ["bench"])
+        if process is not None:
+            process.stdout.read()
+            process.wait()
+            break
+        time.sleep(0.05)
+    else:
+        return None
+
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        process = pool.launch(python, script, ["bench"])
+        if process is None:
+            continue
+        output = process.stdout.read()
+        process.stderr.read()
+        process.wait()
+        times.append(time.perf_counter() - start)
+        assert b"bench" in output, output
+    return times
+
+
+def report(label, times):
+    if not times:
+        print(f"  {label:<6} 不可用")
+        return
+    print(f"  {label:<6} 中位数 {statistics.median(times) * 1000:7.1f} ms   "
+          f"最小 {min(times) * 1000:7.1f} ms   最大 {max(times) * 1000:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("pythons", nargs="*", default=[sys.executable])
+    args = parser.parse_args()
+
+    if not is_supported():
+        print("预热池仅支持 POSIX 系统，跳过")
+        return 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        script = os.path.join(tmp, "bench_script.py")
+        with open(script, "w", encoding="utf-8") as f:
+            f.write(SCRIPT)
+        pool = WarmPool(size=1)
+        try:
+            for python in args.pythons:
+                print(python)
+                cold_times = cold(python, script, args.runs)
+                warm_times = warm(pool, python, script, args.runs)
+                report("冷启动", cold_times)
+                report("预热", warm_times)
+                if cold_times and warm_times:
+                    print(f"  加速 {statistics.median(cold_times) / statistics.median(warm_times):.1f}x")
+        finally:
+            pool.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,10 +7,16 @@ src_path = Path(__file__).parent / "src"
 if str(src_path) not in sys.path:
     sys.path.insert(0, str(src_path))
 
-# 使用绝对导入
-from src.script_manager import ScriptManager
+from src.cli import wants_cli
 
 def main():
+    # 带子命令（run/list/history/...）时以命令行模式运行，不导入 Tk
+    if wants_cli(sys.argv[1:]):
+        from src.cli import main as cli_main
+        sys.exit(cli_main())
+
+    # 使用绝对导入
+    from src.script_manager import ScriptManager
     app = ScriptManager()
     app.run()
 
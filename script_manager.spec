@@ -58,13 +58,27 @@ a = Analysis(
     binaries=tkdnd_files,  # Add tkdnd DLL files
     datas=[
         (tkdnd_lib, 'tkinterdnd2/tkdnd'),  # Add tkdnd data files
+        ('src/warm_worker.py', 'src'),  # 预热池工作进程在目标环境中以脚本方式运行
     ],
     hiddenimports=[
         'tkinterdnd2',
         'yaml',
         'src.script_manager',
         'src.config_manager',
+        'src.backup_store',
+        'src.run_log',
+        'src.metrics',
+        'src.env_info',
+        'src.env_discovery',
+        'src.warm_pool',
+        'src.import_profiler',
+        'src.cli',
         'src.dialogs',
+        'src.engine',
+        'src.registry',
+        'src.tree_sync',
+        'src.search_index',
+        'src.output_pipeline',
         'src.utils'
     ],
     hookspath=[],
@@ -1,17 +1,30 @@
 # 空文件，用于标识这是一个Python包
 
-# 导出主要的类和函数，使它们可以通过 src 包直接访问
-from .script_manager import ScriptManager
-from .config_manager import ConfigManager
-from .dialogs import ScriptConfigDialog, OutputWindow, EnvConfigDialog
-from .utils import get_python_info, format_path
+# 导出主要的类和函数，使它们可以通过 src 包直接访问。
+# 按需导入：命令行模式（src.cli）不会因此加载 Tk 及对话框模块。
+import importlib
 
-__all__ = [
-    'ScriptManager',
-    'ConfigManager',
-    'ScriptConfigDialog',
-    'OutputWindow',
-    'EnvConfigDialog',
-    'get_python_info',
-    'format_path'
-]
+_EXPORTS = {
+    'ScriptManager': '.script_manager',
+    'ConfigManager': '.config_manager',
+    'ScriptConfigDialog': '.dialogs',
+    'OutputWindow': '.dialogs',
+    'EnvConfigDialog': '.dialogs',
+    'ExecutionEngine': '.engine',
+    'JobSpec': '.engine',
+    'Job': '.engine',
+    'ScriptRegistry': '.registry',
+    'get_python_info': '.utils',
+    'format_path': '.utils'
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,11 @@
+"""python -m src [命令]：带子命令时进入命令行模式，否则启动图形界面"""
+import sys
+
+from src.cli import main, wants_cli
+
+if wants_cli(sys.argv[1:]):
+    sys.exit(main())
+
+from src.script_manager import ScriptManager
+
+ScriptManager().run()
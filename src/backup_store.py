@@ -0,0 +1,253 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+
+class BackupStore:
+    """按内容寻址的配置备份仓库
+
+    目录结构：
+        index.json                  快照索引（列出快照无需读取任何快照文件）
+        objects/<前两位>/<sha256>.gz  压缩后的快照内容，相同内容只保存一份
+    """
+
+    INDEX_NAME = "index.json"
+
+    # 默认保留策略
+    DEFAULT_RETENTION = {
+        "keep_last": 20,                  # 保留最近 N 个快照
+        "hourly": 24,                     # 另外每小时保留一个，最多 N 小时
+        "daily": 30,                      # 另外每天保留一个，最多 N 天
+        "max_bytes": 50 * 1024 * 1024     # 所有快照文件的总大小上限
+    }
+
+    def __init__(self, root, retention=None):
+        self.root = Path(root)
+        self.objects_dir = self.root / "objects"
+        self.index_path = self.root / self.INDEX_NAME
+        self.retention = dict(self.DEFAULT_RETENTION)
+        if retention:
+            self.retention.update(retention)
+        self._snapshots = None
+
+    # ---- 索引 ----
+
+    def _load_index(self):
+        if self._snapshots is not None:
+            return self._snapshots
+        self._snapshots = []
+        if self.index_path.exists():
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    self._snapshots = json.load(f).get("snapshots", [])
+            except Exception:
+                # 索引损坏时从对象目录重建
+                self._snapshots = self._rebuild_index()
+        return self._snapshots
+
+    def _rebuild_index(self):
+        snapshots = []
+        if self.objects_dir.exists():
+            for path in self.objects_dir.glob("*/*.gz"):
+                stat = path.stat()
+                snapshots.append({
+                    "id": self._make_id(stat.st_mtime, path.stem[:8]),
+                    "hash": path.stem,
+                    "time": stat.st_mtime,
+                    "size": None,
+                    "stored": stat.st_size
+                })
+        snapshots.sort(key=lambda s: s["time"])
+        return snapshots
+
+    def _save_index(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        data = json.dumps({"version": 1, "snapshots": self._snapshots},
+                          ensure_ascii=False, indent=1)
+        fd, tmp_path = tempfile.mkstemp(prefix=".index.", suffix=".tmp", dir=str(self.root))
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self.index_path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    @staticmethod
+    def _make_id(timestamp, digest):
+        return f"{datetime.fromtimestamp(timestamp).strftime('%Y%m%d_%H%M%S')}_{digest[:8]}"
+
+    def _object_path(self, digest):
+        return self.objects_dir / digest[:2] / f"{digest}.gz"
+
+    def _store_object(self, digest, data):
+        obj_path = self._object_path(digest)
+        if not obj_path.exists():
+            obj_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = obj_path.with_suffix(".tmp")
+            with gzip.open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, obj_path)
+        return obj_path
+
+    def _new_snapshot(self, digest, timestamp, size, obj_path, existing):
+        # 同一秒内内容来回切换时，为快照 ID 加序号避免重复；existing 为已用的 ID，新 ID 会加入其中
+        base_id = self._make_id(timestamp, digest)
+        snapshot_id, n = base_id, 1
+        while snapshot_id in existing:
+            n += 1
+            snapshot_id = f"{base_id}_{n}"
+        existing.add(snapshot_id)
+        return {
+            "id": snapshot_id,
+            "hash": digest,
+            "time": timestamp,
+            "size": size,
+            "stored": obj_path.stat().st_size
+        }
+
+    # ---- 公共接口 ----
+
+    def add(self, data, timestamp=None):
+        """添加一个快照（bytes 或 str），返回快照信息
+
+        与最新快照内容相同时不会新增快照，直接返回最新快照。
+        """
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        snapshots = self._load_index()
+        if snapshots and snapshots[-1]["hash"] == digest:
+            return snapshots[-1]
+
+        obj_path = self._store_object(digest, data)
+        timestamp = time.time() if timestamp is None else timestamp
+        existing = {s["id"] for s in snapshots}
+        snapshot = self._new_snapshot(digest, timestamp, len(data), obj_path, existing)
+        snapshots.append(snapshot)
+        self.prune()
+        return snapshot
+
+    def list_snapshots(self):
+        """列出所有快照（从新到旧），只读取索引"""
+        return [dict(s) for s in reversed(self._load_index())]
+
+    def get_snapshot(self, snapshot_id):
+        return next((s for s in self._load_index() if s["id"] == snapshot_id), None)
+
+    def read(self, snapshot_id):
+        """读取快照内容（bytes）"""
+        snapshot = self.get_snapshot(snapshot_id)
+        if snapshot is None:
+            raise KeyError(f"找不到备份快照: {snapshot_id}")
+        with gzip.open(self._object_path(snapshot["hash"]), 'rb') as f:
+            return f.read()
+
+    def restore(self, snapshot_id, target_path):
+        """将快照内容写回 target_path（先写临时文件再重命名）"""
+        data = self.read(snapshot_id)
+        target_path = Path(target_path)
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{target_path.name}.", suffix=".tmp",
+                                        dir=str(target_path.parent))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, target_path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        return data
+
+    def prune(self):
+        """按保留策略清理快照并删除不再被引用的对象，返回删除的快照数"""
+        snapshots = self._load_index()
+        if not snapshots:
+            self._save_index()
+            return 0
+
+        keep = self._select_retained(snapshots)
+        removed = [s for s in snapshots if s["id"] not in keep]
+        self._snapshots = [s for s in snapshots if s["id"] in keep]
+        self._save_index()
+
+        referenced = {s["hash"] for s in self._snapshots}
+        for digest in {s["hash"] for s in removed} - referenced:
+            try:
+                self._object_path(digest).unlink()
+            except OSError:
+                pass
+        return len(removed)
+
+    def _select_retained(self, snapshots):
+        newest_first = list(reversed(snapshots))
+        keep = set()
+
+        keep_last = int(self.retention.get("keep_last") or 0)
+        for s in newest_first[:max(1, keep_last)]:
+            keep.add(s["id"])
+
+        # 按小时/天分桶，每个桶保留最新的一个
+        for key, bucket_of in (
+            ("hourly", lambda t: datetime.fromtimestamp(t).strftime('%Y%m%d%H')),
+            ("daily", lambda t: datetime.fromtimestamp(t).strftime('%Y%m%d')),
+        ):
+            limit = int(self.retention.get(key) or 0)
+            seen = set()
+            for s in newest_first:
+                if len(seen) >= limit:
+                    break
+                bucket = bucket_of(s["time"])
+                if bucket not in seen:
+                    seen.add(bucket)
+                    keep.add(s["id"])
+
+        # 总大小上限：从最旧的开始丢弃（最新的快照始终保留）
+        max_bytes = self.retention.get("max_bytes")
+        if max_bytes:
+            kept = [s for s in newest_first if s["id"] in keep]
+            sizes = {}
+            for s in kept:
+                sizes.setdefault(s["hash"], s.get("stored") or 0)
+            total = sum(sizes.values())
+            while total > max_bytes and len(kept) > 1:
+                dropped = kept.pop()
+                keep.discard(dropped["id"])
+                if all(s["hash"] != dropped["hash"] for s in kept):
+                    total -= sizes.pop(dropped["hash"], 0)
+        return keep
+
+    def migrate_legacy(self, pattern="config_backup_*.yaml", remove=True):
+        """把旧版逐次复制的备份文件导入仓库（相同内容只保存一份），返回导入数量"""
+        legacy = sorted(self.root.glob(pattern), key=lambda p: p.stat().st_mtime)
+        if not legacy:
+            return 0
+        snapshots = self._load_index()
+        existing = {s["id"] for s in snapshots}
+        for path in legacy:
+            data = path.read_bytes()
+            digest = hashlib.sha256(data).hexdigest()
+            if snapshots and snapshots[-1]["hash"] == digest:
+                continue
+            obj_path = self._store_object(digest, data)
+            snapshots.append(self._new_snapshot(digest, path.stat().st_mtime,
+                                                len(data), obj_path, existing))
+        snapshots.sort(key=lambda s: s["time"])
+        self.prune()
+        if remove:
+            for path in legacy:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+        return len(legacy)
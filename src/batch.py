@@ -0,0 +1,301 @@
+import itertools
+import threading
+import time
+
+from src.engine import JobSpec
+from src.output_pipeline import LineCoalescer, OutputBuffer
+
+# 运行方式
+SEQUENCE = "sequence"   # 按顺序逐个运行
+PARALLEL = "parallel"   # 同时运行，受并发数限制
+DAG = "dag"             # 按脚本条目中的 after 依赖运行，受并发数限制
+MODES = (SEQUENCE, PARALLEL, DAG)
+
+# 脚本节点状态
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+SKIPPED = "skipped"
+CANCELLED = "cancelled"
+
+# 合并输出中批量运行自身状态行使用的流名
+STATUS_STREAM = "batch"
+
+_batch_ids = itertools.count(1)
+
+
+def script_dependencies(script):
+    """脚本条目中声明的前置脚本名称（after 字段，可为字符串或列表）"""
+    after = script.get("after") or []
+    if isinstance(after, str):
+        after = [name.strip() for name in after.split(",")]
+    return [str(name) for name in after if str(name).strip()]
+
+
+class BatchNode:
+    """批量运行中的一个脚本"""
+
+    def __init__(self, index, script):
+        self.index = index
+        self.script = script
+        self.name = script.get("name", "")
+        self.deps = set()          # 前置节点序号
+        self.dependents = set()    # 依赖本节点的节点序号
+        self.status = PENDING
+        self.job = None
+        self.reason = ""           # 跳过或失败的原因
+
+    @property
+    def returncode(self):
+        return self.job.returncode if self.job is not None else None
+
+
+class BatchRun:
+    """批量运行一组脚本：按顺序、并行或按依赖关系（DAG）
+
+    - sequence：每个脚本依赖前一个，前一个失败时其余脚本被跳过
+    - parallel：没有依赖，同时运行最多 max_parallel 个
+    - dag：依赖取自脚本条目的 after 字段（同一批中的脚本名称，
+      不在本批中的名称被忽略），前置脚本全部成功后才运行
+
+    continue_on_failure 为 True 时依赖只决定先后顺序，前置脚本失败不跳过后续脚本。
+    任务通过 ExecutionEngine 提交；各脚本的输出按行加上 [名称] 前缀，
+    合并写入 self.output（OutputBuffer），状态行的流名为 "batch"。
+    """
+
+    def __init__(self, engine, scripts, mode=SEQUENCE, max_parallel=4, continue_on_failure=False):
+        if mode not in MODES:
+            raise ValueError(f"不支持的运行方式: {mode}")
+        self.id = next(_batch_ids)
+        self.engine = engine
+        self.mode = mode
+        self.max_parallel = max(1, int(max_parallel or 1))
+        self.continue_on_failure = continue_on_failure
+        self.nodes = [BatchNode(i, dict(script)) for i, script in enumerate(scripts)]
+        self.output = OutputBuffer()
+        self.started_at = None
+        self.finished_at = None
+        self._jobs = {}            # 任务 ID -> 节点
+        self._lines = {}           # 节点序号 -> 尚未换行的输出 {流: LineCoalescer}
+        self._lock = threading.RLock()
+        self._done = threading.Event()
+        self._done_listeners = []
+        self._cancelled = False
+        self._link()
+
+    # ---- 依赖 ----
+
+    def _link(self):
+        if self.mode == SEQUENCE:
+            for node in self.nodes[1:]:
+                node.deps.add(node.index - 1)
+        elif self.mode == DAG:
+            by_name = {}
+            for node in self.nodes:
+                by_name.setdefault(node.name, []).append(node.index)
+            for node in self.nodes:
+                for name in script_dependencies(node.script):
+                    node.deps.update(i for i in by_name.get(name, ()) if i != node.index)
+        for node in self.nodes:
+            for dep in node.deps:
+                self.nodes[dep].dependents.add(node.index)
+        self._check_cycles()
+
+    def _check_cycles(self):
+        """依赖中存在环时抛出 ValueError"""
+        indegree = {node.index: len(node.deps) for node in self.nodes}
+        ready = [i for i, n in indegree.items() if n == 0]
+        seen = 0
+        while ready:
+            i = ready.pop()
+            seen += 1
+            for j in self.nodes[i].dependents:
+                indegree[j] -= 1
+                if indegree[j] == 0:
+                    ready.append(j)
+        if seen != len(self.nodes):
+            names = ", ".join(self.nodes[i].name for i, n in indegree.items() if n > 0)
+            raise ValueError(f"脚本依赖存在循环: {names}")
+
+    # ---- 运行 ----
+
+    def start(self):
+        """开始运行，立即返回"""
+        self.started_at = time.time()
+        self.engine.subscribe(self._on_job_event)
+        self._status(f"=== 批量运行 {len(self.nodes)} 个脚本（{self.mode}，并发 {self.max_parallel}）===\n")
+        self._schedule()
+        return self
+
+    def _ready(self, node):
+        deps = [self.nodes[i] for i in node.deps]
+        if self.continue_on_failure:
+            return all(dep.status not in (PENDING, RUNNING) for dep in deps)
+        return all(dep.status == SUCCEEDED for dep in deps)
+
+    def _schedule(self):
+        """提交依赖已满足的脚本，直到达到并发上限；全部结束时标记完成"""
+        with self._lock:
+            running = sum(1 for node in self.nodes if node.status == RUNNING)
+            for node in self.nodes:
+                if running >= self.max_parallel or self._cancelled:
+                    break
+                if node.status == PENDING and self._ready(node) and self._submit(node):
+                    running += 1
+            finished = all(node.status not in (PENDING, RUNNING) for node in self.nodes)
+        if finished:
+            self._finish()
+
+    def _submit(self, node):
+        """提交一个脚本，返回是否提交成功"""
+        script = node.script
+        node.status = RUNNING
+        self._status(f"=== [{node.name}] 开始 ===\n")
+        try:
+            job = self.engine.submit(JobSpec(
+                script,
+                arguments=script.get("arguments", ""),
+                working_dir=script.get("working_dir", ""),
+                show_output=True,
+                batch_id=self.id,
+                output_listeners=[lambda job, stream, text, n=node: self._on_output(n, stream, text)]
+            ))
+            if job.status == job.FAILED:
+                # 提交时即失败（如超时设置无效），事件在记录映射之前已发出
+                raise job.error
+        except Exception as e:
+            node.status = FAILED
+            node.reason = str(e)
+            self._status(f"=== [{node.name}] 无法启动: {e} ===\n")
+            self._skip_dependents(node)
+            return False
+        # 调用方持有锁，任务事件在记录映射之后才会被处理
+        node.job = job
+        self._jobs[job.id] = node
+        return True
+
+    def _on_job_event(self, event, job):
+        if event == "started":
+            return
+        with self._lock:
+            node = self._jobs.get(job.id)
+            if node is None:
+                return
+            self._flush(node)
+            if event == "cancelled":
+                node.status = CANCELLED
+                self._status(f"=== [{node.name}] 已取消 ===\n")
+            elif event == "failed" or job.returncode != 0:
+                node.status = FAILED
+                node.reason = str(job.error) if job.error is not None else f"退出码 {job.returncode}"
+                self._status(f"=== [{node.name}] 失败: {node.reason}{self._elapsed(job)} ===\n")
+            else:
+                node.status = SUCCEEDED
+                self._status(f"=== [{node.name}] 完成{self._elapsed(job)} ===\n")
+            if node.status != SUCCEEDED:
+                self._skip_dependents(node)
+        self._schedule()
+
+    def _skip_dependents(self, node):
+        """前置脚本未成功时跳过（传递地）依赖它的脚本"""
+        if self.continue_on_failure:
+            return
+        stack = list(node.dependents)
+        while stack:
+            dependent = self.nodes[stack.pop()]
+            if dependent.status != PENDING:
+                continue
+            dependent.status = SKIPPED
+            dependent.reason = f"前置脚本 {node.name} 未成功"
+            self._status(f"=== [{dependent.name}] 跳过: {dependent.reason} ===\n")
+            stack.extend(dependent.dependents)
+
+    @staticmethod
+    def _elapsed(job):
+        return f"（{job.duration:.1f}s）" if job.duration is not None else ""
+
+    def _finish(self):
+        with self._lock:
+            if self._done.is_set():
+                return
+            self.finished_at = time.time()
+            self.engine.unsubscribe(self._on_job_event)
+            self._status(f"=== {self.summary()} ===\n")
+            self._done.set()
+        for callback in list(self._done_listeners):
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def terminate(self):
+        """取消尚未开始的脚本并结束正在运行的脚本（连同其子进程）"""
+        with self._lock:
+            self._cancelled = True
+            nodes = list(self.nodes)
+        for node in nodes:
+            if node.status == PENDING:
+                node.status = CANCELLED
+                self._status(f"=== [{node.name}] 已取消 ===\n")
+            elif node.job is not None and not node.job.done():
+                self.engine.terminate(node.job)
+        self._schedule()
+
+    # ---- 输出 ----
+
+    def _status(self, text):
+        self.output.append(STATUS_STREAM, text)
+
+    def _on_output(self, node, stream, text):
+        """按行加前缀后写入合并输出；未换行的部分留到下一块或脚本结束时
+
+        \\r 进度条等原地更新在各脚本自己的当前行中合并，只有最终状态进入合并输出。
+        """
+        with self._lock:
+            lines = self._lines.setdefault(node.index, {})
+            coalescer = lines.get(stream)
+            if coalescer is None:
+                coalescer = lines[stream] = LineCoalescer()
+            text = coalescer.feed(text)
+            if text:
+                prefix = f"[{node.name}] "
+                self.output.append(stream, "".join(prefix + line for line in text.splitlines(True)))
+
+    def _flush(self, node):
+        for stream, coalescer in self._lines.pop(node.index, {}).items():
+            text = coalescer.flush()
+            if text:
+                self.output.append(stream, f"[{node.name}] {text}\n")
+
+    # ---- 状态 ----
+
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def on_done(self, callback):
+        """全部脚本结束后调用 callback()（在引擎工作线程中）"""
+        self._done_listeners.append(callback)
+
+    @property
+    def succeeded(self):
+        return all(node.status == SUCCEEDED for node in self.nodes)
+
+    def counts(self):
+        result = {}
+        for node in self.nodes:
+            result[node.status] = result.get(node.status, 0) + 1
+        return result
+
+    def summary(self):
+        counts = self.counts()
+        parts = [f"{label} {counts[status]}" for status, label in (
+            (SUCCEEDED, "成功"), (FAILED, "失败"), (SKIPPED, "跳过"), (CANCELLED, "取消"))
+            if counts.get(status)]
+        elapsed = ""
+        if self.started_at is not None:
+            elapsed = f"，耗时 {(self.finished_at or time.time()) - self.started_at:.1f}s"
+        return f"批量运行结束: {'，'.join(parts) or '没有脚本'}{elapsed}"
@@ -0,0 +1,351 @@
+"""命令行入口：不导入 Tk，直接按配置运行脚本
+
+    script_manager run <名称> [--category 分类] [--args 参数] [--cwd 目录] [--timeout 秒]
+    script_manager batch [名称 ...] [--category 分类 ...] [--mode sequence|parallel|dag] [-j N]
+    script_manager list [--category 分类] [--type 类型] [--json]
+    script_manager history [名称] [--limit N]
+    script_manager stats [名称]
+    script_manager log [名称] [--run ID]
+
+只加载配置、注册表和运行器；运行日志和运行统计与 GUI 共用同一份存储。
+较重的模块在各子命令中按需导入，以保证启动速度。
+"""
+import argparse
+import os
+import sys
+
+COMMANDS = ("run", "batch", "list", "history", "stats", "log")
+
+SCRIPT_TYPES = ("python", "batch", "executable", "powershell")
+
+
+def wants_cli(argv):
+    """命令行参数是否指定了子命令（main.py 据此决定是否启动图形界面）"""
+    args = list(argv)
+    while args[:1] == ["--config"]:
+        args = args[2:]
+    return bool(args) and (args[0] in COMMANDS or args[0] in ("-h", "--help"))
+
+
+def _load_config(args):
+    from src.config_manager import ConfigManager
+    return ConfigManager(config_path=args.config).config
+
+
+def _find_script(config, name, category=None, script_type=None):
+    """按名称查找脚本，返回 (脚本条目, 分类)；找不到或有歧义时抛出 LookupError"""
+    from src.registry import ScriptRegistry
+    registry = ScriptRegistry(config)
+    sids = registry.find_by_name(name, script_type)
+    if category is not None:
+        sids = [sid for sid in sids if registry.category_of(sid) == category]
+    if not sids:
+        raise LookupError(f"找不到脚本: {name}")
+    if len(sids) > 1:
+        places = ", ".join(f"{registry.category_of(sid)}/{registry.get(sid).get('script_type', 'python')}"
+                           for sid in sids)
+        raise LookupError(f"脚本名称不唯一（{places}），请用 --category 或 --type 指定")
+    return registry.get(sids[0]), registry.category_of(sids[0])
+
+
+def _format_time(timestamp):
+    import time
+    if timestamp is None:
+        return "-"
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
+
+
+def cmd_list(args):
+    config = _load_config(args)
+    rows = []
+    for category, scripts in config.get("scripts", {}).items():
+        if args.category is not None and category != args.category:
+            continue
+        for script in scripts:
+            script_type = script.get("script_type", "python")
+            if args.type is not None and script_type != args.type:
+                continue
+            rows.append({"name": script.get("name", ""), "category": category,
+                         "script_type": script_type, "path": script.get("path", "")})
+    if args.json:
+        import json
+        json.dump(rows, sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write("\n")
+        return 0
+    for row in rows:
+        print(f"{row['category']:<12} {row['script_type']:<10} {row['name']:<24} {row['path']}")
+    return 0
+
+
+def cmd_run(args):
+    config = _load_config(args)
+    try:
+        script, category = _find_script(config, args.name, args.category, args.type)
+    except LookupError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    from src.engine import ExecutionEngine, JobSpec
+    from src.metrics import open_metrics
+    from src.process_tree import interrupt
+    from src.run_log import open_run_log
+
+    settings = config.get("settings", {})
+    script = dict(script, category=category)
+    run_log = open_run_log(settings)
+    metrics = open_metrics(settings)
+    engine = ExecutionEngine(config, max_workers=1, run_log=run_log, metrics=metrics)
+
+    # 默认使用脚本保存的参数和工作目录（与 GUI 一致）
+    arguments = args.args if args.args is not None else script.get("arguments", "")
+    working_dir = args.cwd or script.get("working_dir", "")
+    job = engine.submit(JobSpec(script, arguments=arguments, working_dir=working_dir,
+                                env=args.env, show_output=True, timeout=args.timeout))
+    try:
+        _forward_output(job)
+        job.wait()
+    except KeyboardInterrupt:
+        # 脚本在自己的进程组中，终端的 Ctrl+C 不会送达：转交给整个进程组，
+        # 宽限期内未退出时结束进程树
+        if job.process is not None and job.returncode is None:
+            interrupt(job.process)
+            if not job.wait(engine.grace_period):
+                engine.terminate(job)
+        job.wait(engine.grace_period + 5)
+    finally:
+        engine.shutdown()
+        for store in (run_log, metrics):
+            if store is not None:
+                store.close()
+
+    if job.status == job.FAILED:
+        print(f"运行失败: {job.error}", file=sys.stderr)
+        return 1
+    if job.timed_out:
+        # 与 coreutils timeout 一致
+        print(job.error, file=sys.stderr)
+        return 124
+    if job.returncode is None:
+        return 1
+    # 被信号终止时按 shell 的惯例返回 128 + 信号值
+    return job.returncode if job.returncode >= 0 else 128 - job.returncode
+
+
+def cmd_batch(args):
+    config = _load_config(args)
+    scripts = []
+    try:
+        for name in args.names:
+            script, category = _find_script(config, name, None, args.type)
+            scripts.append(dict(script, category=category))
+    except LookupError as e:
+        print(e, file=sys.stderr)
+        return 2
+    # 按分类选择时按配置中的顺序加入该分类的全部脚本
+    for category in args.category or ():
+        if category not in config.get("scripts", {}):
+            print(f"找不到分类: {category}", file=sys.stderr)
+            return 2
+        for script in config["scripts"][category]:
+            if args.type is None or script.get("script_type", "python") == args.type:
+                scripts.append(dict(script, category=category))
+    if not scripts:
+        print("没有要运行的脚本", file=sys.stderr)
+        return 2
+
+    from src.batch import BatchRun
+    from src.engine import ExecutionEngine
+    from src.metrics import open_metrics
+    from src.run_log import open_run_log
+
+    settings = config.get("settings", {})
+    max_parallel = args.jobs or settings.get("batch_max_parallel", 4)
+    run_log = open_run_log(settings)
+    metrics = open_metrics(settings)
+    engine = ExecutionEngine(config, max_workers=max_parallel, run_log=run_log, metrics=metrics)
+    try:
+        batch = BatchRun(engine, scripts, mode=args.mode, max_parallel=max_parallel,
+                         continue_on_failure=args.continue_on_failure)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    try:
+        batch.start()
+        _forward_buffer(batch)
+    except KeyboardInterrupt:
+        batch.terminate()
+        batch.wait(engine.grace_period + 5)
+        _forward_buffer(batch)
+    finally:
+        engine.shutdown()
+        for store in (run_log, metrics):
+            if store is not None:
+                store.close()
+    return 0 if batch.succeeded else 1
+
+
+def _forward_buffer(source):
+    """把 source.output（OutputBuffer）中的文本转写到 stdout/stderr，直到 source 结束"""
+    streams = {"stderr": sys.stderr}
+    while True:
+        finished = source.done()
+        for stream, text in source.output.drain():
+            target = streams.get(stream, sys.stdout)
+            target.write(text)
+            target.flush()
+        if finished:
+            return
+        source.wait(0.05)
+
+
+def _forward_output(job):
+    """把任务输出（解码后的文本）转写到本进程的 stdout/stderr"""
+    while not job.wait(0.05) and job.output is None:
+        pass
+    if job.output is None:
+        return
+    streams = {"stdout": sys.stdout, "stderr": sys.stderr}
+    while True:
+        finished = job.done()
+        for stream, text in job.output.drain():
+            target = streams.get(stream, sys.stdout)
+            target.write(text)
+            target.flush()
+        if finished:
+            return
+        job.wait(0.05)
+
+
+def cmd_history(args):
+    from src.metrics import open_metrics
+    config = _load_config(args)
+    metrics = open_metrics(config.get("settings", {}))
+    if metrics is None:
+        print("运行统计未启用", file=sys.stderr)
+        return 1
+    try:
+        samples = metrics.samples(script=args.name, limit=args.limit)
+    finally:
+        metrics.close()
+    for s in samples:
+        wall = f"{s['wall']:.3f}s" if s["wall"] is not None else "-"
+        rss = f"{s['max_rss_kb'] / 1024.0:.1f}MB" if s["max_rss_kb"] is not None else "-"
+        print(f"{_format_time(s['started_at'])}  {s['script']:<24} exit={s['exit_code']!s:<4} "
+              f"{wall:>10} {rss:>10}{'  warm' if s['warm'] else ''}")
+    return 0
+
+
+def cmd_stats(args):
+    from src.metrics import format_stats, open_metrics
+    config = _load_config(args)
+    metrics = open_metrics(config.get("settings", {}))
+    if metrics is None:
+        print("运行统计未启用", file=sys.stderr)
+        return 1
+    try:
+        print(format_stats(metrics.stats(script=args.name, window=args.window)))
+    finally:
+        metrics.close()
+    return 0
+
+
+def cmd_log(args):
+    from src.run_log import open_run_log
+    config = _load_config(args)
+    run_log = open_run_log(config.get("settings", {}))
+    if run_log is None:
+        print("运行日志未启用", file=sys.stderr)
+        return 1
+    try:
+        if args.run is not None:
+            run = run_log.get_run(args.run)
+            if run is None:
+                print(f"找不到运行记录: {args.run}", file=sys.stderr)
+                return 1
+            out = sys.stdout.buffer if hasattr(sys.stdout, "buffer") else None
+            data = run_log.read_output(run)
+            if out is not None:
+                sys.stdout.flush()
+                out.write(data)
+                out.flush()
+            else:
+                sys.stdout.write(data.decode("utf-8", errors="replace"))
+            return 0
+        if args.grep:
+            runs = run_log.search(args.grep, script=args.name, limit=args.limit)
+        else:
+            runs = run_log.find_runs(script=args.name, limit=args.limit)
+        for run in runs:
+            print(f"#{run['id']:<6} {_format_time(run['started_at'])}  {run['script']:<24} "
+                  f"exit={run['exit_code']!s:<4} {run['arguments'] or ''}")
+        return 0
+    finally:
+        run_log.close()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="script_manager", description="脚本管理器命令行")
+    parser.add_argument("--config", help="配置文件路径（默认 ~/script_manager_config.yaml）")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("run", help="运行脚本，退出码与脚本一致")
+    p.add_argument("name", help="脚本名称")
+    p.add_argument("--category", help="分类（名称重复时使用）")
+    p.add_argument("--type", choices=SCRIPT_TYPES, help="脚本类型（名称重复时使用）")
+    p.add_argument("--args", help="运行参数（默认使用脚本保存的参数）")
+    p.add_argument("--cwd", help="工作目录（默认使用脚本保存的目录或脚本所在目录）")
+    p.add_argument("--env", help="Python 环境名称（覆盖脚本配置）")
+    p.add_argument("--timeout", type=float,
+                   help="运行时间上限（秒），超时后结束脚本及其子进程（默认使用脚本的 timeout 字段）")
+    p.set_defaults(func=cmd_run)
+
+    p = sub.add_parser("batch", help="批量运行多个脚本或整个分类，全部成功时退出码为 0")
+    p.add_argument("names", nargs="*", metavar="name", help="脚本名称")
+    p.add_argument("--category", action="append", help="运行该分类下的全部脚本（可重复）")
+    p.add_argument("--type", choices=SCRIPT_TYPES, help="只运行该类型的脚本")
+    p.add_argument("--mode", choices=("sequence", "parallel", "dag"), default="sequence",
+                   help="依次运行、并行运行或按脚本的 after 依赖运行（默认 sequence）")
+    p.add_argument("-j", "--jobs", type=int, help="最大并发数（默认 batch_max_parallel 设置）")
+    p.add_argument("--continue-on-failure", action="store_true", help="前置脚本失败时仍运行后续脚本")
+    p.set_defaults(func=cmd_batch)
+
+    p = sub.add_parser("list", help="列出脚本")
+    p.add_argument("--category")
+    p.add_argument("--type", choices=SCRIPT_TYPES)
+    p.add_argument("--json", action="store_true", help="以 JSON 输出")
+    p.set_defaults(func=cmd_list)
+
+    p = sub.add_parser("history", help="最近的运行记录（耗时、退出码、内存）")
+    p.add_argument("name", nargs="?")
+    p.add_argument("--limit", type=int, default=20)
+    p.set_defaults(func=cmd_history)
+
+    p = sub.add_parser("stats", help="按脚本汇总运行统计")
+    p.add_argument("name", nargs="?")
+    p.add_argument("--window", type=int, help="每个脚本最多统计的最近运行次数")
+    p.set_defaults(func=cmd_stats)
+
+    p = sub.add_parser("log", help="查询运行日志或输出某次运行的完整输出")
+    p.add_argument("name", nargs="?")
+    p.add_argument("--run", type=int, help="输出指定运行记录的完整输出")
+    p.add_argument("--grep", help="按输出内容搜索")
+    p.add_argument("--limit", type=int, default=20)
+    p.set_defaults(func=cmd_log)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if getattr(args, "cwd", None):
+        args.cwd = os.path.abspath(args.cwd)
+    try:
+        return args.func(args)
+    except KeyboardInterrupt:
+        return 130
+    except BrokenPipeError:
+        # 输出被管道截断（如 | head）
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
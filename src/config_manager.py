@@ -1,14 +1,53 @@
+import atexit
 import copy
-import yaml
+import hashlib
+import os
+import pickle
+import stat
+import sys
+import tempfile
+import threading
 from pathlib import Path
-from datetime import datetime
-import shutil
-from tkinter import messagebox
+
+from src.backup_store import BackupStore
+
+def _yaml():
+    """按需导入 yaml（配置缓存命中时启动过程不需要它），返回 (yaml, Loader, Dumper)
+
+    优先使用 libyaml 提供的 C 加速加载/输出器。
+    """
+    import yaml
+    return (yaml, getattr(yaml, "CSafeLoader", yaml.SafeLoader),
+            getattr(yaml, "CSafeDumper", yaml.SafeDumper))
+
+
+CACHE_VERSION = 1
+
+# 进程的 umask（只能通过设置来读取，导入时读取一次，避免在保存线程中临时修改）
+_UMASK = os.umask(0)
+os.umask(_UMASK)
 
 class ConfigManager:
-    def __init__(self):
+    def __init__(self, save_delay=1.0, config_path=None, on_error=None):
         # 配置文件路径
-        self.config_path = Path.home() / "script_manager_config.yaml"
+        self.config_path = Path(config_path) if config_path else Path.home() / "script_manager_config.yaml"
+        # 解析结果缓存：配置文件未变化时跳过 YAML 解析
+        self.cache_path = self.config_path.with_name(f".{self.config_path.name}.cache")
+
+        # 延迟写入：save_config 只标记为脏，在 save_delay 秒后合并写入一次
+        self.save_delay = save_delay
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._pending = None
+        self._last_saved_text = None
+        self._backup_store = None
+        # 可选的调度器（如 Tk 的 after/after_cancel），使写入在指定线程中执行
+        self._schedule = None
+        self._cancel = None
+        # 错误提示回调 on_error(标题, 内容)；GUI 传入 messagebox.showerror，
+        # 命令行下默认输出到 stderr，本模块不依赖 Tk
+        self.on_error = on_error or self._print_error
+        atexit.register(self.flush)
         
         # 默认配置
         self.default_config = {
@@ -22,9 +61,43 @@ class ConfigManager:
                 "default_environment": "",
                 "backup_enabled": True,
                 "backup_path": str(Path.home() / "script_manager_backups"),
+                # 备份保留策略：最近 N 个 + 每小时/每天各一个，并限制总大小
+                "backup_retention": copy.deepcopy(BackupStore.DEFAULT_RETENTION),
+                "config_cache": True,  # 缓存解析后的配置以加快启动
                 "window_size": "1000x600",
                 "last_directory": str(Path.home()),
-                "category_order": []  # 添加分类顺序配置
+                "category_order": [],  # 添加分类顺序配置
+                "max_concurrent_jobs": 4,  # 同时运行的脚本数量上限
+                "batch_max_parallel": 4,  # 批量运行时同时运行的脚本数量上限
+                # 脚本的运行时间上限（秒，null 表示不限制；脚本条目的 timeout 字段优先）
+                "default_timeout": None,
+                # 结束脚本时先发送 SIGTERM，宽限期（秒）后仍未退出的进程被强制结束
+                "kill_grace_period": 5,
+                # 退出时的处理：keep 保留运行中的脚本，attached 结束捕获输出的脚本，all 结束全部
+                "exit_policy": "attached",
+                "scrollback_lines": 10000,  # 输出窗口保留的行数，更早的输出保存在磁盘日志中
+                # 某一类型的脚本数达到该值时脚本列表只创建可见的行（null 表示不使用）
+                "virtual_list_threshold": 5000,
+                # 运行日志：每次运行的输出压缩保存，可按脚本/时间/内容查询
+                "run_log_enabled": True,
+                "run_log_path": str(Path.home() / "script_manager_runs"),
+                "run_log_max_bytes": 200 * 1024 * 1024,
+                # 运行统计：每次运行的耗时、CPU 时间、峰值内存和退出码
+                "metrics_enabled": True,
+                "metrics_path": str(Path.home() / "script_manager_metrics.sqlite"),
+                "metrics_retention_days": 90,  # 运行统计的保留天数（null 表示不清理）
+                # 环境扫描：额外的虚拟环境目录和单个解释器的探测超时（秒）
+                "env_search_paths": [],
+                "env_probe_timeout": 10,
+                # 预热解释器池（仅 POSIX）：每个环境保留若干预先导入常用模块的工作进程
+                "warm_pool_enabled": False,
+                "warm_pool_size": 2,
+                "warm_pool_preload": [],
+                # 资源配置：命名配置（nice、ionice、cpu_affinity、max_memory_mb、max_cpu_seconds、cgroup），
+                # 按分类指定配置，以及委派给当前用户的 cgroup v2 子树（脚本条目的 resources 字段优先）
+                "resource_profiles": {},
+                "category_resources": {},
+                "cgroup_root": ""
             }
         }
         
@@ -33,28 +106,40 @@ class ConfigManager:
     
     def load_config(self):
         """加载配置文件"""
+        loaded = None
         if not self.config_path.exists():
             # 创建默认配置文件
             self.config = copy.deepcopy(self.default_config)
         else:
             try:
                 with open(self.config_path, 'r', encoding='utf-8') as f:
-                    self.config = yaml.safe_load(f) or {}  # 确保返回字典而不是None
-                    
-                    # 检查并更新配置版本
-                    if "version" not in self.config:
-                        self.config["version"] = "1.0"
-                        self.migrate_config()
-                    
-                    # 确保所有必要的字段都存在
-                    self.ensure_config_structure()
+                    text = f.read()
+                self._last_saved_text = text
+                self.config = self._load_cached(text)
+                if self.config is None:
+                    yaml, loader, _ = _yaml()
+                    self.config = yaml.load(text, Loader=loader) or {}  # 确保返回字典而不是None
+                    self._write_cache(text, self.config)
+                loaded = pickle.dumps(self.config, pickle.HIGHEST_PROTOCOL)
+                
+                # 检查并更新配置版本
+                if "version" not in self.config:
+                    self.config["version"] = "1.0"
+                    self.migrate_config()
+                
+                # 确保所有必要的字段都存在
+                self.ensure_config_structure()
             except Exception as e:
-                messagebox.showerror("错误", f"加载配置文件失败: {str(e)}")
+                self.on_error("错误", f"加载配置文件失败: {str(e)}")
                 self.config = copy.deepcopy(self.default_config)
+                loaded = None
         
         # 确保配置文件包含所有必要的字段
         self.ensure_config_structure()
-        self.save_config()
+        # 只有补全字段后内容发生变化时才需要写回（避免启动时重新序列化整个配置）
+        if loaded is None or pickle.dumps(self.config, pickle.HIGHEST_PROTOCOL) != loaded:
+            self._dirty = True
+            self.flush()
     
     def ensure_config_structure(self):
         """确保配置文件包含所有必要的字段"""
@@ -141,25 +226,192 @@ class ConfigManager:
                 script["category"] = "其他"
                 self.config["scripts"]["其他"].append(script)
 
+    def set_scheduler(self, schedule, cancel):
+        """设置延迟写入使用的调度器
+
+        schedule(delay_ms, callback) 返回一个标识，cancel(标识) 取消调度。
+        GUI 中传入 root.after/root.after_cancel，使写入发生在 Tk 线程。
+        """
+        with self._lock:
+            if self._pending is not None:
+                self._cancel_pending()
+            self._schedule = schedule
+            self._cancel = cancel
+            if self._dirty:
+                self._schedule_flush()
+
     def save_config(self):
-        """保存配置到文件"""
+        """保存配置（延迟合并写入）"""
+        self.mark_dirty()
+
+    def mark_dirty(self):
+        """标记配置已修改，并在稍后合并写入"""
+        with self._lock:
+            self._dirty = True
+            if self._pending is None:
+                self._schedule_flush()
+
+    def _schedule_flush(self):
+        delay = max(0.0, self.save_delay or 0.0)
+        if self._schedule is not None:
+            self._pending = self._schedule(int(delay * 1000), self._on_timer)
+        else:
+            timer = threading.Timer(delay, self._on_timer)
+            timer.daemon = True
+            self._pending = timer
+            timer.start()
+
+    def _cancel_pending(self):
+        pending, self._pending = self._pending, None
         try:
-            # 创建备份
-            if self.config.get("settings", {}).get("backup_enabled", True):
-                backup_path = Path(self.config.get("settings", {}).get("backup_path", 
-                                 str(Path.home() / "script_manager_backups")))
-                backup_path.mkdir(parents=True, exist_ok=True)
-                backup_file = backup_path / f"config_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.yaml"
-                if self.config_path.exists():
-                    shutil.copy2(self.config_path, backup_file)
-            
-            # 保存配置
-            with open(self.config_path, 'w', encoding='utf-8') as f:
-                yaml.dump(self.config, f, allow_unicode=True, sort_keys=False, 
-                         default_flow_style=False)
-                # 添加配置文件说明
-                f.write("\n# 脚本管理器配置文件\n")
-                f.write("# 请勿手动修改 version 字段\n")
-                f.write("# 更多配置示例请参考 script_manager_example.yaml\n")
-        except Exception as e:
-            messagebox.showerror("错误", f"保存配置文件失败: {str(e)}") 
\ No newline at end of file
+            if isinstance(pending, threading.Timer):
+                pending.cancel()
+            elif self._cancel is not None:
+                self._cancel(pending)
+        except Exception:
+            pass
+
+    def _on_timer(self):
+        with self._lock:
+            self._pending = None
+        self.flush()
+
+    def dump_config(self):
+        """将配置序列化为 YAML 文本"""
+        yaml, _, dumper = _yaml()
+        text = yaml.dump(self.config, Dumper=dumper, allow_unicode=True,
+                         sort_keys=False, default_flow_style=False)
+        # 添加配置文件说明
+        return (text + "\n# 脚本管理器配置文件\n"
+                "# 请勿手动修改 version 字段\n"
+                "# 更多配置示例请参考 script_manager_example.yaml\n")
+
+    def flush(self):
+        """立即写入待保存的修改；内容未变化时不写盘"""
+        with self._lock:
+            if self._pending is not None:
+                self._cancel_pending()
+            if not self._dirty or self.config is None:
+                return
+            self._dirty = False
+            try:
+                text = self.dump_config()
+                if text == self._last_saved_text and self.config_path.exists():
+                    return
+
+                # 创建备份（相同内容只保存一份）
+                if self.config.get("settings", {}).get("backup_enabled", True):
+                    if self.config_path.exists():
+                        self.backup_store.add(self.config_path.read_bytes())
+
+                self._atomic_write(self.config_path, text)
+                self._last_saved_text = text
+                self._write_cache(text, self.config)
+            except Exception as e:
+                self.on_error("错误", f"保存配置文件失败: {str(e)}")
+
+    @staticmethod
+    def _print_error(title, message):
+        print(f"{title}: {message}", file=sys.stderr)
+
+    @property
+    def backup_store(self):
+        """当前设置对应的备份仓库（首次使用时导入旧版备份文件）"""
+        settings = self.config.get("settings", {}) if self.config else {}
+        backup_path = Path(settings.get("backup_path") or
+                           str(Path.home() / "script_manager_backups"))
+        retention = settings.get("backup_retention") or {}
+        store = self._backup_store
+        if store is None or store.root != backup_path:
+            store = BackupStore(backup_path, retention)
+            if not store.index_path.exists():
+                store.migrate_legacy()
+            self._backup_store = store
+        else:
+            store.retention.update(retention)
+        return store
+
+    def list_backups(self):
+        """列出配置备份（从新到旧），不读取快照内容"""
+        return self.backup_store.list_snapshots()
+
+    def restore_backup(self, snapshot_id):
+        """用指定快照覆盖配置文件并重新加载"""
+        with self._lock:
+            if self._pending is not None:
+                self._cancel_pending()
+            self._dirty = False
+            # 恢复前先备份当前配置，便于撤销
+            if self.config_path.exists():
+                self.backup_store.add(self.config_path.read_bytes())
+            self.backup_store.restore(snapshot_id, self.config_path)
+            self._last_saved_text = None
+            # 原地更新配置字典，保持其他组件持有的引用有效
+            current = self.config
+            self.load_config()
+            if current is not None and current is not self.config:
+                current.clear()
+                current.update(self.config)
+                self.config = current
+            return self.config
+
+    def _cache_key(self, text):
+        stat = self.config_path.stat()
+        return (CACHE_VERSION, stat.st_mtime_ns, stat.st_size,
+                hashlib.sha256(text.encode('utf-8')).hexdigest())
+
+    def _load_cached(self, text):
+        """缓存与配置文件的 mtime、大小和内容哈希一致时返回缓存的配置，否则返回 None"""
+        try:
+            with open(self.cache_path, 'rb') as f:
+                key, config = pickle.load(f)
+            if key == self._cache_key(text) and isinstance(config, dict):
+                return config
+        except Exception:
+            pass
+        return None
+
+    def _write_cache(self, text, config):
+        """写入解析结果缓存；失败时忽略（缓存只是加速手段）"""
+        try:
+            if not (config or {}).get("settings", {}).get("config_cache", True):
+                if self.cache_path.exists():
+                    self.cache_path.unlink()
+                return
+            data = pickle.dumps((self._cache_key(text), config), pickle.HIGHEST_PROTOCOL)
+            self._atomic_write(self.cache_path, data)
+        except Exception:
+            pass
+
+    @staticmethod
+    def _file_mode(path):
+        try:
+            return stat.S_IMODE(os.stat(path).st_mode)
+        except OSError:
+            return 0o666 & ~_UMASK
+
+    def _atomic_write(self, path, data):
+        """先写临时文件再重命名，避免写到一半时留下损坏的文件"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(
+            prefix=f".{path.name}.", suffix=".tmp",
+            dir=str(path.parent)
+        )
+        try:
+            if isinstance(data, bytes):
+                f = os.fdopen(fd, 'wb')
+            else:
+                f = os.fdopen(fd, 'w', encoding='utf-8')
+            with f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            # mkstemp 创建的文件权限为 0600，沿用原文件的权限（新文件按 umask）
+            os.chmod(tmp_path, self._file_mode(path))
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
@@ -1,20 +1,35 @@
+import queue
+import time
 import tkinter as tk
 from tkinter import ttk, filedialog, simpledialog
 from tkinter import messagebox
-import threading
-import queue
 from pathlib import Path
 
+from src.output_pipeline import OutputPump, OutputBuffer, FrameBudget, SpillLog, LineCoalescer
+from src.process_tree import GRACE_PERIOD, kill_tree
+
+# 输出窗口空闲时的刷新间隔（毫秒）
+OUTPUT_IDLE_INTERVAL = 50
+
+# 原地更新的当前行（\r 进度条）的最短重绘间隔（秒）
+LIVE_REFRESH_INTERVAL = 0.05
+
+# 输出窗口默认保留的行数，更早的输出只保存在磁盘日志中
+DEFAULT_SCROLLBACK_LINES = 10000
+
+# 滚动到顶部时每次从磁盘日志载入的行数
+SCROLLBACK_PAGE_LINES = 1000
+
 class ScriptConfigDialog:
     """脚本配置对话框"""
     def __init__(self, parent, environments, name="", path="", env="", description="", 
-                 category="其他", categories=None, script_type="python"):
+                 category="其他", categories=None, script_type="python", after=None, timeout=None):
         self.result = False
         
         # 创建对话框
         self.dialog = tk.Toplevel(parent)
         self.dialog.title("脚本配置")
-        self.dialog.geometry("400x400")  # 增加高度以容纳新控件
+        self.dialog.geometry("400x500")  # 增加高度以容纳新控件
         self.dialog.transient(parent)
         self.dialog.grab_set()
         
@@ -68,6 +83,19 @@ class ScriptConfigDialog:
         )
         self.env_combo.pack(fill='x')
         
+        # 前置脚本（按依赖批量运行时，这些脚本成功后才运行本脚本）
+        ttk.Label(self.dialog, text="前置脚本（逗号分隔）:").pack(pady=5)
+        self.after_entry = ttk.Entry(self.dialog)
+        self.after_entry.pack(fill='x', padx=5)
+        self.after_entry.insert(0, ", ".join(after or []))
+        
+        # 运行时间上限（超时后结束脚本及其子进程）
+        ttk.Label(self.dialog, text="超时（秒，留空不限制）:").pack(pady=5)
+        self.timeout_entry = ttk.Entry(self.dialog)
+        self.timeout_entry.pack(fill='x', padx=5)
+        if timeout:
+            self.timeout_entry.insert(0, f"{timeout:g}" if isinstance(timeout, (int, float)) else str(timeout))
+        
         # 根据脚本类型显示/隐藏环境选择
         self.script_type_combo.bind('<<ComboboxSelected>>', self.on_type_changed)
         self.on_type_changed(None)  # 初始化显示状态
@@ -117,11 +145,23 @@ class ScriptConfigDialog:
         self.category = self.category_var.get()
         self.description = self.desc_text.get('1.0', tk.END).strip()
         self.script_type = self.script_type_var.get()
+        self.after = [name.strip() for name in self.after_entry.get().split(",") if name.strip()]
         
         if not self.script_name:
             messagebox.showerror("错误", "请填写脚本名称")
             return
         
+        self.timeout = None
+        timeout = self.timeout_entry.get().strip()
+        if timeout:
+            try:
+                self.timeout = float(timeout)
+            except ValueError:
+                pass
+            if self.timeout is None or self.timeout <= 0:
+                messagebox.showerror("错误", "超时应为大于 0 的秒数")
+                return
+        
         if self.script_type == "python" and not self.selected_env:
             messagebox.showerror("错误", "请选择Python环境")
             return
@@ -135,7 +175,8 @@ class ScriptConfigDialog:
 
 class OutputWindow:
     """脚本输出窗口"""
-    def __init__(self, parent, title, interactive=False):
+    def __init__(self, parent, title, interactive=False, scrollback_lines=DEFAULT_SCROLLBACK_LINES,
+                 kill_grace=GRACE_PERIOD):
         self.window = tk.Toplevel(parent)
         self.window.title(f"运行: {title}")
         self.window.geometry("400x500")
@@ -149,12 +190,13 @@ class OutputWindow:
         
         # 创建垂直滚动条
         y_scrollbar = ttk.Scrollbar(text_frame, orient='vertical', command=self.output_text.yview)
+        self.y_scrollbar = y_scrollbar
         # 创建水平滚动条
         x_scrollbar = ttk.Scrollbar(text_frame, orient='horizontal', command=self.output_text.xview)
         
         # 配置文本框的滚动
         self.output_text.configure(
-            yscrollcommand=y_scrollbar.set,
+            yscrollcommand=self.on_yscroll,
             xscrollcommand=x_scrollbar.set
         )
         
@@ -185,16 +227,36 @@ class OutputWindow:
         self.status_label = ttk.Label(btn_frame, text="运行中...")
         self.status_label.pack(side=tk.LEFT, padx=5)
         
-        self.close_button = ttk.Button(btn_frame, text="关闭", state='disabled', command=self.window.destroy)
+        self.close_button = ttk.Button(btn_frame, text="关闭", state='disabled', command=self.on_closing)
         self.close_button.pack(side=tk.RIGHT, padx=5)
         
+        # 结束脚本及其启动的全部子进程
+        self.kill_button = ttk.Button(btn_frame, text="结束进程树", command=self.kill_tree)
+        self.kill_button.pack(side=tk.RIGHT, padx=5)
+        self.kill_grace = GRACE_PERIOD if kill_grace is None else kill_grace
+        
         # 配置错误文本样式
         self.output_text.tag_configure('error', foreground='red')
         
-        # 初始化进程变量和队列
+        # 初始化进程变量和输出缓冲
         self.process = None
-        self.output_queue = queue.Queue()
-        self.error_queue = queue.Queue()
+        self.job = None  # 由执行引擎启动时对应的任务，进程由引擎负责回收
+        self.pump = None
+        self.buffer = OutputBuffer()
+        self.budget = FrameBudget()
+        self.pipes_closed = False
+        self.closed = False
+        
+        # 各流未换行的当前行：\r 和 ANSI 光标控制在这里原地修改，文本框中只显示最新状态
+        self.coalescers = {}
+        self.live_pieces = []  # 文本框末尾当前显示的 [(文本, 标签)]
+        self.live_drawn_at = 0.0
+        
+        # 文本框只保留最近 scrollback_lines 行，完整输出写入磁盘日志
+        self.scrollback_lines = max(100, int(scrollback_lines or DEFAULT_SCROLLBACK_LINES))
+        self.spill = SpillLog()
+        self.first_line = 0  # 文本框第一行对应的日志行号
+        self.loading_history = False
         
         # 绑定窗口关闭事件
         self.window.protocol("WM_DELETE_WINDOW", self.on_closing)
@@ -204,105 +266,251 @@ class OutputWindow:
     
     def send_input(self):
         """发送输入到脚本"""
-        if self.process and self.process.poll() is None:
+        if self.process_running():
             input_text = self.input_entry.get() + '\n'
+            # 输入提示（未换行）先固定下来，输入内容显示在其后
+            self.commit_live()
             try:
-                self.process.stdin.write(input_text)
+                self.process.stdin.write(input_text.encode(self.pump.encoding, errors="replace"))
                 self.process.stdin.flush()
                 self.input_entry.delete(0, tk.END)
                 # 显示输入内容
-                self.output_text.insert(tk.END, f"> {input_text}")
-                self.output_text.see(tk.END)
+                self.write_output([(f"> {input_text}", '')])
             except:
                 # 如果写入失败，可能是进程已经结束
                 pass
     
-    def display_output(self, process):
-        """显示脚本输出"""
-        self.process = process
-        
-        # 创建读取输出的线程
-        stdout_thread = threading.Thread(target=self.read_output, args=(process.stdout, self.output_queue))
-        stderr_thread = threading.Thread(target=self.read_output, args=(process.stderr, self.error_queue))
+    def display_output(self, process, pump=None, buffer=None):
+        """显示脚本输出
         
-        stdout_thread.daemon = True
-        stderr_thread.daemon = True
+        pump/buffer 由执行引擎提供时直接使用（输出在窗口创建前已开始读取），
+        否则自行创建。
+        """
+        self.process = process
         
-        stdout_thread.start()
-        stderr_thread.start()
+        # 分块读取 stdout/stderr，解码后的文本写入缓冲，由 Tk 线程按帧批量插入
+        if pump is not None:
+            self.pump = pump
+            self.buffer = buffer if buffer is not None else self.buffer
+            if buffer is None:
+                self.pump.subscribe(self.buffer.append)
+            self.pump.on_close(self.on_pipes_closed)
+            if self.pump.closed:
+                self.pipes_closed = True
+        else:
+            self.pump = OutputPump(process)
+            self.pump.subscribe(self.buffer.append)
+            self.pump.on_close(self.on_pipes_closed)
+            self.pump.start()
         
-        # 启动更新输出的定时器
+        # 启动更新输出的定时器（同时检查进程是否结束）
         self.update_output()
+    
+    def display_batch(self, batch):
+        """显示批量运行的合并输出（各脚本的输出行带 [名称] 前缀）
         
-        # 启动进程监控
-        self.window.after(100, self.check_process)
+        批量运行对象代替进程：done() 表示全部结束，terminate() 终止整批。
+        """
+        self.process = batch
+        self.job = batch
+        self.buffer = batch.output
+        batch.on_done(self.on_pipes_closed)
+        if batch.done():
+            self.pipes_closed = True
+        self.update_output()
     
-    def read_output(self, pipe, queue):
-        """在线程中读取输出"""
-        try:
-            for line in iter(pipe.readline, ''):
-                if not self.running:
-                    break
-                queue.put(line)
-            pipe.close()
-        except:
-            pass
+    def on_pipes_closed(self):
+        """输出管道全部关闭（在读取线程中调用）"""
+        self.pipes_closed = True
     
     def update_output(self):
-        """更新输出显示"""
-        # 处理标准输出
-        try:
-            while True:
-                line = self.output_queue.get_nowait()
-                self.output_text.insert(tk.END, line)
-                self.output_text.see(tk.END)
-        except queue.Empty:
-            pass
+        """把缓冲中的输出一次性插入文本框（每帧一次 insert 调用）"""
+        if self.closed:
+            return
         
-        # 处理错误输出
-        try:
-            while True:
-                line = self.error_queue.get_nowait()
-                self.output_text.insert(tk.END, line, 'error')
-                self.output_text.see(tk.END)
-        except queue.Empty:
-            pass
+        self.budget.begin()
+        spans = self.buffer.drain(self.budget.chars)
+        if spans:
+            # 只插入已换行的内容，\r 更新只改变各流的当前行
+            pieces = []
+            for stream, text in spans:
+                done = self.coalescer(stream).feed(text)
+                if done:
+                    pieces.append((done, self.tag_of(stream)))
+            if pieces:
+                self.write_output(pieces)
+            self.budget.end(sum(len(text) for _, text in spans))
+        self.refresh_live()
+        
+        # 缓冲中还有积压时尽快处理下一帧；否则检查进程是否结束，未结束时按空闲间隔轮询
+        if self.buffer:
+            self.window.after(1, self.update_output)
+            return
+        self.check_process()
+        if self.running or not self.pipes_closed:
+            self.window.after(OUTPUT_IDLE_INTERVAL, self.update_output)
+    
+    def process_running(self):
+        """进程是否仍在运行
         
-        # 如果窗口还在运行，继续更新
-        if self.running:
-            self.window.after(100, self.update_output)
+        由执行引擎启动的进程以任务状态为准（退出由进程监视器通知），不调用 poll()，
+        避免与引擎回收进程（os.wait4）竞争。
+        """
+        if self.process is None:
+            return False
+        if self.job is not None:
+            return not self.job.done()
+        return self.process.poll() is None
+    
+    def kill_tree(self):
+        """结束脚本的整个进程组（先 SIGTERM，宽限期后 SIGKILL）；批量运行时结束整批"""
+        if not self.process_running():
+            return
+        if hasattr(self.process, "pid"):
+            kill_tree(self.process, self.kill_grace)
+        else:
+            self.process.terminate()
+        self.status_label.config(text="正在结束...")
+        self.kill_button.config(state='disabled')
+    
+    @staticmethod
+    def tag_of(stream):
+        # stderr 片段带 error 标签
+        return 'error' if stream == "stderr" else ''
+    
+    def coalescer(self, stream):
+        coalescer = self.coalescers.get(stream)
+        if coalescer is None:
+            coalescer = self.coalescers[stream] = LineCoalescer()
+        return coalescer
+    
+    def refresh_live(self, force=False):
+        """在文本框末尾重绘各流未换行的当前行
+        
+        内容变化时最多每 LIVE_REFRESH_INTERVAL 秒重绘一次，进度条每秒上千次的
+        更新只产生一次删除和插入。
+        """
+        pieces = [(c.line, self.tag_of(stream)) for stream, c in self.coalescers.items() if c.line]
+        if pieces == self.live_pieces:
+            return
+        now = time.monotonic()
+        if not force and now - self.live_drawn_at < LIVE_REFRESH_INTERVAL:
+            return
+        at_bottom = self.output_text.yview()[1] >= 1.0
+        self.clear_live()
+        if pieces:
+            args = []
+            for i, (text, tag) in enumerate(pieces):
+                args.extend(("\n" + text if i else text, tag))
+            # 标记当前行的起点：之后插入到末尾的文本不会移动它
+            self.output_text.mark_set('live', 'end-1c')
+            self.output_text.mark_gravity('live', tk.LEFT)
+            self.output_text.insert(tk.END, *args)
+        self.live_pieces = pieces
+        self.live_drawn_at = now
+        if at_bottom:
+            self.output_text.see(tk.END)
+    
+    def clear_live(self):
+        """从文本框中删除当前行的显示（不影响其内容）"""
+        if self.live_pieces:
+            self.output_text.delete('live', 'end-1c')
+            self.live_pieces = []
+    
+    def commit_live(self):
+        """把各流未换行的当前行作为普通输出固定下来"""
+        pieces = [(c.flush(), self.tag_of(stream)) for stream, c in self.coalescers.items()]
+        pieces = [(text, tag) for text, tag in pieces if text]
+        if pieces:
+            self.write_output(pieces)
+    
+    def write_output(self, pieces):
+        """追加 [(文本, 标签)]：写入磁盘日志，一次 insert 插入文本框并裁剪旧行
+        
+        文本插入在当前行之前，当前行随后按原样重绘。
+        """
+        # 只有视图停在底部时才自动滚动和裁剪，避免打断正在翻看历史的用户
+        at_bottom = self.output_text.yview()[1] >= 1.0
+        live = bool(self.live_pieces)
+        self.clear_live()
+        args = []
+        for text, tag in pieces:
+            args.append(text)
+            args.append(tag)
+        self.spill.append("".join(text for text, _ in pieces))
+        self.output_text.insert(tk.END, *args)
+        if live:
+            self.refresh_live(force=True)
+        if at_bottom:
+            self.trim_scrollback()
+            self.output_text.see(tk.END)
+    
+    def trim_scrollback(self):
+        """删除超出保留行数的旧行（超出 10% 时才裁剪，减少删除次数）"""
+        lines = int(self.output_text.index('end-1c').split('.')[0])
+        excess = lines - self.scrollback_lines
+        if excess > self.scrollback_lines // 10:
+            self.output_text.delete('1.0', f'{excess + 1}.0')
+            self.first_line += excess
+    
+    def on_yscroll(self, first, last):
+        """滚动条回调：滚动到顶部时从磁盘日志载入更早的输出"""
+        self.y_scrollbar.set(first, last)
+        if float(first) <= 0.0 and self.first_line > 0 and not self.loading_history:
+            self.loading_history = True
+            self.window.after_idle(self.load_history)
+    
+    def load_history(self):
+        """从磁盘日志读取上一页输出插入到文本框顶部"""
+        self.loading_history = False
+        if self.closed or self.first_line <= 0:
+            return
+        start = max(0, self.first_line - SCROLLBACK_PAGE_LINES)
+        text = self.spill.read_lines(start, self.first_line)
+        if not text:
+            return
+        self.output_text.insert('1.0', text)
+        # 保持原先顶部的行仍在视图顶部附近
+        self.output_text.yview(f'{self.first_line - start + 1}.0')
+        self.first_line = start
     
     def check_process(self):
-        """检查进程状态"""
-        if self.process.poll() is not None:
-            # 进程已结束
-            self.status_label.config(text="已完成")
+        """检查进程状态（由 update_output 在输出缓冲为空时调用）"""
+        if self.closed or not self.running:
+            return
+        if not self.process_running() and self.pipes_closed and not self.buffer:
+            # 进程已结束且输出已全部显示
+            # 最后的进度条状态作为普通输出保留
+            self.commit_live()
+            timed_out = getattr(self.job, "timed_out", False)
+            self.status_label.config(text="已超时" if timed_out else "已完成")
             self.close_button.config(state='normal')
+            self.kill_button.config(state='disabled')
             self.running = False
             
-            # 确保所有输出都被读取
-            self.update_output()
-            
             # 添加结束标记
-            self.output_text.insert(tk.END, "\n--- 运行结束 ---\n")
-            self.output_text.see(tk.END)
-        elif self.running:
-            # 继续检查
-            self.window.after(100, self.check_process)
+            if timed_out:
+                self.write_output([(f"\n--- {self.job.error} ---\n", 'error')])
+            else:
+                self.write_output([("\n--- 运行结束 ---\n", '')])
     
     def on_closing(self):
         """处理窗口关闭事件"""
-        if self.process and self.process.poll() is None:
-            if messagebox.askokcancel("确认", "脚本正在运行，确定要关闭窗口吗？"):
+        if self.process_running():
+            if messagebox.askokcancel("确认", "脚本正在运行，关闭窗口将结束脚本及其子进程，确定吗？"):
                 self.running = False
+                self.closed = True
                 try:
-                    self.process.terminate()
+                    self.kill_tree()
                 except:
                     pass
                 self.window.destroy()
         else:
             self.running = False
+            self.closed = True
             self.window.destroy()
+        if self.closed:
+            self.spill.close()
 
 class EnvConfigDialog:
     """环境配置对话框"""
@@ -357,17 +565,38 @@ class EnvConfigDialog:
         self.dialog.wait_window()
     
     def load_env_info(self):
-        """加载环境信息"""
-        from src.utils import get_python_info
-        info = get_python_info(self.python_path)
-        
-        # 设置默认名称
-        if info["version"]:
-            self.name_entry.insert(0, info["version"].replace("Python ", ""))
-        
-        # 显示包列表
-        self.packages_text.insert('1.0', info["packages"])
+        """在后台加载环境信息，版本和包列表分阶段显示（已缓存时立即显示）"""
+        from src.env_info import default_cache
+        self.info_queue = queue.Queue()
+        self.packages_text.insert('1.0', "正在获取环境信息...")
         self.packages_text.config(state='disabled')
+        default_cache().probe_async(self.python_path,
+                                    lambda stage, info: self.info_queue.put((stage, info)))
+        self.poll_env_info()
+    
+    def poll_env_info(self):
+        """在 Tk 线程中处理探测结果"""
+        finished = False
+        try:
+            while True:
+                stage, info = self.info_queue.get_nowait()
+                # 设置默认名称
+                if info.get("version") and not self.name_entry.get():
+                    self.name_entry.insert(0, info["version"].replace("Python ", ""))
+                # 显示包列表
+                if info.get("packages") is not None:
+                    self.packages_text.config(state='normal')
+                    self.packages_text.delete('1.0', tk.END)
+                    self.packages_text.insert('1.0', info["packages"])
+                    self.packages_text.config(state='disabled')
+                finished = stage in ("done", "error")
+        except queue.Empty:
+            pass
+        except tk.TclError:
+            # 对话框已关闭
+            return
+        if not finished:
+            self.dialog.after(50, self.poll_env_info)
     
     def ok(self):
         """确认配置"""
@@ -385,6 +614,342 @@ class EnvConfigDialog:
         """取消配置"""
         self.dialog.destroy()
 
+class RunLogDialog:
+    """运行记录对话框：按脚本、时间范围和内容查询历史运行的输出"""
+    
+    TIME_RANGES = {
+        "全部": None,
+        "最近 1 天": 1,
+        "最近 7 天": 7,
+        "最近 30 天": 30
+    }
+    
+    def __init__(self, parent, run_log, script_name=""):
+        self.run_log = run_log
+        self.runs = {}
+        
+        self.dialog = tk.Toplevel(parent)
+        self.dialog.title("运行记录")
+        self.dialog.geometry("800x550")
+        self.dialog.transient(parent)
+        
+        # 查询条件
+        filter_frame = ttk.Frame(self.dialog)
+        filter_frame.pack(fill='x', padx=10, pady=5)
+        
+        ttk.Label(filter_frame, text="脚本:").pack(side=tk.LEFT)
+        self.script_var = tk.StringVar(value=script_name)
+        ttk.Combobox(filter_frame, textvariable=self.script_var, width=20,
+                     values=[""] + run_log.scripts()).pack(side=tk.LEFT, padx=(5, 10))
+        
+        ttk.Label(filter_frame, text="时间:").pack(side=tk.LEFT)
+        self.range_var = tk.StringVar(value="最近 7 天")
+        ttk.Combobox(filter_frame, textvariable=self.range_var, width=10, state='readonly',
+                     values=list(self.TIME_RANGES)).pack(side=tk.LEFT, padx=(5, 10))
+        
+        ttk.Label(filter_frame, text="内容:").pack(side=tk.LEFT)
+        self.text_entry = ttk.Entry(filter_frame)
+        self.text_entry.pack(side=tk.LEFT, fill='x', expand=True, padx=5)
+        self.text_entry.bind('<Return>', lambda e: self.query())
+        
+        ttk.Button(filter_frame, text="查询", command=self.query).pack(side=tk.LEFT)
+        
+        # 运行列表和输出
+        paned = ttk.PanedWindow(self.dialog, orient=tk.VERTICAL)
+        paned.pack(fill='both', expand=True, padx=10, pady=5)
+        
+        self.tree = ttk.Treeview(paned, columns=("script", "started", "duration", "exit_code"),
+                                 show='headings', height=8)
+        for column, text, width in (("script", "脚本", 200), ("started", "开始时间", 160),
+                                    ("duration", "耗时", 80), ("exit_code", "退出码", 60)):
+            self.tree.heading(column, text=text)
+            self.tree.column(column, width=width)
+        self.tree.bind('<<TreeviewSelect>>', self.on_select)
+        paned.add(self.tree, weight=1)
+        
+        self.output_text = tk.Text(paned, wrap=tk.NONE, height=12)
+        paned.add(self.output_text, weight=2)
+        
+        btn_frame = ttk.Frame(self.dialog)
+        btn_frame.pack(fill='x', padx=10, pady=10)
+        self.status_label = ttk.Label(btn_frame, text="")
+        self.status_label.pack(side=tk.LEFT)
+        ttk.Button(btn_frame, text="关闭", command=self.dialog.destroy).pack(side=tk.RIGHT)
+        
+        self.query()
+    
+    def query(self):
+        """按当前条件查询运行记录"""
+        import time
+        script = self.script_var.get().strip() or None
+        days = self.TIME_RANGES.get(self.range_var.get())
+        since = time.time() - days * 86400 if days else None
+        text = self.text_entry.get()
+        if text:
+            runs = self.run_log.search(text, script=script, since=since)
+        else:
+            runs = self.run_log.find_runs(script=script, since=since)
+        
+        self.tree.delete(*self.tree.get_children())
+        self.runs = {}
+        for run in runs:
+            started = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(run["started_at"]))
+            if run["finished_at"] is None:
+                duration, exit_code = "运行中", ""
+            else:
+                duration = f"{run['finished_at'] - run['started_at']:.1f}s"
+                exit_code = "" if run["exit_code"] is None else run["exit_code"]
+            item = self.tree.insert("", "end", values=(run["script"], started, duration, exit_code))
+            self.runs[item] = run
+        self.status_label.config(text=f"共 {len(runs)} 条记录")
+        self.output_text.delete('1.0', tk.END)
+    
+    def on_select(self, event):
+        selection = self.tree.selection()
+        if not selection:
+            return
+        run = self.runs.get(selection[0])
+        from src.output_pipeline import default_encoding
+        output = self.run_log.read_output(run).decode(default_encoding(), errors="replace")
+        self.output_text.delete('1.0', tk.END)
+        self.output_text.insert('1.0', output)
+
+class ImportProfileDialog:
+    """导入耗时分析对话框：显示脚本最近一次的导入耗时，并可重新分析"""
+    
+    def __init__(self, parent, script_name, profile, analyze, on_result):
+        # analyze(use_cprofile) 返回 Future；on_result(profile) 在 Tk 线程中调用
+        self.analyze = analyze
+        self.on_result = on_result
+        self.future = None
+        
+        self.dialog = tk.Toplevel(parent)
+        self.dialog.title(f"导入耗时: {script_name}")
+        self.dialog.geometry("600x500")
+        self.dialog.transient(parent)
+        
+        self.summary_label = ttk.Label(self.dialog, text="")
+        self.summary_label.pack(fill='x', padx=10, pady=5)
+        
+        notebook = ttk.Notebook(self.dialog)
+        notebook.pack(fill='both', expand=True, padx=10, pady=5)
+        
+        self.tree = ttk.Treeview(notebook, columns=("self", "cumulative"), show='tree headings')
+        self.tree.heading('#0', text='模块')
+        self.tree.heading('self', text='自身 (ms)')
+        self.tree.heading('cumulative', text='累计 (ms)')
+        self.tree.column('#0', width=320)
+        self.tree.column('self', width=100, anchor='e')
+        self.tree.column('cumulative', width=100, anchor='e')
+        notebook.add(self.tree, text="最慢的导入")
+        
+        self.cprofile_text = tk.Text(notebook, wrap=tk.NONE)
+        notebook.add(self.cprofile_text, text="cProfile")
+        
+        btn_frame = ttk.Frame(self.dialog)
+        btn_frame.pack(fill='x', padx=10, pady=10)
+        self.cprofile_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(btn_frame, text="同时使用 cProfile", variable=self.cprofile_var).pack(side=tk.LEFT)
+        self.analyze_button = ttk.Button(btn_frame, text="分析", command=self.start_analysis)
+        self.analyze_button.pack(side=tk.LEFT, padx=5)
+        ttk.Button(btn_frame, text="关闭", command=self.dialog.destroy).pack(side=tk.RIGHT)
+        
+        self.show_profile(profile)
+    
+    def show_profile(self, profile):
+        """显示分析结果"""
+        self.tree.delete(*self.tree.get_children())
+        self.cprofile_text.delete('1.0', tk.END)
+        if not profile:
+            self.summary_label.config(text="尚未分析。分析时会使用保存的参数完整运行一次脚本。")
+            return
+        import time
+        when = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(profile.get("profiled_at", 0)))
+        if not profile.get("module_count"):
+            self.summary_label.config(text=f"{when}  未获取到导入耗时（需要 Python 3.7 及以上）")
+        else:
+            self.summary_label.config(
+                text=f"{when}  导入 {profile['module_count']} 个模块，共 {profile['total_ms']:.1f} ms；"
+                     f"总运行 {profile.get('wall_ms', 0):.0f} ms，退出码 {profile.get('exit_code')}"
+            )
+        for entry in profile.get("slowest", []):
+            self.tree.insert("", "end", text="  " * entry.get("depth", 0) + entry["module"],
+                             values=(f"{entry['self_ms']:.2f}", f"{entry['cumulative_ms']:.2f}"))
+        self.cprofile_text.insert('1.0', profile.get("cprofile", ""))
+    
+    def start_analysis(self):
+        if self.future is not None and not self.future.done():
+            return
+        self.analyze_button.config(state='disabled')
+        self.summary_label.config(text="正在分析...")
+        self.future = self.analyze(self.cprofile_var.get())
+        self.poll_analysis()
+    
+    def poll_analysis(self):
+        try:
+            if not self.future.done():
+                self.dialog.after(100, self.poll_analysis)
+                return
+            self.analyze_button.config(state='normal')
+            try:
+                profile = self.future.result()
+            except Exception as e:
+                self.summary_label.config(text=f"分析失败: {str(e)}")
+                return
+            self.on_result(profile)
+            self.show_profile(profile)
+        except tk.TclError:
+            # 对话框已关闭
+            pass
+
+class MetricsDialog:
+    """运行统计对话框：按脚本汇总耗时、失败率和资源占用"""
+    
+    def __init__(self, parent, metrics):
+        self.metrics = metrics
+        
+        self.dialog = tk.Toplevel(parent)
+        self.dialog.title("运行统计")
+        self.dialog.geometry("800x550")
+        self.dialog.transient(parent)
+        
+        columns = (("runs", "次数", 60), ("failure_rate", "失败率", 70), ("p50", "p50 耗时", 90),
+                   ("p95", "p95 耗时", 90), ("mean_cpu", "平均 CPU", 90), ("max_rss", "峰值内存", 90))
+        self.tree = ttk.Treeview(self.dialog, columns=[c[0] for c in columns], show='tree headings', height=10)
+        self.tree.heading('#0', text='脚本')
+        self.tree.column('#0', width=200)
+        for column, text, width in columns:
+            self.tree.heading(column, text=text)
+            self.tree.column(column, width=width, anchor='e')
+        self.tree.pack(fill='both', expand=True, padx=10, pady=5)
+        self.tree.bind('<<TreeviewSelect>>', self.on_select)
+        
+        history_frame = ttk.LabelFrame(self.dialog, text="最近运行")
+        history_frame.pack(fill='both', expand=True, padx=10, pady=5)
+        self.history = ttk.Treeview(history_frame, columns=("wall", "cpu", "rss", "exit_code", "output"),
+                                    show='tree headings', height=8)
+        self.history.heading('#0', text='开始时间')
+        self.history.column('#0', width=160)
+        for column, text in (("wall", "耗时 (s)"), ("cpu", "CPU (s)"), ("rss", "内存 (MB)"),
+                             ("exit_code", "退出码"), ("output", "输出 (KB)")):
+            self.history.heading(column, text=text)
+            self.history.column(column, width=90, anchor='e')
+        self.history.pack(fill='both', expand=True, padx=5, pady=5)
+        
+        btn_frame = ttk.Frame(self.dialog)
+        btn_frame.pack(fill='x', padx=10, pady=10)
+        self.regression_label = ttk.Label(btn_frame, text="")
+        self.regression_label.pack(side=tk.LEFT)
+        ttk.Button(btn_frame, text="关闭", command=self.dialog.destroy).pack(side=tk.RIGHT)
+        ttk.Button(btn_frame, text="刷新", command=self.refresh).pack(side=tk.RIGHT, padx=5)
+        
+        self.refresh()
+    
+    @staticmethod
+    def _fmt(value, fmt):
+        return format(value, fmt) if value is not None else "-"
+    
+    def refresh(self):
+        self.tree.delete(*self.tree.get_children())
+        for stat in self.metrics.stats(window=200):
+            rss = stat["max_rss_kb"] / 1024.0 if stat["max_rss_kb"] is not None else None
+            self.tree.insert("", "end", text=stat["script"], values=(
+                stat["runs"], f"{stat['failure_rate'] * 100:.1f}%",
+                self._fmt(stat["p50"], ".3f"), self._fmt(stat["p95"], ".3f"),
+                self._fmt(stat["mean_cpu"], ".3f"), self._fmt(rss, ".1f")
+            ))
+        regressions = self.metrics.regressions()
+        if regressions:
+            text = "、".join(f"{r['script']} ({r['ratio']:.1f}x)" for r in regressions[:5])
+            self.regression_label.config(text=f"耗时明显变长: {text}")
+        else:
+            self.regression_label.config(text="")
+    
+    def on_select(self, event):
+        import time
+        selection = self.tree.selection()
+        if not selection:
+            return
+        script = self.tree.item(selection[0], 'text')
+        self.history.delete(*self.history.get_children())
+        for sample in self.metrics.samples(script=script, limit=100):
+            cpu = None
+            if sample["cpu_user"] is not None and sample["cpu_system"] is not None:
+                cpu = sample["cpu_user"] + sample["cpu_system"]
+            rss = sample["max_rss_kb"] / 1024.0 if sample["max_rss_kb"] is not None else None
+            output_kb = ((sample["stdout_bytes"] or 0) + (sample["stderr_bytes"] or 0)) / 1024.0
+            self.history.insert("", "end",
+                                text=time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(sample["started_at"])),
+                                values=(self._fmt(sample["wall"], ".3f"), self._fmt(cpu, ".3f"),
+                                        self._fmt(rss, ".1f"),
+                                        "" if sample["exit_code"] is None else sample["exit_code"],
+                                        f"{output_kb:.1f}"))
+
+class BatchRunDialog:
+    """批量运行对话框：选择运行方式、并发数和失败处理"""
+    
+    MODES = {
+        "依次运行": "sequence",
+        "并行运行": "parallel",
+        "按依赖运行": "dag"
+    }
+    
+    def __init__(self, parent, script_names, max_parallel=4):
+        self.result = False
+        
+        self.dialog = tk.Toplevel(parent)
+        self.dialog.title("批量运行")
+        self.dialog.geometry("360x380")
+        self.dialog.transient(parent)
+        self.dialog.grab_set()
+        
+        ttk.Label(self.dialog, text=f"将运行 {len(script_names)} 个脚本:").pack(anchor='w', padx=10, pady=5)
+        listbox = tk.Listbox(self.dialog, height=8)
+        listbox.pack(fill='both', expand=True, padx=10)
+        for name in script_names:
+            listbox.insert(tk.END, name)
+        
+        option_frame = ttk.Frame(self.dialog)
+        option_frame.pack(fill='x', padx=10, pady=5)
+        ttk.Label(option_frame, text="运行方式:").grid(row=0, column=0, sticky='w', pady=2)
+        self.mode_var = tk.StringVar(value="依次运行")
+        ttk.Combobox(option_frame, textvariable=self.mode_var, state='readonly',
+                     values=list(self.MODES)).grid(row=0, column=1, sticky='ew', pady=2)
+        ttk.Label(option_frame, text="最大并发数:").grid(row=1, column=0, sticky='w', pady=2)
+        self.parallel_var = tk.IntVar(value=max_parallel)
+        ttk.Spinbox(option_frame, from_=1, to=64, textvariable=self.parallel_var,
+                    width=5).grid(row=1, column=1, sticky='w', pady=2)
+        option_frame.grid_columnconfigure(1, weight=1)
+        
+        self.continue_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(self.dialog, text="失败后继续运行后续脚本",
+                        variable=self.continue_var).pack(anchor='w', padx=10)
+        ttk.Label(self.dialog, text="按依赖运行时，前置脚本取自脚本配置中的“前置脚本”",
+                  foreground='gray').pack(anchor='w', padx=10, pady=(5, 0))
+        
+        btn_frame = ttk.Frame(self.dialog)
+        btn_frame.pack(fill='x', padx=10, pady=10)
+        ttk.Button(btn_frame, text="运行", command=self.ok).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(btn_frame, text="取消", command=self.cancel).pack(side=tk.RIGHT)
+        
+        self.dialog.grab_set()
+        self.dialog.focus_set()
+        self.dialog.wait_window()
+    
+    def ok(self):
+        try:
+            self.max_parallel = max(1, int(self.parallel_var.get()))
+        except (tk.TclError, ValueError):
+            messagebox.showerror("错误", "请输入有效的并发数")
+            return
+        self.mode = self.MODES.get(self.mode_var.get(), "sequence")
+        self.continue_on_failure = self.continue_var.get()
+        self.result = True
+        self.dialog.destroy()
+    
+    def cancel(self):
+        self.dialog.destroy()
+
 class CategoryDialog:
     """分类编辑对话框"""
     def __init__(self, parent, current_categories, category_order=None):
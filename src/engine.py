@@ -0,0 +1,443 @@
+import itertools
+import math
+import os
+import queue
+import subprocess
+import threading
+import time
+
+from src.metrics import rusage_metrics
+from src.output_pipeline import OutputPump, OutputBuffer
+from src.process_tree import GRACE_PERIOD, kill_tree, terminate_trees
+from src.resources import release as release_resources
+from src.runners import RunnerFactory
+from src.supervisor import call_later, default_supervisor, reap
+
+
+class JobSpec:
+    """一次运行请求的描述（与 Tk 无关）"""
+
+    def __init__(self, script, arguments="", working_dir="", env=None,
+                 show_output=False, interactive=False, batch_id=None, output_listeners=(), timeout=None):
+        # script 为配置中的脚本条目；运行时会复制一份，避免修改配置
+        self.script = dict(script)
+        if env:
+            self.script["env"] = env
+        self.arguments = arguments or ""
+        self.working_dir = working_dir or os.path.dirname(self.script.get("path", ""))
+        self.show_output = show_output
+        self.interactive = interactive
+        # 所属批量运行的 ID（GUI 不为批量运行中的任务单独打开输出窗口）
+        self.batch_id = batch_id
+        # 额外的输出订阅者 callback(job, stream, text)，在读取开始前注册，不会错过输出
+        self.output_listeners = list(output_listeners)
+        # 运行时间上限（秒），None 时使用脚本条目的 timeout 字段或全局设置
+        self.timeout = timeout
+
+    @property
+    def name(self):
+        return self.script.get("name", "")
+
+    @property
+    def script_type(self):
+        return self.script.get("script_type", "python")
+
+    @property
+    def detached(self):
+        """不捕获输出的运行（如可执行文件）启动后不占用工作线程"""
+        return not self.show_output
+
+
+class Job:
+    """任务句柄：记录状态、退出码和耗时"""
+
+    PENDING = "pending"
+    STARTING = "starting"
+    RUNNING = "running"
+    FINISHED = "finished"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    def __init__(self, job_id, spec):
+        self.id = job_id
+        self.spec = spec
+        self.status = Job.PENDING
+        self.process = None
+        self.pump = None      # 捕获输出时的 OutputPump
+        self.output = None    # 供输出窗口读取的 OutputBuffer
+        self.run_id = None    # 运行日志中的记录 ID
+        self.metrics = None   # 耗时、CPU 时间、峰值内存等
+        self.returncode = None
+        self.error = None
+        self.timeout = None   # 运行时间上限（秒），提交时确定
+        self.timed_out = False
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._done = threading.Event()
+        self._timer = None
+
+    @property
+    def name(self):
+        return self.spec.name
+
+    @property
+    def duration(self):
+        """运行耗时（秒），未启动时返回 None"""
+        if self.started_at is None:
+            return None
+        end = self.finished_at if self.finished_at is not None else time.time()
+        return end - self.started_at
+
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """等待任务结束，返回是否已结束"""
+        return self._done.wait(timeout)
+
+    def __repr__(self):
+        return f"<Job #{self.id} {self.name!r} {self.status}>"
+
+
+class ExecutionEngine:
+    """脚本执行引擎：排队并通过有界工作线程池运行任务
+
+    同时运行的任务（捕获输出的）不超过 max_workers 个。POSIX 下工作线程只负责
+    启动进程，进程退出由 ProcessSupervisor 通知（pidfd/SIGCHLD），收尾工作
+    （运行日志、运行统计、事件）在一个收尾线程中完成，不为每个任务占用线程。
+
+    每个脚本在自己的进程组中运行：超时或 terminate() 时先向整个进程组发送 SIGTERM，
+    宽限期后仍未退出的进程被 SIGKILL，脚本启动的子进程不会遗留。
+
+    事件回调在工作线程、收尾线程或监视线程中调用，签名为 callback(event, job)，
+    event 取值为 "started"、"finished"、"failed"、"cancelled"。
+    GUI 需要自行把事件转交给 Tk 线程处理。
+    """
+
+    def __init__(self, config, max_workers=4, run_log=None, metrics=None):
+        self.config = config
+        self.run_log = run_log
+        self.metrics = metrics
+        self.max_workers = max(1, int(max_workers or 1))
+        settings = (config or {}).get("settings", {})
+        self.grace_period = settings.get("kill_grace_period", GRACE_PERIOD)
+        self.default_timeout = settings.get("default_timeout")
+        self._queue = queue.Queue()
+        self._jobs = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._workers = []
+        self._shutdown = False
+        # 运行名额：任务启动前取得，结束后归还（不捕获输出的任务启动后立即归还）
+        self._slots = threading.Semaphore(self.max_workers)
+        self._completions = queue.Queue()
+        self._completer = None
+        self.supervisor = default_supervisor()
+        if self.supervisor is not None:
+            # pidfd 不可用时需要在主线程中安装 SIGCHLD 通知
+            self.supervisor.install_sigchld_wakeup()
+
+    def subscribe(self, callback):
+        """注册任务事件回调"""
+        self._listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        try:
+            self._listeners.remove(callback)
+        except ValueError:
+            pass
+
+    def submit(self, spec):
+        """提交任务，立即返回任务句柄"""
+        if self._shutdown:
+            raise RuntimeError("执行引擎已关闭")
+        with self._lock:
+            job = Job(next(self._ids), spec)
+            self._jobs[job.id] = job
+        try:
+            # 启动前检查超时设置，无效时任务直接失败，不会启动进程
+            job.timeout = self._timeout_of(spec)
+        except ValueError as e:
+            job.error = e
+            job.status = Job.FAILED
+            job.finished_at = time.time()
+            job._done.set()
+            self._emit("failed", job)
+            return job
+        with self._lock:
+            self._ensure_workers()
+        self._queue.put(job)
+        return job
+
+    def cancel(self, job):
+        """取消尚未开始的任务，返回是否取消成功"""
+        with self._lock:
+            if job.status != Job.PENDING:
+                return False
+            job.status = Job.CANCELLED
+            job.finished_at = time.time()
+        job._done.set()
+        self._emit("cancelled", job)
+        return True
+
+    def terminate(self, job, grace=None):
+        """结束任务：未开始的任务被取消，运行中的任务结束整个进程树，返回是否有操作
+
+        先发送 SIGTERM，grace 秒（默认为 kill_grace_period 设置）后仍未退出时发送 SIGKILL。
+        """
+        if self.cancel(job):
+            return True
+        if job.done() or job.process is None:
+            return False
+        kill_tree(job.process, self.grace_period if grace is None else grace)
+        return True
+
+    def terminate_all(self, detached=True, grace=None, wait=False):
+        """结束所有运行中的任务，返回被结束的任务
+
+        detached 为 False 时不结束不捕获输出的任务（如 GUI 程序）；
+        wait 为 True 时阻塞到进程全部退出（最多等待宽限期）。
+        """
+        jobs = [job for job in self.running_jobs() if detached or not job.spec.detached]
+        terminate_trees([job.process for job in jobs if job.process is not None],
+                        self.grace_period if grace is None else grace, wait=wait)
+        return jobs
+
+    def get_job(self, job_id):
+        return self._jobs.get(job_id)
+
+    def jobs(self):
+        """返回所有任务（按提交顺序）"""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def running_jobs(self):
+        return [job for job in self.jobs() if job.status == Job.RUNNING]
+
+    def shutdown(self, wait=False):
+        """停止接收新任务；已排队的任务会被取消"""
+        self._shutdown = True
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            self.cancel(job)
+        for _ in self._workers:
+            self._queue.put(None)
+            # 等待运行名额的工作线程也能取到结束标记
+            self._slots.release()
+        if wait:
+            for worker in self._workers:
+                worker.join()
+
+    def _ensure_workers(self):
+        # 按需创建工作线程，最多 max_workers 个
+        if len(self._workers) < self.max_workers:
+            worker = threading.Thread(target=self._worker_loop, daemon=True,
+                                      name=f"engine-worker-{len(self._workers) + 1}")
+            self._workers.append(worker)
+            worker.start()
+
+    def _worker_loop(self):
+        while True:
+            self._slots.acquire()
+            job = self._queue.get()
+            if job is None:
+                return
+            if job.status != Job.PENDING:
+                self._slots.release()
+                continue
+            self._run_job(job)
+
+    def _run_job(self, job):
+        spec = job.spec
+        with self._lock:
+            if job.status != Job.PENDING:
+                # 取得运行名额后任务已被取消
+                self._slots.release()
+                return
+            # 启动中的任务不能再被取消；启动进程时不持有锁，不阻塞其他任务的启动和查询
+            job.status = Job.STARTING
+            job.started_at = time.time()
+        try:
+            runner_class = RunnerFactory.get_runner(spec.script_type)
+            runner = runner_class(spec.script, self.config)
+            process = runner.run(
+                arguments=spec.arguments,
+                working_dir=spec.working_dir,
+                show_output=spec.show_output,
+                interactive=spec.interactive
+            )
+            with self._lock:
+                job.process = process
+                job.status = Job.RUNNING
+        except Exception as e:
+            job.error = e
+            job.status = Job.FAILED
+            job.finished_at = time.time()
+            job._done.set()
+            self._slots.release()
+            self._emit("failed", job)
+            return
+
+        recorder = self._capture_output(job)
+        if spec.detached:
+            # 不捕获输出的进程可能长期运行（如 GUI 程序），不占用运行名额
+            self._slots.release()
+        self._emit("started", job)
+        self._start_timer(job)
+
+        if self.supervisor is not None and self.supervisor.watch_exit(
+                job.process, lambda returncode, rusage: self._on_exit(job, recorder, returncode, rusage)):
+            return
+        if spec.detached:
+            # 无法由监视器通知退出时，交给独立线程等待
+            threading.Thread(target=self._wait_job, args=(job, recorder), daemon=True).start()
+        else:
+            self._wait_job(job, recorder)
+
+    def _timeout_of(self, spec):
+        """任务的运行时间上限（秒），不限制时返回 None；设置无效时抛出 ValueError"""
+        for timeout in (spec.timeout, spec.script.get("timeout"), self.default_timeout):
+            if timeout not in (None, ""):
+                try:
+                    timeout = float(timeout)
+                except (TypeError, ValueError):
+                    raise ValueError(f"无效的超时设置: {timeout!r}") from None
+                # 0、负数或无穷大表示不限制
+                return timeout if 0 < timeout < math.inf else None
+        return None
+
+    def _start_timer(self, job):
+        """设置运行时间上限，超时后结束整个进程树"""
+        if job.timeout is not None:
+            job._timer = call_later(job.timeout, self._on_timeout, job, job.timeout)
+
+    def _on_timeout(self, job, timeout):
+        if job.done() or job.returncode is not None:
+            return
+        job.timed_out = True
+        job.error = TimeoutError(f"运行超过 {timeout:g} 秒，已终止")
+        self.terminate(job)
+
+    def _capture_output(self, job):
+        """启动输出读取：原始输出写入运行日志，解码后的文本放入 job.output
+
+        读取在进程启动后立即开始，输出窗口稍后创建也不会丢失输出。
+        """
+        recorder = None
+        if self.run_log is not None:
+            try:
+                recorder = self.run_log.begin_run(job.spec.script, arguments=job.spec.arguments,
+                                                  started_at=job.started_at)
+                job.run_id = recorder.run_id
+            except Exception:
+                recorder = None
+        process = job.process
+        if getattr(process, "stdout", None) is not None or getattr(process, "stderr", None) is not None:
+            job.pump = OutputPump(process)
+            job.output = OutputBuffer()
+            job.pump.subscribe(job.output.append)
+            for listener in job.spec.output_listeners:
+                job.pump.subscribe(lambda stream, text, listener=listener: listener(job, stream, text))
+            if recorder is not None:
+                job.pump.subscribe_raw(recorder.write)
+            job.pump.start()
+        return recorder
+
+    def _reap(self, process):
+        """等待进程退出，返回 (退出码, 资源使用)
+
+        POSIX 下用 os.wait4 回收子进程，同时得到 CPU 时间和峰值内存；
+        预热池进程的资源使用由工作进程回收后提供。
+        """
+        if isinstance(process, subprocess.Popen):
+            return reap(process)
+        returncode = process.wait()
+        return returncode, getattr(process, "rusage", None)
+
+    def _record_exit(self, job, returncode, rusage):
+        job.returncode = returncode
+        job.metrics = {"wall": time.time() - job.started_at}
+        job.metrics.update(rusage_metrics(rusage))
+
+    def _wait_job(self, job, recorder=None):
+        """阻塞等待任务结束（平台不支持进程监视器时使用）"""
+        try:
+            self._record_exit(job, *self._reap(job.process))
+        except Exception as e:
+            job.error = e
+        if job.pump is not None:
+            # 进程退出后等待剩余输出读完（子进程的子进程可能仍持有管道）
+            job.pump.wait_closed(5)
+        self._complete(job, recorder)
+
+    def _on_exit(self, job, recorder, returncode, rusage):
+        """进程退出（在监视线程中调用）：输出读完后交给收尾线程"""
+        try:
+            self._record_exit(job, returncode, rusage)
+        except Exception as e:
+            job.error = e
+        pending = [True]
+
+        def complete():
+            if pending:
+                pending.clear()
+                self._completions.put((job, recorder))
+                self._ensure_completer()
+
+        pump = job.pump
+        if pump is None:
+            complete()
+            return
+        # 子进程的子进程可能仍持有管道，最多再等 5 秒
+        pump.on_close(complete)
+        if pump.closed:
+            complete()
+        else:
+            self.supervisor.call_later(5, complete)
+
+    def _ensure_completer(self):
+        with self._lock:
+            if self._completer is None:
+                self._completer = threading.Thread(target=self._completion_loop, daemon=True,
+                                                   name="engine-complete")
+                self._completer.start()
+
+    def _completion_loop(self):
+        while True:
+            job, recorder = self._completions.get()
+            self._complete(job, recorder)
+
+    def _complete(self, job, recorder=None):
+        """写入运行日志和运行统计，标记任务结束并通知订阅者"""
+        if recorder is not None:
+            try:
+                recorder.finish(job.returncode)
+            except Exception:
+                pass
+        if job._timer is not None:
+            job._timer.cancel()
+        # 删除本次运行的 cgroup
+        release_resources(job.process)
+        job.finished_at = time.time()
+        job.status = Job.FINISHED
+        if self.metrics is not None:
+            try:
+                self.metrics.record_job(job)
+            except Exception:
+                pass
+        if not job.spec.detached:
+            self._slots.release()
+        job._done.set()
+        self._emit("finished", job)
+
+    def _emit(self, event, job):
+        for callback in list(self._listeners):
+            try:
+                callback(event, job)
+            except Exception:
+                pass
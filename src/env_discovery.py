@@ -0,0 +1,244 @@
+import os
+import re
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from src.env_info import EnvInfoCache, default_cache
+
+# 单个解释器的探测超时（秒）
+DEFAULT_PROBE_TIMEOUT = 10
+
+# 默认扫描的虚拟环境目录
+DEFAULT_VENV_ROOTS = ["~/.virtualenvs", "~/venvs", "~/.venvs", "~/envs"]
+
+# 常见的 conda 安装目录
+CONDA_ROOTS = ["~/anaconda3", "~/miniconda3", "~/miniforge3", "~/mambaforge", "~/.conda"]
+
+_PATH_PYTHON_RE = re.compile(r"^python(\d+(\.\d+)?)?(\.exe)?$", re.IGNORECASE)
+
+
+def interpreter_in(env_dir):
+    """返回环境目录中的解释器路径，不是环境时返回 None"""
+    if os.name == 'nt':
+        candidates = ("Scripts/python.exe", "python.exe")
+    else:
+        candidates = ("bin/python", "bin/python3")
+    for candidate in candidates:
+        path = os.path.join(env_dir, candidate)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def _subdirs(root):
+    try:
+        return sorted(entry.path for entry in os.scandir(root) if entry.is_dir())
+    except OSError:
+        return []
+
+
+def scan_venv_roots(roots):
+    """扫描虚拟环境目录：根目录本身或其直接子目录是环境"""
+    found = []
+    for root in roots:
+        root = os.path.expanduser(root)
+        for env_dir in [root] + _subdirs(root):
+            python = interpreter_in(env_dir)
+            if python:
+                found.append(("venv", os.path.basename(env_dir.rstrip("/\\")), python))
+    return found
+
+
+def scan_conda():
+    """扫描 conda：base 环境、envs/ 下的环境以及 ~/.conda/environments.txt 中登记的环境"""
+    roots = [os.path.expanduser(r) for r in CONDA_ROOTS]
+    for var in ("CONDA_PREFIX", "CONDA_ROOT"):
+        if os.environ.get(var):
+            roots.append(os.environ[var])
+    if os.environ.get("CONDA_EXE"):
+        roots.append(str(Path(os.environ["CONDA_EXE"]).parent.parent))
+
+    env_dirs = []
+    for root in roots:
+        env_dirs.append(root)
+        env_dirs.extend(_subdirs(os.path.join(root, "envs")))
+    try:
+        with open(os.path.expanduser("~/.conda/environments.txt"), 'r', encoding='utf-8') as f:
+            env_dirs.extend(line.strip() for line in f if line.strip())
+    except OSError:
+        pass
+
+    found = []
+    for env_dir in env_dirs:
+        python = interpreter_in(env_dir)
+        if python:
+            found.append(("conda", os.path.basename(env_dir.rstrip("/\\")), python))
+    return found
+
+
+def scan_pyenv():
+    """扫描 pyenv 安装的版本"""
+    root = os.environ.get("PYENV_ROOT") or os.path.expanduser("~/.pyenv")
+    found = []
+    for versions in (os.path.join(root, "versions"), os.path.join(root, "pyenv-win", "versions")):
+        for env_dir in _subdirs(versions):
+            python = interpreter_in(env_dir)
+            if python:
+                found.append(("pyenv", os.path.basename(env_dir), python))
+    return found
+
+
+def scan_path():
+    """扫描 PATH 中的 python 可执行文件（指向同一文件的链接只保留一个）"""
+    found = []
+    seen = set()
+    for directory in os.environ.get("PATH", "").split(os.pathsep):
+        try:
+            names = sorted(os.listdir(directory))
+        except OSError:
+            continue
+        for name in names:
+            if not _PATH_PYTHON_RE.match(name):
+                continue
+            path = os.path.join(directory, name)
+            real = os.path.realpath(path)
+            if real in seen or not os.path.isfile(path) or not os.access(path, os.X_OK):
+                continue
+            seen.add(real)
+            found.append(("path", name, path))
+    return found
+
+
+def _first_line(text):
+    # 错误输出可能有多行（如 pyenv shim 的提示），摘要中只显示第一行
+    lines = str(text or "").strip().splitlines()
+    return lines[0] if lines else ""
+
+
+class DiscoveryReport:
+    """一次环境扫描的结果"""
+
+    def __init__(self):
+        self.discovered = []   # 新发现的环境（尚未加入配置）
+        self.healthy = []      # 配置中可正常使用的环境名称
+        self.broken = []       # [(名称, 原因)]：解释器存在但无法运行
+        self.stale = []        # [(名称, 路径)]：解释器已不存在
+        self.failed = []       # [(路径, 原因)]：扫描到但无法运行的解释器
+
+    def summary(self):
+        lines = [f"新发现环境: {len(self.discovered)} 个", f"正常: {len(self.healthy)} 个"]
+        for env in self.discovered:
+            lines.append(f"  + {env['name']}  ({env['path']})")
+        if self.broken:
+            lines.append(f"无法运行: {len(self.broken)} 个")
+            lines.extend(f"  ! {name}: {_first_line(reason)}" for name, reason in self.broken)
+        if self.failed:
+            lines.append(f"扫描到但无法运行: {len(self.failed)} 个")
+            lines.extend(f"  ! {path}: {_first_line(reason)}" for path, reason in self.failed)
+        if self.stale:
+            lines.append(f"已失效（解释器不存在）: {len(self.stale)} 个")
+            lines.extend(f"  - {name}  ({path})" for name, path in self.stale)
+        return "\n".join(lines)
+
+
+def _probe(python_path, timeout, cache=None):
+    """探测解释器的版本和 sys.prefix，返回 (信息, 错误原因)
+
+    环境信息缓存中有有效条目时不启动解释器，否则只运行轻量的版本探测。
+    """
+    info = cache.peek(python_path, packages=False) if cache is not None else None
+    if info is not None and info.get("prefix"):
+        return info, None
+    try:
+        info = EnvInfoCache.probe_version(python_path, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return None, f"超时（{timeout} 秒）"
+    except Exception as e:
+        return None, str(e)
+    if not str(info.get("version", "")).startswith("Python"):
+        return None, info.get("version") or "无法获取版本"
+    return info, None
+
+
+def _unique_name(name, used):
+    candidate, n = name, 1
+    while candidate in used:
+        n += 1
+        candidate = f"{name} ({n})"
+    used.add(candidate)
+    return candidate
+
+
+def discover_environments(config, venv_roots=None, include_path=True,
+                          timeout=DEFAULT_PROBE_TIMEOUT, max_workers=8, cache=None):
+    """并行扫描并检查 Python 环境，返回 DiscoveryReport（不修改配置）
+
+    各来源（虚拟环境目录、conda、pyenv、PATH）并行扫描，随后所有解释器
+    （包括配置中已有的环境）并发探测，每个探测有独立的超时。
+    以 sys.prefix 判断是否为同一环境，避免链接和重复路径被重复添加。
+    cache 为环境信息缓存（默认使用全局缓存），其中仍有效的解释器不再启动。
+    """
+    report = DiscoveryReport()
+    cache = cache if cache is not None else default_cache()
+    existing = [env for env in (config.get("python_environments") or []) if env.get("path")]
+    roots = list(venv_roots) if venv_roots is not None else list(DEFAULT_VENV_ROOTS)
+
+    sources = [lambda: scan_venv_roots(roots), scan_conda, scan_pyenv]
+    if include_path:
+        sources.append(scan_path)
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="env-discovery") as executor:
+        candidates = []
+        for found in executor.map(lambda source: source(), sources):
+            candidates.extend(found)
+
+        # 去除重复路径以及配置中已有的路径
+        known_paths = {EnvInfoCache.key_of(env["path"]) for env in existing}
+        unique = {}
+        for kind, name, path in candidates:
+            key = EnvInfoCache.key_of(path)
+            if key not in known_paths and key not in unique:
+                unique[key] = (kind, name, path)
+        candidates = list(unique.values())
+
+        # 并发探测已有环境和新候选
+        existing_results = list(executor.map(
+            lambda env: _probe(env["path"], timeout, cache) if os.path.exists(env["path"]) else (None, None),
+            existing))
+        candidate_results = list(executor.map(lambda c: _probe(c[2], timeout, cache), candidates))
+
+    known_prefixes = set()
+    for env, (info, error) in zip(existing, existing_results):
+        name = env.get("name", "")
+        if info is not None:
+            report.healthy.append(name)
+            known_prefixes.add(os.path.normcase(info.get("prefix") or ""))
+        elif error is None:
+            report.stale.append((name, env["path"]))
+        else:
+            report.broken.append((name, error))
+
+    used_names = {env.get("name") for env in existing}
+    for (kind, name, path), (info, error) in zip(candidates, candidate_results):
+        if info is None:
+            report.failed.append((path, error))
+            continue
+        prefix = os.path.normcase(info.get("prefix") or "")
+        if prefix and prefix in known_prefixes:
+            continue
+        known_prefixes.add(prefix)
+        version = info["version"].replace("Python ", "")
+        report.discovered.append({
+            "name": _unique_name(f"{name} ({kind})" if kind != "pyenv" else f"pyenv {name}", used_names),
+            "path": path,
+            "description": f"自动发现：{kind}，Python {version}"
+        })
+    return report
+
+
+def merge_environments(config, report):
+    """把扫描到的新环境一次性加入 config["python_environments"]，返回加入的数量"""
+    envs = config.setdefault("python_environments", [])
+    envs.extend(report.discovered)
+    return len(report.discovered)
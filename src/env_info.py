@@ -0,0 +1,373 @@
+import json
+import os
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+# 单次探测的超时时间（秒）
+PROBE_TIMEOUT = 60
+
+# 在目标解释器中运行：输出版本、sys.path、site-packages 目录和已安装的发行包
+_PROBE_SCRIPT = r"""
+import json, sys
+dists = None
+try:
+    from importlib import metadata
+    dists = []
+    for dist in metadata.distributions():
+        name = dist.metadata["Name"]
+        if name:
+            dists.append([name, dist.version or ""])
+except Exception:
+    pass
+dirs = []
+try:
+    import site
+    dirs.extend(site.getsitepackages())
+    dirs.append(site.getusersitepackages())
+except Exception:
+    pass
+dirs.extend(p for p in sys.path if p.endswith(("site-packages", "dist-packages")))
+seen = []
+for d in dirs:
+    if d not in seen:
+        seen.append(d)
+print(json.dumps({
+    "version": "Python " + sys.version.split()[0],
+    "sys_version": sys.version,
+    "executable": sys.executable,
+    "prefix": sys.prefix,
+    "sys_path": sys.path,
+    "site_dirs": seen,
+    "distributions": dists,
+}))
+"""
+
+# 只输出版本和 sys.prefix 的轻量探测（不枚举已安装的包）
+_VERSION_SCRIPT = (
+    "import json, sys; "
+    "print(json.dumps({'version': 'Python ' + sys.version.split()[0], 'prefix': sys.prefix}))"
+)
+
+
+def _startupinfo():
+    if os.name != 'nt':
+        return {}
+    startupinfo = subprocess.STARTUPINFO()
+    startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    startupinfo.wShowWindow = subprocess.SW_HIDE
+    return {"startupinfo": startupinfo, "creationflags": subprocess.CREATE_NO_WINDOW}
+
+
+def _normalize_name(name):
+    return name.lower().replace("_", "-").replace(".", "-")
+
+
+def _read_metadata(path):
+    """从 METADATA/PKG-INFO 中读取 (名称, 版本)"""
+    name = version = None
+    for filename in ("METADATA", "PKG-INFO"):
+        try:
+            with open(os.path.join(path, filename), 'r', encoding='utf-8', errors='replace') as f:
+                for line in f:
+                    if not line.strip():
+                        break
+                    if line.startswith("Name:"):
+                        name = line[5:].strip()
+                    elif line.startswith("Version:"):
+                        version = line[8:].strip()
+        except OSError:
+            continue
+        if name:
+            return name, version or ""
+    return None
+
+
+def scan_distributions(site_dirs):
+    """直接扫描 *.dist-info / *.egg-info 目录获取已安装的包，不启动解释器
+
+    返回按名称排序的 [(名称, 版本)]；同名包以 site_dirs 中靠前的目录为准。
+    """
+    found = {}
+    for site_dir in site_dirs:
+        try:
+            entries = os.listdir(site_dir)
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.endswith(".dist-info"):
+                # 目录名形如 name-version.dist-info，名称中的 "-" 已被替换为 "_"
+                name, sep, version = entry[:-len(".dist-info")].partition("-")
+            elif entry.endswith(".egg-info"):
+                # 形如 name-version-py3.x.egg-info
+                parts = entry[:-len(".egg-info")].split("-")
+                name, sep, version = parts[0], len(parts) > 1, parts[1] if len(parts) > 1 else ""
+            else:
+                continue
+            if not sep:
+                meta = _read_metadata(os.path.join(site_dir, entry))
+                if meta is None:
+                    continue
+                name, version = meta
+            found.setdefault(_normalize_name(name), (name, version))
+    return _unique_sorted(found.values())
+
+
+def _unique_sorted(distributions):
+    # importlib.metadata 会列出 sys.path 上所有副本，同名包只保留第一个
+    found = {}
+    for name, version in distributions:
+        found.setdefault(_normalize_name(name), (name, version))
+    return sorted(found.values(), key=lambda item: item[0].lower())
+
+
+def format_packages(distributions):
+    """把 [(名称, 版本)] 格式化为与 pip list 类似的表格文本"""
+    if not distributions:
+        return ""
+    width = max(len("Package"), max(len(name) for name, _ in distributions))
+    version_width = max(len("Version"), max(len(version) for _, version in distributions))
+    lines = [f"{'Package':<{width}} Version", f"{'-' * width} {'-' * version_width}"]
+    lines.extend(f"{name:<{width}} {version}" for name, version in distributions)
+    return "\n".join(lines)
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class EnvInfoCache:
+    """Python 环境信息缓存
+
+    以解释器路径为键，并记录解释器和各 site-packages 目录的修改时间；
+    安装/卸载包会改变 site-packages 目录的修改时间，使缓存失效。
+    探测在后台线程池中进行，结果分阶段回调：
+        callback(stage, info)，stage 取值为 "version"、"packages"、"done"、"error"
+    """
+
+    def __init__(self, cache_path=None, max_workers=4):
+        self.cache_path = Path(cache_path) if cache_path else None
+        self._entries = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="env-probe")
+        self._load()
+
+    # ---- 持久化 ----
+
+    def _load(self):
+        if self.cache_path is None or not self.cache_path.exists():
+            return
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                self._entries = json.load(f).get("entries", {})
+        except Exception:
+            self._entries = {}
+
+    def _save(self):
+        """写入临时文件后重命名；多个探测线程同时保存时依次写入，文件中总是最新的快照"""
+        if self.cache_path is None:
+            return
+        with self._save_lock:
+            with self._lock:
+                data = json.dumps({"version": 1, "entries": self._entries}, ensure_ascii=False)
+            try:
+                fd, tmp_path = tempfile.mkstemp(prefix=f".{self.cache_path.name}.", suffix=".tmp",
+                                                dir=str(self.cache_path.parent))
+            except OSError:
+                return
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    f.write(data)
+                os.replace(tmp_path, self.cache_path)
+            except OSError:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+
+    # ---- 缓存 ----
+
+    @staticmethod
+    def key_of(python_path):
+        return os.path.normcase(os.path.abspath(str(python_path)))
+
+    @staticmethod
+    def _stamp(python_path, site_dirs):
+        return {
+            "interpreter": _mtime(python_path),
+            "site_dirs": {d: _mtime(d) for d in site_dirs}
+        }
+
+    def peek(self, python_path, packages=True):
+        """返回仍然有效的缓存信息，没有或已失效时返回 None"""
+        key = self.key_of(python_path)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if packages and entry["info"].get("distributions") is None:
+            return None
+        if entry["stamp"] != self._stamp(python_path, entry["info"].get("site_dirs", [])):
+            return None
+        return dict(entry["info"])
+
+    def invalidate(self, python_path=None):
+        with self._lock:
+            if python_path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(self.key_of(python_path), None)
+        self._save()
+
+    def _store(self, python_path, info):
+        entry = {"info": dict(info), "stamp": self._stamp(python_path, info.get("site_dirs", []))}
+        with self._lock:
+            self._entries[self.key_of(python_path)] = entry
+        self._save()
+
+    # ---- 查询 ----
+
+    def get(self, python_path, packages=True):
+        """同步获取环境信息（缓存有效时不启动任何进程）"""
+        return self.probe_async(python_path, packages=packages).result()
+
+    def probe_async(self, python_path, callback=None, packages=True, force=False):
+        """在后台探测环境，返回 Future（结果为信息字典）
+
+        缓存有效时直接在调用线程中回调 "done" 并返回已完成的 Future。
+        同一解释器的并发请求共享一次探测。
+        """
+        callback = callback or (lambda stage, info: None)
+        if not force:
+            info = self.peek(python_path, packages=packages)
+            if info is not None:
+                callback("done", info)
+                future = Future()
+                future.set_result(info)
+                return future
+
+        key = (self.key_of(python_path), packages)
+        with self._lock:
+            state = self._inflight.get(key)
+            if state is not None:
+                state["callbacks"].append(callback)
+                return state["future"]
+            state = {"callbacks": [callback]}
+            self._inflight[key] = state
+            state["future"] = self._executor.submit(self._probe, python_path, packages, key, state)
+            return state["future"]
+
+    def _notify(self, state, stage, info):
+        with self._lock:
+            callbacks = list(state["callbacks"])
+        for callback in callbacks:
+            try:
+                callback(stage, dict(info))
+            except Exception:
+                pass
+
+    def _probe(self, python_path, packages, key, state):
+        try:
+            info = self._rescan(python_path) if packages else None
+            if info is None:
+                info = self.probe_interpreter(python_path)
+            self._notify(state, "version", info)
+            if packages:
+                distributions = info.get("distributions")
+                if distributions is None:
+                    # 没有 importlib.metadata 的旧解释器：直接扫描 site-packages
+                    distributions = scan_distributions(info.get("site_dirs", []))
+                info["distributions"] = _unique_sorted(distributions)
+                info["packages"] = format_packages(info["distributions"])
+                self._notify(state, "packages", info)
+            self._store(python_path, info)
+            self._notify(state, "done", info)
+            return info
+        except Exception as e:
+            info = {"version": "获取失败", "packages": f"错误: {str(e)}", "error": str(e)}
+            self._notify(state, "error", info)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _rescan(self, python_path):
+        """解释器未变化、只有 site-packages 变化时，直接重新扫描包目录而不启动解释器"""
+        with self._lock:
+            entry = self._entries.get(self.key_of(python_path))
+        if entry is None or entry["stamp"].get("interpreter") != _mtime(python_path):
+            return None
+        site_dirs = entry["info"].get("site_dirs") or []
+        if not site_dirs or not any(os.path.isdir(d) for d in site_dirs):
+            return None
+        info = dict(entry["info"])
+        info["distributions"] = scan_distributions(site_dirs)
+        return info
+
+    def packages(self, python_path):
+        """返回环境中已安装的包 [(名称, 版本)]（使用缓存）"""
+        return [tuple(d) for d in self.get(python_path).get("distributions") or []]
+
+    @staticmethod
+    def probe_interpreter(python_path, timeout=PROBE_TIMEOUT):
+        """启动一次目标解释器，获取版本、site-packages 目录和已安装的包"""
+        result = subprocess.run(
+            [str(python_path), "-c", _PROBE_SCRIPT],
+            capture_output=True, text=True, timeout=timeout, **_startupinfo()
+        )
+        try:
+            return json.loads(result.stdout.strip().splitlines()[-1])
+        except (ValueError, IndexError):
+            # 非常旧的解释器：只获取版本号
+            result = subprocess.run(
+                [str(python_path), "--version"],
+                capture_output=True, text=True, timeout=timeout, **_startupinfo()
+            )
+            # 有些环境会把版本输出到 stderr
+            return {"version": (result.stdout or result.stderr).strip(), "site_dirs": []}
+
+    @staticmethod
+    def probe_version(python_path, timeout=PROBE_TIMEOUT):
+        """启动目标解释器，只获取版本和 sys.prefix（不导入 importlib.metadata、不枚举包）"""
+        result = subprocess.run(
+            [str(python_path), "-c", _VERSION_SCRIPT],
+            capture_output=True, text=True, timeout=timeout, **_startupinfo()
+        )
+        try:
+            return json.loads(result.stdout.strip().splitlines()[-1])
+        except (ValueError, IndexError):
+            result = subprocess.run(
+                [str(python_path), "--version"],
+                capture_output=True, text=True, timeout=timeout, **_startupinfo()
+            )
+            return {"version": (result.stdout or result.stderr).strip()}
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def default_cache():
+    """全局共享的环境信息缓存（保存在用户目录下）"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = EnvInfoCache(Path.home() / ".script_manager_env_cache.json")
+        return _default_cache
+
+
+def shutdown_default_cache():
+    """关闭全局缓存的后台线程（未创建时不做任何事）"""
+    with _default_lock:
+        if _default_cache is not None:
+            _default_cache.shutdown()
@@ -0,0 +1,116 @@
+import os
+import re
+import subprocess
+import tempfile
+import time
+
+from src.runners import PythonRunner
+
+# 分析运行的超时时间（秒）
+PROFILE_TIMEOUT = 300
+
+# 保存到脚本条目中的最慢导入数量
+TOP_IMPORTS = 20
+
+# -X importtime 的输出行：import time: self [us] | cumulative | imported package
+_IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+# 在目标解释器中汇总 cProfile 结果（不同版本的 .prof 文件格式可能不兼容）
+_PSTATS_SCRIPT = (
+    "import pstats, sys\n"
+    "stats = pstats.Stats(sys.argv[1])\n"
+    "stats.sort_stats('cumulative').print_stats(int(sys.argv[2]))\n"
+)
+
+
+def parse_importtime(text):
+    """解析 -X importtime 的输出
+
+    返回 [{"module", "self_us", "cumulative_us", "depth"}]，顺序与输出一致
+    （子模块在父模块之前）。非 importtime 的行被忽略。
+    """
+    entries = []
+    for line in text.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, module = match.groups()
+        entries.append({
+            "module": module,
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+            # 包名前的缩进：每层嵌套两个空格
+            "depth": max(0, (len(indent) - 1) // 2)
+        })
+    return entries
+
+
+def summarize(entries, top=TOP_IMPORTS):
+    """汇总导入耗时：总耗时（顶层导入的累计时间之和）和累计耗时最长的模块"""
+    total_us = sum(e["cumulative_us"] for e in entries if e["depth"] == 0)
+    slowest = sorted(entries, key=lambda e: e["cumulative_us"], reverse=True)[:top]
+    return {
+        "total_ms": round(total_us / 1000.0, 2),
+        "module_count": len(entries),
+        "slowest": [
+            {
+                "module": e["module"],
+                "self_ms": round(e["self_us"] / 1000.0, 2),
+                "cumulative_ms": round(e["cumulative_us"] / 1000.0, 2),
+                "depth": e["depth"]
+            }
+            for e in slowest
+        ]
+    }
+
+
+def profile_script(script, config, arguments="", working_dir="", use_cprofile=False,
+                   timeout=PROFILE_TIMEOUT, top=TOP_IMPORTS):
+    """以 -X importtime（可选 cProfile）完整运行一次 Python 脚本并汇总导入耗时
+
+    返回可直接保存到脚本条目中的字典；解释器不支持 -X importtime（< 3.7）时
+    module_count 为 0。
+    """
+    runner = PythonRunner(script, config)
+    cmd = runner.prepare_command(arguments, working_dir)
+    python, rest = cmd[0], cmd[1:]
+    working_dir = working_dir or os.path.dirname(script["path"])
+
+    prof_path = None
+    if use_cprofile:
+        fd, prof_path = tempfile.mkstemp(prefix="script_manager_", suffix=".prof")
+        os.close(fd)
+        rest = ["-m", "cProfile", "-o", prof_path] + rest
+
+    try:
+        started = time.perf_counter()
+        result = subprocess.run(
+            [python, "-X", "importtime"] + rest,
+            cwd=working_dir,
+            stdin=subprocess.DEVNULL,
+            capture_output=True,
+            timeout=timeout
+        )
+        wall_ms = (time.perf_counter() - started) * 1000.0
+        stderr = result.stderr.decode("utf-8", errors="replace")
+
+        profile = summarize(parse_importtime(stderr), top=top)
+        profile.update({
+            "profiled_at": time.time(),
+            "wall_ms": round(wall_ms, 2),
+            "exit_code": result.returncode,
+            "arguments": arguments or ""
+        })
+        if prof_path and os.path.getsize(prof_path):
+            stats = subprocess.run(
+                [python, "-c", _PSTATS_SCRIPT, prof_path, str(top)],
+                capture_output=True, text=True, timeout=60
+            )
+            profile["cprofile"] = stats.stdout.strip()
+        return profile
+    finally:
+        if prof_path:
+            try:
+                os.unlink(prof_path)
+            except OSError:
+                pass
@@ -0,0 +1,217 @@
+import math
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    script TEXT NOT NULL,
+    script_type TEXT,
+    started_at REAL NOT NULL,
+    wall REAL,
+    cpu_user REAL,
+    cpu_system REAL,
+    max_rss_kb INTEGER,
+    exit_code INTEGER,
+    stdout_bytes INTEGER,
+    stderr_bytes INTEGER,
+    warm INTEGER DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS samples_script_time ON samples (script, started_at);
+CREATE INDEX IF NOT EXISTS samples_time ON samples (started_at);
+"""
+
+# 每个脚本的运行按从新到旧编号（rn），聚合查询只取窗口内的行
+_RANKED = ("SELECT *, ROW_NUMBER() OVER (PARTITION BY script ORDER BY started_at DESC, id DESC) AS rn "
+           "FROM samples")
+
+
+def rusage_metrics(rusage):
+    """把 resource.struct_rusage（或预热池返回的字典）转换为指标字典"""
+    if rusage is None:
+        return {}
+    if isinstance(rusage, dict):
+        utime, stime, maxrss = rusage.get("utime"), rusage.get("stime"), rusage.get("maxrss")
+    else:
+        utime, stime, maxrss = rusage.ru_utime, rusage.ru_stime, rusage.ru_maxrss
+    if maxrss is not None and sys.platform == "darwin":
+        # macOS 的 ru_maxrss 单位为字节，Linux 为 KB
+        maxrss //= 1024
+    return {"cpu_user": utime, "cpu_system": stime, "max_rss_kb": maxrss}
+
+
+def percentile(values, fraction):
+    """最近秩法百分位数（values 需已排序）"""
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, math.ceil(fraction * len(values)) - 1))
+    return values[index]
+
+
+class MetricsStore:
+    """运行指标存储：每次运行一行（耗时、CPU 时间、峰值内存、退出码、输出字节数）
+
+    聚合统计在查询时按脚本计算（p50/p95 耗时、失败率等），窗口在 SQL 中截取。
+    retention_days 为记录的保留天数，打开时和每次记录后删除更早的记录（None 表示不清理）。
+    """
+
+    def __init__(self, path, retention_days=None):
+        self.path = Path(path)
+        self.retention_days = retention_days
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._db:
+            self._db.executescript(_SCHEMA)
+        self._expire()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def record(self, script, started_at, wall, exit_code, metrics=None,
+               stdout_bytes=0, stderr_bytes=0, script_type="python", warm=False):
+        metrics = metrics or {}
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO samples (script, script_type, started_at, wall, cpu_user, cpu_system, "
+                "max_rss_kb, exit_code, stdout_bytes, stderr_bytes, warm) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (script, script_type, started_at, wall, metrics.get("cpu_user"),
+                 metrics.get("cpu_system"), metrics.get("max_rss_kb"), exit_code,
+                 stdout_bytes, stderr_bytes, 1 if warm else 0)
+            )
+        self._expire()
+
+    def _expire(self):
+        if self.retention_days:
+            self.prune(time.time() - float(self.retention_days) * 86400)
+
+    def record_job(self, job):
+        """记录执行引擎中已结束的任务"""
+        if job.started_at is None or job.finished_at is None:
+            return
+        bytes_read = job.pump.bytes_read if job.pump is not None else {}
+        metrics = job.metrics or {}
+        self.record(
+            job.name, job.started_at, metrics.get("wall", job.finished_at - job.started_at),
+            job.returncode, metrics=metrics, stdout_bytes=bytes_read.get("stdout", 0),
+            stderr_bytes=bytes_read.get("stderr", 0), script_type=job.spec.script_type,
+            warm=getattr(job.process, "warm", False)
+        )
+
+    # ---- 查询 ----
+
+    @staticmethod
+    def _filters(script=None, since=None):
+        clauses, params = [], []
+        if script:
+            clauses.append("script = ?")
+            params.append(script)
+        if since is not None:
+            clauses.append("started_at >= ?")
+            params.append(since)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def samples(self, script=None, since=None, limit=200):
+        """最近的运行记录（从新到旧）"""
+        where, params = self._filters(script, since)
+        sql = "SELECT * FROM samples" + where + " ORDER BY started_at DESC, id DESC"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        with self._lock:
+            return [dict(row) for row in self._db.execute(sql, params)]
+
+    def stats(self, script=None, since=None, window=None):
+        """按脚本聚合统计，window 为每个脚本最多使用的最近运行次数"""
+        where, params = self._filters(script, since)
+        ranked = f"({_RANKED}{where})"
+        in_window = " AND rn <= ?" if window else ""
+        params_window = params + [int(window)] if window else params
+        with self._lock:
+            summary = self._db.execute(
+                "SELECT script, COUNT(*) AS runs, "
+                "SUM(CASE WHEN exit_code IS NOT NULL AND exit_code != 0 THEN 1 ELSE 0 END) AS failures, "
+                "AVG(cpu_user + cpu_system) AS mean_cpu, MAX(max_rss_kb) AS max_rss_kb, "
+                f"MAX(started_at) AS last_run FROM {ranked} WHERE 1{in_window} "
+                "GROUP BY script ORDER BY script", params_window
+            ).fetchall()
+            walls = {}
+            for name, wall in self._db.execute(
+                    f"SELECT script, wall FROM {ranked} WHERE wall IS NOT NULL{in_window} "
+                    "ORDER BY script, wall", params_window):
+                walls.setdefault(name, []).append(wall)
+        result = []
+        for row in summary:
+            script_walls = walls.get(row["script"], [])
+            result.append({
+                "script": row["script"],
+                "runs": row["runs"],
+                "failure_rate": row["failures"] / row["runs"] if row["runs"] else 0.0,
+                "p50": percentile(script_walls, 0.5),
+                "p95": percentile(script_walls, 0.95),
+                "mean_cpu": row["mean_cpu"],
+                "max_rss_kb": row["max_rss_kb"],
+                "last_run": row["last_run"]
+            })
+        return result
+
+    def regressions(self, recent=10, baseline=50, threshold=1.5, min_runs=5):
+        """找出最近 recent 次运行的中位耗时比之前 baseline 次高出 threshold 倍的脚本"""
+        grouped = {}
+        with self._lock:
+            for name, rn, wall in self._db.execute(
+                    f"SELECT script, rn, wall FROM ({_RANKED}) WHERE rn <= ? AND wall IS NOT NULL",
+                    (int(recent) + int(baseline),)):
+                latest, before = grouped.setdefault(name, ([], []))
+                (latest if rn <= recent else before).append(wall)
+        found = []
+        for name, (latest, before) in sorted(grouped.items()):
+            if len(latest) < min_runs or len(before) < min_runs:
+                continue
+            now, then = percentile(sorted(latest), 0.5), percentile(sorted(before), 0.5)
+            if then and now / then >= threshold:
+                found.append({"script": name, "recent_p50": now, "baseline_p50": then,
+                              "ratio": now / then})
+        return sorted(found, key=lambda item: item["ratio"], reverse=True)
+
+    def prune(self, before):
+        """删除 before 时间之前的记录"""
+        with self._lock, self._db:
+            return self._db.execute("DELETE FROM samples WHERE started_at < ?", (before,)).rowcount
+
+
+def format_stats(stats):
+    """把聚合统计格式化为文本表格"""
+    header = f"{'脚本':<24} {'次数':>6} {'失败率':>7} {'p50(s)':>9} {'p95(s)':>9} {'CPU(s)':>8} {'内存(MB)':>9}"
+    lines = [header]
+
+    def num(value, fmt):
+        return format(value, fmt) if value is not None else "-"
+
+    for s in stats:
+        rss = s["max_rss_kb"] / 1024.0 if s["max_rss_kb"] is not None else None
+        lines.append(
+            f"{s['script'][:24]:<24} {s['runs']:>6} {s['failure_rate'] * 100:>6.1f}% "
+            f"{num(s['p50'], '9.3f')} {num(s['p95'], '9.3f')} {num(s['mean_cpu'], '8.3f')} {num(rss, '9.1f')}"
+        )
+    return "\n".join(lines)
+
+
+def default_metrics_path():
+    return Path.home() / "script_manager_metrics.sqlite"
+
+
+def open_metrics(settings):
+    """按设置打开运行统计；未启用或无法打开时返回 None"""
+    if not settings.get("metrics_enabled", True):
+        return None
+    try:
+        return MetricsStore(settings.get("metrics_path") or default_metrics_path(),
+                            retention_days=settings.get("metrics_retention_days"))
+    except Exception:
+        return None
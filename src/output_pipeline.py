@@ -0,0 +1,436 @@
+import atexit
+import codecs
+import locale
+import mmap
+import os
+import re
+import tempfile
+import threading
+import time
+import weakref
+from collections import deque
+
+# 单次读取的最大字节数
+CHUNK_SIZE = 64 * 1024
+
+
+def default_encoding():
+    """子进程输出的默认编码（与 text=True 时 subprocess 使用的编码一致）"""
+    return locale.getpreferredencoding(False) or "utf-8"
+
+
+class OutputPump:
+    """从子进程的 stdout/stderr 分块读取输出并增量解码（与 Tk 无关）
+
+    订阅者签名：
+      - subscribe(callback)      callback(stream, text)，stream 为 "stdout"/"stderr"
+      - subscribe_raw(callback)  callback(stream, data)，data 为原始 bytes
+      - on_close(callback)       所有管道读到 EOF 后调用 callback()
+
+    POSIX 下管道交给共享的 ProcessSupervisor 统一监视，回调在监视线程中执行，
+    应尽快返回；其他平台（或管道没有文件描述符时）为每个管道启动一个读取线程。
+    """
+
+    def __init__(self, process, encoding=None, chunk_size=CHUNK_SIZE):
+        self.process = process
+        self.encoding = encoding or default_encoding()
+        self.chunk_size = chunk_size
+        self._listeners = []
+        self._raw_listeners = []
+        self._close_listeners = []
+        self._open_streams = 0
+        self._lock = threading.Lock()
+        self._closed_event = threading.Event()
+        self.bytes_read = {"stdout": 0, "stderr": 0}
+
+    def subscribe(self, callback):
+        self._listeners.append(callback)
+
+    def subscribe_raw(self, callback):
+        self._raw_listeners.append(callback)
+
+    def on_close(self, callback):
+        self._close_listeners.append(callback)
+
+    @property
+    def closed(self):
+        """所有管道是否都已读到 EOF"""
+        return self._closed_event.is_set()
+
+    def wait_closed(self, timeout=None):
+        return self._closed_event.wait(timeout)
+
+    def start(self):
+        """开始读取：优先注册到进程监视器，否则为每个管道启动一个读取线程"""
+        from src.supervisor import default_supervisor
+        streams = [(name, getattr(self.process, name, None)) for name in ("stdout", "stderr")]
+        streams = [(name, pipe) for name, pipe in streams if pipe is not None]
+        self._open_streams = len(streams)
+        if not streams:
+            self._closed()
+            return
+        supervisor = default_supervisor()
+        for name, pipe in streams:
+            decoder = codecs.getincrementaldecoder(self.encoding)(errors="replace")
+            if supervisor is not None and supervisor.add_reader(
+                    pipe,
+                    lambda data, name=name, decoder=decoder: self.feed(name, data, decoder),
+                    lambda name=name, decoder=decoder: self._stream_eof(name, decoder)):
+                continue
+            thread = threading.Thread(target=self._read_loop, args=(name, pipe, decoder), daemon=True,
+                                      name=f"output-{name}")
+            thread.start()
+
+    def _stream_eof(self, name, decoder):
+        """一个管道读到 EOF：输出解码器中剩余的文本，所有管道都关闭后通知订阅者"""
+        try:
+            tail = decoder.decode(b"", final=True)
+            if tail:
+                self._deliver(name, tail)
+        finally:
+            with self._lock:
+                self._open_streams -= 1
+                done = self._open_streams <= 0
+            if done:
+                self._closed()
+
+    def _read_loop(self, name, pipe, decoder):
+        read = getattr(pipe, "read1", None)
+        try:
+            fd = pipe.fileno()
+        except (AttributeError, OSError, ValueError):
+            fd = None
+        try:
+            while True:
+                # 优先使用 os.read：有多少读多少，不会为凑满缓冲区而阻塞
+                if fd is not None:
+                    data = os.read(fd, self.chunk_size)
+                elif read is not None:
+                    data = read(self.chunk_size)
+                else:
+                    data = pipe.read(self.chunk_size)
+                if not data:
+                    break
+                self.feed(name, data, decoder)
+        except (OSError, ValueError):
+            pass
+        finally:
+            try:
+                pipe.close()
+            except Exception:
+                pass
+            self._stream_eof(name, decoder)
+
+    def feed(self, name, data, decoder):
+        """处理一块原始输出"""
+        self.bytes_read[name] = self.bytes_read.get(name, 0) + len(data)
+        for callback in self._raw_listeners:
+            try:
+                callback(name, data)
+            except Exception:
+                pass
+        text = decoder.decode(data)
+        if text:
+            self._deliver(name, text)
+
+    def _deliver(self, name, text):
+        for callback in self._listeners:
+            try:
+                callback(name, text)
+            except Exception:
+                pass
+
+    def _closed(self):
+        self._closed_event.set()
+        for callback in self._close_listeners:
+            try:
+                callback()
+            except Exception:
+                pass
+
+
+# 单行超过该长度时才在行中间截断（否则整行放在同一帧中插入）
+MAX_LINE_CHARS = 1024 * 1024
+
+
+class OutputBuffer:
+    """线程安全的输出缓冲：合并相邻的同流文本，按帧批量取出"""
+
+    def __init__(self):
+        self._spans = deque()
+        self._lock = threading.Lock()
+        self.pending_chars = 0
+
+    def append(self, stream, text):
+        with self._lock:
+            if self._spans and self._spans[-1][0] == stream:
+                self._spans[-1][1].append(text)
+            else:
+                self._spans.append((stream, [text]))
+            self.pending_chars += len(text)
+
+    def __bool__(self):
+        return self.pending_chars > 0
+
+    def drain(self, max_chars=None):
+        """取出约 max_chars 个字符，返回 [(stream, text)]，相邻同流文本已合并
+
+        只在换行处截断，放不下的行留到下一帧；一帧中第一行就超出预算时整行取出，
+        超过 MAX_LINE_CHARS 的行才在中间截断。
+        """
+        result = []
+        with self._lock:
+            budget = max_chars if max_chars is not None else self.pending_chars
+            while self._spans and budget > 0:
+                stream, parts = self._spans[0]
+                text = "".join(parts)
+                cut = len(text)
+                if cut > budget:
+                    cut = text.rfind("\n", 0, budget) + 1
+                    if not cut:
+                        if result:
+                            # 放不下的行整行留到下一帧
+                            parts[:] = [text]
+                            break
+                        end = text.find("\n", budget) + 1 or len(text)
+                        cut = min(end, max(budget, MAX_LINE_CHARS))
+                if cut < len(text):
+                    parts[:] = [text[cut:]]
+                    text = text[:cut]
+                else:
+                    self._spans.popleft()
+                result.append((stream, text))
+                budget -= len(text)
+                self.pending_chars -= len(text)
+        return result
+
+
+# 需要解释或丢弃的控制字符和转义序列：换行、回车、退格、CSI（光标/擦除/颜色）、OSC（窗口标题）、其他 ESC 序列
+_CONTROL_RE = re.compile(r"\n|\r|\x08|\x1b\[[0-?]*[ -/]*[@-~]|\x1b\][^\x07\x1b]*(?:\x07|\x1b\\)|\x1b[@-Z\\-_]?")
+# 被分块截断、需要与下一块拼接的转义序列
+_PARTIAL_ESCAPE_RE = re.compile(r"\x1b(?:\[[0-?]*[ -/]*|\][^\x07\x1b]*)?$")
+# 超过该长度仍未结束的转义序列按普通文本处理，避免缺少结束符时输出一直被扣留
+MAX_ESCAPE_LENGTH = 256
+
+
+class LineCoalescer:
+    """把回车（\\r）和 ANSI 光标控制解释为对当前行的原地修改
+
+    tqdm 等进度条每秒输出成千上万次以 \\r 结尾的更新，feed() 只返回已换行的完整行，
+    未换行的当前行保存在 line 中（后续的 \\r 更新直接覆盖它），显示端按刷新频率
+    重绘这一行即可。支持的控制：\\r、退格、CSI K（擦除行）、G（移到列）、C/D（左右移动）；
+    颜色等其他转义序列从显示文本中去掉。原始输出不经过这里，运行日志保持不变。
+    """
+
+    def __init__(self):
+        self.line = ""      # 当前（尚未换行的）行
+        self.cursor = 0     # 光标在当前行中的位置
+        self._pending = ""  # 上一块末尾被截断的转义序列
+
+    def feed(self, text):
+        """处理一块文本，返回其中已完成的行（含换行符）"""
+        if self._pending:
+            text = self._pending + text
+            self._pending = ""
+        if "\x1b" in text:
+            match = _PARTIAL_ESCAPE_RE.search(text)
+            if match and len(text) - match.start() <= MAX_ESCAPE_LENGTH:
+                self._pending = match.group()
+                text = text[:match.start()]
+        if "\r" in text:
+            text = text.replace("\r\n", "\n")
+        if self.cursor == len(self.line) and "\r" not in text and "\x1b" not in text and "\x08" not in text:
+            # 快速路径：普通文本只需在最后一个换行处切分
+            end = text.rfind("\n") + 1
+            if not end:
+                self.line += text
+                self.cursor = len(self.line)
+                return ""
+            committed = self.line + text[:end]
+            self.line = text[end:]
+            self.cursor = len(self.line)
+            return committed
+
+        committed = []
+        pos = 0
+        for match in _CONTROL_RE.finditer(text):
+            if match.start() > pos:
+                self._write(text[pos:match.start()])
+            pos = match.end()
+            token = match.group()
+            if token == "\n":
+                committed.append(self.line + "\n")
+                self.line = ""
+                self.cursor = 0
+            elif token == "\r":
+                self.cursor = 0
+            elif token == "\x08":
+                self.cursor = max(0, self.cursor - 1)
+            elif token.startswith("\x1b["):
+                self._csi(token[2:-1], token[-1])
+        if pos < len(text):
+            self._write(text[pos:])
+        return "".join(committed)
+
+    def _write(self, text):
+        line, cursor = self.line, self.cursor
+        if cursor > len(line):
+            line += " " * (cursor - len(line))
+        self.line = line[:cursor] + text + line[cursor + len(text):]
+        self.cursor = cursor + len(text)
+
+    def _csi(self, params, final):
+        n = int(params) if params.isdigit() else None
+        if final == "K":
+            if not n:
+                self.line = self.line[:self.cursor]
+            elif n == 1:
+                self.line = " " * (self.cursor + 1) + self.line[self.cursor + 1:]
+            else:
+                self.line = ""
+        elif final == "G":
+            self.cursor = max(0, (n or 1) - 1)
+        elif final == "C":
+            self.cursor += n or 1
+        elif final == "D":
+            self.cursor = max(0, self.cursor - (n or 1))
+        # 其他序列（颜色、光标上移、清屏等）无法在文本框中表现，忽略
+
+    def flush(self):
+        """结束时取出未换行的当前行"""
+        line = self.line
+        self.line = ""
+        self.cursor = 0
+        self._pending = ""
+        return line
+
+
+class FrameBudget:
+    """自适应帧预算：根据上一帧插入耗时调整每帧处理的字符数"""
+
+    def __init__(self, target_ms=16, initial=64 * 1024, minimum=4 * 1024, maximum=4 * 1024 * 1024):
+        self.target = target_ms / 1000.0
+        self.chars = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self._start = None
+
+    def begin(self):
+        self._start = time.perf_counter()
+
+    def end(self, used_chars):
+        elapsed = time.perf_counter() - self._start
+        if elapsed > self.target:
+            self.chars = max(self.minimum, int(self.chars * self.target / elapsed))
+        elif used_chars >= self.chars and elapsed < self.target / 2:
+            # 预算被用完且耗时较少，下一帧可以处理更多
+            self.chars = min(self.maximum, self.chars * 2)
+        return elapsed
+
+
+# 尚未关闭且需要在退出时删除的磁盘日志
+_open_spill_logs = weakref.WeakSet()
+
+
+@atexit.register
+def _close_spill_logs():
+    for log in list(_open_spill_logs):
+        log.close()
+
+
+class SpillLog:
+    """把完整输出写入磁盘日志，并支持按行号随机读取
+
+    只在内存中保存稀疏的行偏移检查点（每 CHECKPOINT 行一个），
+    读取时通过 mmap 映射日志文件，从最近的检查点向后查找，按需解码。
+    POSIX 下日志文件创建后立即删除（打开的文件仍可读写和映射），管理器如何退出都不会留下文件；
+    其他平台在关闭或退出时删除。
+    """
+
+    CHECKPOINT = 1024
+
+    def __init__(self, directory=None, prefix="script_manager_output_"):
+        fd, self.path = tempfile.mkstemp(prefix=prefix, suffix=".log", dir=directory)
+        self._file = os.fdopen(fd, 'w+b')
+        if os.name == "posix":
+            os.unlink(self.path)
+            self.path = None
+        else:
+            _open_spill_logs.add(self)
+        self._lock = threading.Lock()
+        self._size = 0
+        self._checkpoints = [0]   # 第 i*CHECKPOINT 行的起始偏移
+        self.line_count = 0       # 已完成（以换行结尾）的行数
+        self._mmap = None
+        self._mmap_size = 0
+
+    def append(self, text):
+        """追加文本，返回追加前的行数"""
+        data = text.encode('utf-8', errors='replace')
+        with self._lock:
+            start_line = self.line_count
+            pos = data.find(b"\n")
+            while pos != -1:
+                self.line_count += 1
+                if self.line_count % self.CHECKPOINT == 0:
+                    self._checkpoints.append(self._size + pos + 1)
+                pos = data.find(b"\n", pos + 1)
+            self._file.write(data)
+            self._size += len(data)
+            return start_line
+
+    def _map(self):
+        if self._mmap is None or self._mmap_size != self._size:
+            self._file.flush()
+            if self._mmap is not None:
+                self._mmap.close()
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self._size else None
+            self._mmap_size = self._size
+        return self._mmap
+
+    def _offset_of(self, mm, line):
+        """第 line 行（从 0 开始）的起始偏移"""
+        index = min(line // self.CHECKPOINT, len(self._checkpoints) - 1)
+        offset = self._checkpoints[index]
+        current = index * self.CHECKPOINT
+        while current < line:
+            pos = mm.find(b"\n", offset)
+            if pos == -1:
+                return self._size
+            offset = pos + 1
+            current += 1
+        return offset
+
+    def read_lines(self, start, end):
+        """读取 [start, end) 行的文本"""
+        with self._lock:
+            start = max(0, start)
+            end = min(end, self.line_count + 1)
+            if end <= start:
+                return ""
+            mm = self._map()
+            if mm is None:
+                return ""
+            begin = self._offset_of(mm, start)
+            finish = self._offset_of(mm, end) if end <= self.line_count else self._size
+            return mm[begin:finish].decode('utf-8', errors='replace')
+
+    @property
+    def size(self):
+        return self._size
+
+    def close(self, delete=True):
+        with self._lock:
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
+            try:
+                self._file.close()
+            except Exception:
+                pass
+            _open_spill_logs.discard(self)
+            if delete and self.path is not None:
+                try:
+                    os.unlink(self.path)
+                except OSError:
+                    pass
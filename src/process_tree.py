@@ -0,0 +1,143 @@
+import os
+import signal
+import subprocess
+import time
+
+from src.supervisor import call_later
+
+# 先请求退出，超过宽限期（秒）仍未退出时强制结束
+GRACE_PERIOD = 5
+
+# 退出管理器时对仍在运行的脚本的处理方式
+EXIT_KEEP = "keep"          # 不处理，脚本继续运行
+EXIT_ATTACHED = "attached"  # 结束捕获输出的脚本，不捕获输出的程序（如 GUI 程序）继续运行
+EXIT_ALL = "all"            # 结束全部脚本
+EXIT_POLICIES = (EXIT_KEEP, EXIT_ATTACHED, EXIT_ALL)
+
+
+def new_group_options():
+    """让子进程成为新进程组（POSIX 下为新会话）组长的 Popen 参数"""
+    if os.name == "posix":
+        return {"start_new_session": True}
+    return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+
+
+def group_of(process):
+    """进程所在的独立进程组 ID；进程没有自己的进程组（与管理器同组）时返回 None
+
+    启动时记录的 pgid 优先：组长被回收后进程组仍可能有成员。
+    """
+    if os.name != "posix":
+        return None
+    pgid = getattr(process, "pgid", None)
+    if pgid is None:
+        try:
+            pgid = os.getpgid(process.pid)
+        except OSError:
+            return None
+    if pgid != process.pid or pgid == os.getpgrp():
+        return None
+    return pgid
+
+
+def signal_tree(process, sig):
+    """向进程所在的进程组发送信号，没有独立进程组时只发给进程本身；返回是否仍有进程"""
+    pgid = group_of(process)
+    try:
+        if pgid is not None:
+            os.killpg(pgid, sig)
+        elif process.returncode is None:
+            process.send_signal(sig)
+        else:
+            return False
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+def _alive(process):
+    pgid = group_of(process)
+    if pgid is None:
+        return process.returncode is None
+    try:
+        os.killpg(pgid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+def interrupt(process):
+    """转发中断（相当于在终端中按 Ctrl+C）给整个进程组"""
+    if os.name == "posix":
+        return signal_tree(process, signal.SIGINT)
+    try:
+        process.send_signal(signal.CTRL_BREAK_EVENT)
+    except OSError:
+        return False
+    return True
+
+
+def _taskkill(process, force):
+    cmd = ["taskkill", "/T", "/PID", str(process.pid)]
+    if force:
+        cmd.insert(1, "/F")
+    try:
+        subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                       creationflags=subprocess.CREATE_NO_WINDOW)
+    except OSError:
+        pass
+
+
+def _terminate(process):
+    if os.name == "posix":
+        return signal_tree(process, signal.SIGTERM)
+    _taskkill(process, force=False)
+    return True
+
+
+def _kill(process):
+    """强制结束进程树；有 cgroup 时同时结束 cgroup 中脱离了进程组的进程"""
+    limits = getattr(process, "resource_limits", None)
+    if limits is not None:
+        limits.kill()
+    if os.name == "posix":
+        signal_tree(process, signal.SIGKILL)
+    else:
+        _taskkill(process, force=True)
+
+
+def kill_tree(process, grace=GRACE_PERIOD):
+    """结束进程及其子进程：先发送 SIGTERM，grace 秒后仍有进程时发送 SIGKILL
+
+    立即返回，升级由进程监视器的定时器完成。Windows 上依次使用 taskkill /T 和 taskkill /T /F。
+    """
+    terminate_trees([process], grace, wait=False)
+
+
+def terminate_trees(processes, grace=GRACE_PERIOD, wait=False):
+    """结束多个进程树；wait 为 True 时阻塞到全部退出（最多 grace 秒后强制结束）"""
+    grace = GRACE_PERIOD if grace is None else max(0.0, float(grace))
+    processes = [process for process in processes if _terminate(process)]
+    if not processes:
+        return
+    if not wait:
+        for process in processes:
+            call_later(grace, _escalate, process)
+        return
+    deadline = time.monotonic() + grace
+    while time.monotonic() < deadline:
+        processes = [process for process in processes if _alive(process)]
+        if not processes:
+            return
+        time.sleep(0.05)
+    for process in processes:
+        _kill(process)
+
+
+def _escalate(process):
+    if _alive(process):
+        _kill(process)
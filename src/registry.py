@@ -0,0 +1,248 @@
+import itertools
+import os
+
+DEFAULT_CATEGORY = "其他"
+
+
+def normalize_path(path):
+    """规范化路径用于索引比较"""
+    if not path:
+        return ""
+    return os.path.normcase(os.path.normpath(str(path)))
+
+
+class ScriptRegistry:
+    """脚本注册表
+
+    脚本仍然保存在 config["scripts"][分类] 列表中（用于持久化），
+    注册表为每个脚本分配一个运行期 ID，并维护以下索引：
+      - (分类, 类型, 名称) -> ID
+      - 规范化路径 -> ID 集合
+      - 标签 -> ID 集合
+      - (分类, 类型) -> 有序 ID 集合
+    所有修改都应通过注册表完成，以保持索引同步。
+
+    监听器签名为 callback(action, sid)，action 取值为
+    "add"、"update"、"remove"、"reset"（reset 时 sid 为 None）。
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self._ids = itertools.count(1)
+        self._listeners = []
+        self.rebuild()
+
+    # ---- 索引维护 ----
+
+    def rebuild(self):
+        """根据 config["scripts"] 重建全部索引"""
+        self._scripts = {}
+        self._category = {}
+        self._identity = {}
+        self._by_key = {}
+        self._by_path = {}
+        self._by_tag = {}
+        self._by_group = {}
+        scripts = self.config.setdefault("scripts", {})
+        for category, script_list in scripts.items():
+            for script in script_list:
+                self._index(next(self._ids), script, category)
+        self._notify("reset", None)
+
+    @staticmethod
+    def _key(script, category):
+        return (category, script.get("script_type", "python"), script.get("name", ""))
+
+    @staticmethod
+    def _tags(script):
+        tags = script.get("tags") or []
+        if isinstance(tags, str):
+            tags = [tags]
+        return [str(t) for t in tags]
+
+    def _index(self, sid, script, category, group=True):
+        self._scripts[sid] = script
+        self._category[sid] = category
+        self._identity[id(script)] = sid
+        key = self._key(script, category)
+        self._by_key.setdefault(key, []).append(sid)
+        self._by_path.setdefault(normalize_path(script.get("path")), set()).add(sid)
+        for tag in self._tags(script):
+            self._by_tag.setdefault(tag, set()).add(sid)
+        if group:
+            self._by_group.setdefault(key[:2], {})[sid] = None
+
+    def _unindex(self, sid, group=True):
+        script = self._scripts.pop(sid)
+        category = self._category.pop(sid)
+        self._identity.pop(id(script), None)
+        key = self._key(script, category)
+        self._discard(self._by_key, key, sid)
+        self._discard(self._by_path, normalize_path(script.get("path")), sid)
+        for tag in self._tags(script):
+            self._discard(self._by_tag, tag, sid)
+        members = self._by_group.get(key[:2]) if group else None
+        if members is not None:
+            members.pop(sid, None)
+            if not members:
+                del self._by_group[key[:2]]
+        return script, category
+
+    @staticmethod
+    def _discard(index, key, sid):
+        sids = index.get(key)
+        if sids is None:
+            return
+        if isinstance(sids, list):
+            if sid in sids:
+                sids.remove(sid)
+        else:
+            sids.discard(sid)
+        if not sids:
+            del index[key]
+
+    # ---- 监听 ----
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        try:
+            self._listeners.remove(callback)
+        except ValueError:
+            pass
+
+    def _notify(self, action, sid):
+        for callback in list(self._listeners):
+            callback(action, sid)
+
+    # ---- 查询 ----
+
+    def __len__(self):
+        return len(self._scripts)
+
+    def __contains__(self, sid):
+        return sid in self._scripts
+
+    def get(self, sid):
+        """按 ID 获取脚本条目"""
+        return self._scripts.get(sid)
+
+    def category_of(self, sid):
+        return self._category.get(sid)
+
+    def key_of(self, sid):
+        """返回脚本的 (分类, 类型, 名称)"""
+        script = self._scripts.get(sid)
+        if script is None:
+            return None
+        return self._key(script, self._category[sid])
+
+    def id_of(self, script):
+        """根据脚本条目对象查找 ID"""
+        return self._identity.get(id(script))
+
+    def find(self, category, script_type, name):
+        """按 (分类, 类型, 名称) 查找脚本 ID"""
+        sids = self._by_key.get((category, script_type, name))
+        return sids[0] if sids else None
+
+    def find_by_name(self, name, script_type=None):
+        """按名称查找脚本 ID 列表（不限分类）"""
+        return [
+            sid for sid, script in self._scripts.items()
+            if script.get("name") == name
+            and (script_type is None or script.get("script_type", "python") == script_type)
+        ]
+
+    def find_by_path(self, path):
+        return sorted(self._by_path.get(normalize_path(path), ()))
+
+    def find_by_tag(self, tag):
+        return sorted(self._by_tag.get(str(tag), ()))
+
+    def tags(self):
+        return sorted(self._by_tag)
+
+    def ids_in(self, category, script_type):
+        """返回某分类下指定类型的脚本 ID（保持配置中的顺序）"""
+        return list(self._by_group.get((category, script_type), ()))
+
+    def has_scripts(self, category, script_type):
+        return bool(self._by_group.get((category, script_type)))
+
+    def items(self, script_type=None):
+        """遍历 (ID, 脚本)"""
+        for sid, script in self._scripts.items():
+            if script_type is None or script.get("script_type", "python") == script_type:
+                yield sid, script
+
+    def categories(self):
+        return list(self.config.get("scripts", {}).keys())
+
+    # ---- 修改 ----
+
+    def add(self, script, category=None):
+        """添加脚本，返回新 ID"""
+        scripts = self.config.setdefault("scripts", {})
+        category = category or script.get("category") or DEFAULT_CATEGORY
+        if category not in scripts:
+            category = self.config.get("settings", {}).get("default_category", DEFAULT_CATEGORY)
+            scripts.setdefault(category, [])
+        script["category"] = category
+        scripts[category].append(script)
+        sid = next(self._ids)
+        self._index(sid, script, category)
+        self._notify("add", sid)
+        return sid
+
+    def update(self, sid, changes=None, category=None, removed=()):
+        """更新脚本字段，必要时移动到新分类；removed 中的字段从条目中删除"""
+        old_script = self._scripts[sid]
+        new_category = category or self._category[sid]
+        new_type = (changes or {}).get("script_type", old_script.get("script_type", "python"))
+        # 分类和类型都不变时保留脚本在分组中的位置
+        same_group = self.key_of(sid)[:2] == (new_category, new_type)
+
+        script, old_category = self._unindex(sid, group=not same_group)
+        if changes:
+            script.update(changes)
+        for field in removed:
+            script.pop(field, None)
+        if new_category != old_category:
+            scripts = self.config.setdefault("scripts", {})
+            scripts.setdefault(new_category, [])
+            self._detach(scripts.get(old_category), script)
+            scripts[new_category].append(script)
+            script["category"] = new_category
+        self._index(sid, script, new_category, group=not same_group)
+        self._notify("update", sid)
+        return script
+
+    def remove(self, sid):
+        """删除脚本"""
+        script, category = self._unindex(sid)
+        self._detach(self.config.get("scripts", {}).get(category), script)
+        self._notify("remove", sid)
+        return script
+
+    @staticmethod
+    def _detach(script_list, script):
+        # 按对象而不是按相等比较：分类中可能有字段完全相同的两个条目
+        index = next((i for i, s in enumerate(script_list or ()) if s is script), None)
+        if index is not None:
+            del script_list[index]
+
+    def add_category(self, category):
+        self.config.setdefault("scripts", {}).setdefault(category, [])
+
+    def remove_category(self, category, move_to=DEFAULT_CATEGORY):
+        """删除分类，其中的脚本移动到 move_to 分类"""
+        scripts = self.config.setdefault("scripts", {})
+        if category == move_to or category not in scripts:
+            return
+        for script in list(scripts[category]):
+            sid = self.id_of(script)
+            if sid is not None:
+                self.update(sid, category=move_to)
+        scripts.pop(category, None)
@@ -0,0 +1,286 @@
+import itertools
+import os
+import shutil
+import subprocess
+
+# ionice 的调度类别
+IONICE_CLASSES = {"realtime": "1", "best-effort": "2", "idle": "3"}
+
+# 每次运行在委派的 cgroup 子树中创建的叶子 cgroup 名称前缀
+CGROUP_PREFIX = "run"
+
+_cgroup_ids = itertools.count(1)
+
+
+def _merge(base, override):
+    result = dict(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(result.get(key), dict):
+            result[key] = {**result[key], **value}
+        else:
+            result[key] = value
+    return result
+
+
+def _lookup(profiles, value):
+    """resources 字段可以是 resource_profiles 中的名称，也可以直接写配置"""
+    if not value:
+        return {}
+    if isinstance(value, dict):
+        return value
+    profile = profiles.get(value)
+    if profile is None:
+        raise ValueError(f"找不到资源配置: {value}")
+    return profile
+
+
+def resolve_profile(config, script):
+    """脚本生效的资源配置：分类的配置在前，脚本自己的配置覆盖同名项
+
+    settings.resource_profiles 定义命名配置，settings.category_resources
+    为分类指定配置，脚本条目的 resources 字段为单个脚本指定配置。
+    """
+    settings = (config or {}).get("settings", {})
+    profiles = settings.get("resource_profiles") or {}
+    category = (settings.get("category_resources") or {}).get(script.get("category"))
+    return _merge(_lookup(profiles, category), _lookup(profiles, script.get("resources")))
+
+
+def parse_cpu_list(value):
+    """把 [0, 1] 或 "0-3,6" 形式的 CPU 列表转换为集合"""
+    if isinstance(value, int):
+        return {value}
+    if isinstance(value, (list, tuple, set)):
+        return {int(cpu) for cpu in value}
+    cpus = set()
+    for part in str(value).split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-", 1)
+            cpus.update(range(int(start), int(end) + 1))
+        else:
+            cpus.add(int(part))
+    return cpus
+
+
+def parse_ionice(value):
+    """ionice 配置（"idle"、"best-effort:7" 或 {"class": ..., "level": ...}）转换为命令行参数"""
+    if isinstance(value, dict):
+        name, level = value.get("class"), value.get("level")
+    else:
+        name, _, level = str(value).partition(":")
+    name = str(name).strip().lower()
+    if name not in IONICE_CLASSES:
+        raise ValueError(f"不支持的 ionice 类别: {name}")
+    args = ["-c", IONICE_CLASSES[name]]
+    if level not in (None, "") and name != "idle":
+        level = int(level)
+        if not 0 <= level <= 7:
+            raise ValueError(f"ionice 优先级应在 0-7 之间: {level}")
+        args += ["-n", str(level)]
+    return args
+
+
+def _windows_priority(nice):
+    """Windows 没有 nice 值，按区间换算为进程优先级类别"""
+    if nice >= 15:
+        return subprocess.IDLE_PRIORITY_CLASS
+    if nice > 0:
+        return subprocess.BELOW_NORMAL_PRIORITY_CLASS
+    if nice <= -10:
+        return subprocess.HIGH_PRIORITY_CLASS
+    if nice < 0:
+        return subprocess.ABOVE_NORMAL_PRIORITY_CLASS
+    return 0
+
+
+class ResourceLimits:
+    """启动脚本时应用的资源限制
+
+    支持的配置项：
+    - nice：调度优先级（-20 到 19，调低需要权限）
+    - ionice：I/O 调度类别，如 "idle"、"best-effort:7"（调用 ionice 命令）
+    - cpu_affinity：允许使用的 CPU，如 [0, 1] 或 "0-3"
+    - max_memory_mb：地址空间上限（RLIMIT_AS）
+    - max_cpu_seconds：CPU 时间上限（RLIMIT_CPU，超出后进程收到 SIGXCPU）
+    - cgroup：在 settings.cgroup_root（委派给当前用户的 cgroup v2 子树）下为每次运行
+      创建一个 cgroup 并写入其中的控制文件，如 {"memory.max": "2G", "cpu.max": "50000 100000"}
+
+    nice、CPU 亲和性、rlimit 和 cgroup 在子进程 exec 之前设置，脚本及其子进程都受限制。
+    Windows 上只把 nice 换算为优先级类别，其余配置被忽略。
+    """
+
+    def __init__(self, profile, cgroup_root=""):
+        profile = profile or {}
+        self.nice = profile.get("nice")
+        self.ionice = parse_ionice(profile["ionice"]) if profile.get("ionice") else None
+        self.cpu_affinity = None
+        if profile.get("cpu_affinity") not in (None, "", []):
+            self.cpu_affinity = parse_cpu_list(profile["cpu_affinity"])
+        self.max_memory_mb = profile.get("max_memory_mb")
+        self.max_cpu_seconds = profile.get("max_cpu_seconds")
+        self.cgroup = dict(profile.get("cgroup") or {})
+        self.cgroup_root = cgroup_root or ""
+        self.cgroup_path = None
+        if self.nice is not None:
+            self.nice = int(self.nice)
+            if not -20 <= self.nice <= 19:
+                raise ValueError(f"nice 值应在 -20 到 19 之间: {self.nice}")
+        if self.cgroup and not self.cgroup_root:
+            raise ValueError("资源配置使用了 cgroup，但没有设置 cgroup_root")
+
+    @classmethod
+    def for_script(cls, config, script):
+        """根据配置得到脚本的资源限制，没有配置时返回 None"""
+        profile = resolve_profile(config, script)
+        if not profile:
+            return None
+        settings = (config or {}).get("settings", {})
+        return cls(profile, settings.get("cgroup_root", ""))
+
+    def __bool__(self):
+        return bool(self.nice is not None or self.ionice or self.cpu_affinity
+                    or self.max_memory_mb or self.max_cpu_seconds or self.cgroup)
+
+    def describe(self):
+        parts = []
+        if self.nice is not None:
+            parts.append(f"nice={self.nice}")
+        if self.ionice:
+            parts.append("ionice=" + " ".join(self.ionice))
+        if self.cpu_affinity:
+            parts.append("cpu=" + ",".join(str(cpu) for cpu in sorted(self.cpu_affinity)))
+        if self.max_memory_mb:
+            parts.append(f"memory={self.max_memory_mb}MB")
+        if self.max_cpu_seconds:
+            parts.append(f"cpu_time={self.max_cpu_seconds}s")
+        parts.extend(f"{name}={value}" for name, value in self.cgroup.items())
+        return ", ".join(parts)
+
+    # ---- 启动 ----
+
+    def wrap_command(self, cmd):
+        """需要借助外部命令的限制（ionice）加在命令前面；找不到 ionice 时忽略"""
+        if self.ionice and os.name == "posix":
+            ionice = shutil.which("ionice")
+            if ionice:
+                return [ionice, *self.ionice, *cmd]
+        return cmd
+
+    def creationflags(self):
+        """Windows 上的优先级类别"""
+        if os.name == "nt" and self.nice:
+            return _windows_priority(self.nice)
+        return 0
+
+    def prepare(self):
+        """启动前的准备：创建 cgroup，返回在子进程中执行的 preexec_fn（不需要时为 None）
+
+        preexec_fn 在 fork 之后、exec 之前运行，此时其他线程已不存在，
+        因此这里提前算好所有参数，子进程中只做系统调用。
+        """
+        if os.name != "posix":
+            return None
+        import resource
+        rlimits = []
+        if self.max_memory_mb:
+            limit = int(self.max_memory_mb) * 1024 * 1024
+            rlimits.append((resource.RLIMIT_AS, (limit, limit)))
+        if self.max_cpu_seconds:
+            soft = int(self.max_cpu_seconds)
+            # 硬限制多留几秒，先收到 SIGXCPU 的进程有机会清理
+            rlimits.append((resource.RLIMIT_CPU, (soft, soft + 5)))
+        rlimits = [(which, self._within_hard(resource, which, limits)) for which, limits in rlimits]
+        affinity = None
+        if self.cpu_affinity:
+            if hasattr(os, "sched_getaffinity"):
+                affinity = self.cpu_affinity & os.sched_getaffinity(0)
+                if not affinity:
+                    raise ValueError(f"CPU 亲和性中没有可用的 CPU: {sorted(self.cpu_affinity)}")
+        nice = self.nice
+        procs = None
+        if self.cgroup:
+            procs = os.path.join(self._create_cgroup(), "cgroup.procs").encode()
+        if nice is None and affinity is None and not rlimits and procs is None:
+            return None
+
+        def preexec():
+            if procs is not None:
+                fd = os.open(procs, os.O_WRONLY)
+                try:
+                    os.write(fd, str(os.getpid()).encode())
+                finally:
+                    os.close(fd)
+            if nice is not None:
+                os.setpriority(os.PRIO_PROCESS, 0, nice)
+            if affinity is not None:
+                os.sched_setaffinity(0, affinity)
+            for which, limits in rlimits:
+                resource.setrlimit(which, limits)
+
+        return preexec
+
+    @staticmethod
+    def _within_hard(resource, which, limits):
+        """不能超过当前的硬限制（非特权进程不能调高）"""
+        _, hard = resource.getrlimit(which)
+        if hard == resource.RLIM_INFINITY:
+            return limits
+        return tuple(min(limit, hard) for limit in limits)
+
+    # ---- cgroup ----
+
+    def _create_cgroup(self):
+        root = os.path.expanduser(self.cgroup_root)
+        if not os.path.isfile(os.path.join(root, "cgroup.procs")):
+            raise ValueError(f"cgroup_root 不是 cgroup v2 目录: {root}")
+        # 在子树中启用用到的控制器（已启用或无权修改时由下面写入控制文件时报错）
+        controllers = sorted({name.split(".", 1)[0] for name in self.cgroup})
+        try:
+            with open(os.path.join(root, "cgroup.subtree_control"), "w") as f:
+                f.write(" ".join("+" + name for name in controllers))
+        except OSError:
+            pass
+        path = os.path.join(root, f"{CGROUP_PREFIX}-{os.getpid()}-{next(_cgroup_ids)}")
+        os.mkdir(path)
+        self.cgroup_path = path
+        try:
+            for name, value in self.cgroup.items():
+                with open(os.path.join(path, name), "w") as f:
+                    f.write(str(value))
+        except OSError as e:
+            self.release()
+            raise ValueError(f"无法设置 cgroup {name}={value}: {e}") from e
+        return path
+
+    def kill(self):
+        """结束本次运行 cgroup 中的全部进程（需要内核支持 cgroup.kill）"""
+        if self.cgroup_path is None:
+            return
+        try:
+            with open(os.path.join(self.cgroup_path, "cgroup.kill"), "w") as f:
+                f.write("1")
+        except OSError:
+            return
+        # 进程结束后 cgroup 才能删除
+        from src.supervisor import call_later
+        call_later(1, self.release)
+
+    def release(self):
+        """删除本次运行的 cgroup（仍有进程时保留）"""
+        if self.cgroup_path is None:
+            return
+        try:
+            os.rmdir(self.cgroup_path)
+        except OSError:
+            return
+        self.cgroup_path = None
+
+
+def release(process):
+    """进程结束后释放其资源限制占用的 cgroup"""
+    limits = getattr(process, "resource_limits", None)
+    if limits is not None:
+        limits.release()
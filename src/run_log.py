@@ -0,0 +1,310 @@
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+
+DEFAULT_RUN_LOG_PATH = Path.home() / "script_manager_runs"
+
+# 单个段文件的大小上限，超过后写入新段
+SEGMENT_SIZE = 16 * 1024 * 1024
+
+# 原始输出累计到该字节数时压缩为一个 gzip 成员写入段文件
+BLOCK_SIZE = 256 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    script TEXT NOT NULL,
+    category TEXT,
+    script_type TEXT,
+    path TEXT,
+    arguments TEXT,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    exit_code INTEGER,
+    stdout_bytes INTEGER DEFAULT 0,
+    stderr_bytes INTEGER DEFAULT 0,
+    segment TEXT,
+    offset INTEGER,
+    length INTEGER
+);
+CREATE INDEX IF NOT EXISTS runs_script_time ON runs (script, started_at);
+CREATE INDEX IF NOT EXISTS runs_time ON runs (started_at);
+"""
+
+
+class RunRecorder:
+    """记录一次运行的输出
+
+    输出增量压缩（gzip 格式），每累计 BLOCK_SIZE 字节就作为一个完整的 gzip 成员
+    追加到本次运行独占的段文件中，内存中最多保留一个块；管理器意外退出时已写入的块
+    仍可读取。运行结束时写入剩余部分并在索引中记录总长度。write 可以在读取线程中调用。
+    """
+
+    def __init__(self, store, run_id, segment, offset):
+        self.store = store
+        self.run_id = run_id
+        self.segment = segment
+        self.offset = offset
+        self.length = 0
+        self.bytes_written = {"stdout": 0, "stderr": 0}
+        self._file = open(segment, 'ab')
+        self._compressor = None
+        self._pending = 0
+        self._parts = []
+        self._lock = threading.Lock()
+        self._finished = False
+
+    def write(self, stream, data):
+        if not data:
+            return
+        with self._lock:
+            if self._finished:
+                return
+            self.bytes_written[stream] = self.bytes_written.get(stream, 0) + len(data)
+            if self._compressor is None:
+                self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip 格式
+            compressed = self._compressor.compress(data)
+            if compressed:
+                self._parts.append(compressed)
+            self._pending += len(data)
+            if self._pending >= BLOCK_SIZE:
+                self._write_block()
+
+    def _write_block(self):
+        """结束当前 gzip 成员并追加到段文件（调用方持有 self._lock）"""
+        if self._compressor is None:
+            return
+        self._parts.append(self._compressor.flush())
+        member = b"".join(self._parts)
+        self._compressor = None
+        self._pending = 0
+        self._parts = []
+        self._file.write(member)
+        self._file.flush()
+        self.length += len(member)
+
+    def finish(self, exit_code=None, finished_at=None):
+        """结束记录，写入剩余输出并更新索引（重复调用无效）"""
+        with self._lock:
+            if self._finished:
+                return
+            self._finished = True
+            try:
+                self._write_block()
+            finally:
+                self._file.close()
+        self.store._finish_run(self, exit_code,
+                               time.time() if finished_at is None else finished_at)
+
+
+class RunLogStore:
+    """持久化的运行日志
+
+    目录结构：
+        runs.sqlite             运行索引（脚本、开始/结束时间、退出码、输出位置）
+        segments/seg_N.gz       只追加的段文件，每次运行的输出是其中连续的若干 gzip 成员
+    按脚本和时间范围查询只访问索引；按内容搜索时只解压命中的运行。
+    运行期间段文件由该次运行独占，同时进行的运行写入不同的段，输出在段内保持连续。
+    """
+
+    DB_NAME = "runs.sqlite"
+
+    def __init__(self, root, segment_size=SEGMENT_SIZE, max_bytes=None):
+        self.root = Path(root)
+        self.segments_dir = self.root / "segments"
+        self.segments_dir.mkdir(parents=True, exist_ok=True)
+        self.segment_size = segment_size
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.root / self.DB_NAME), check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._db:
+            self._db.executescript(_SCHEMA)
+        self._segment = self._last_segment()
+        self._active = set()  # 正在被运行写入的段
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # ---- 写入 ----
+
+    def begin_run(self, script, category=None, arguments="", started_at=None):
+        """登记一次运行，返回 RunRecorder"""
+        started_at = time.time() if started_at is None else started_at
+        with self._lock:
+            segment = self._segment_for_run()
+            offset = self._size(segment)
+            with self._db:
+                cursor = self._db.execute(
+                    "INSERT INTO runs (script, category, script_type, path, arguments, started_at, "
+                    "segment, offset) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (script.get("name", ""), category or script.get("category"),
+                     script.get("script_type", "python"), script.get("path", ""),
+                     arguments or "", started_at, segment.name, offset)
+                )
+            recorder = RunRecorder(self, cursor.lastrowid, segment, offset)
+            self._active.add(segment)
+        return recorder
+
+    def _last_segment(self):
+        segments = sorted(self.segments_dir.glob("seg_*.gz"))
+        if segments:
+            return segments[-1]
+        return self.segments_dir / "seg_000001.gz"
+
+    @staticmethod
+    def _size(path):
+        try:
+            return path.stat().st_size
+        except OSError:
+            return 0
+
+    def _segment_for_run(self):
+        # 当前段写满或正被其他运行写入时换新段
+        if self._segment in self._active or self._size(self._segment) >= self.segment_size:
+            last = max([self._last_segment(), self._segment, *self._active])
+            number = int(last.stem.split("_")[1]) + 1
+            self._segment = self.segments_dir / f"seg_{number:06d}.gz"
+        return self._segment
+
+    def _finish_run(self, recorder, exit_code, finished_at):
+        with self._lock:
+            self._active.discard(recorder.segment)
+            with self._db:
+                self._db.execute(
+                    "UPDATE runs SET finished_at = ?, exit_code = ?, stdout_bytes = ?, "
+                    "stderr_bytes = ?, length = ? WHERE id = ?",
+                    (finished_at, exit_code, recorder.bytes_written.get("stdout", 0),
+                     recorder.bytes_written.get("stderr", 0), recorder.length, recorder.run_id)
+                )
+        if self.max_bytes:
+            self.prune(self.max_bytes)
+
+    # ---- 查询 ----
+
+    def get_run(self, run_id):
+        with self._lock:
+            row = self._db.execute("SELECT * FROM runs WHERE id = ?", (run_id,)).fetchone()
+        return dict(row) if row else None
+
+    def find_runs(self, script=None, since=None, until=None, exit_code=None, failed=None, limit=200):
+        """按脚本名和时间范围查询运行记录（从新到旧），只访问索引"""
+        clauses, params = [], []
+        if script:
+            clauses.append("script = ?")
+            params.append(script)
+        if since is not None:
+            clauses.append("started_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("started_at < ?")
+            params.append(until)
+        if exit_code is not None:
+            clauses.append("exit_code = ?")
+            params.append(exit_code)
+        if failed is not None:
+            clauses.append("exit_code != 0" if failed else "exit_code = 0")
+        sql = "SELECT * FROM runs"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY started_at DESC, id DESC"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        with self._lock:
+            return [dict(row) for row in self._db.execute(sql, params)]
+
+    def scripts(self):
+        """有运行记录的脚本名"""
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT DISTINCT script FROM runs ORDER BY script")]
+
+    def read_output(self, run_id):
+        """读取一次运行的输出（bytes）；运行尚未结束时返回已写入段文件的部分"""
+        run = run_id if isinstance(run_id, dict) else self.get_run(run_id)
+        if not run or not run.get("segment") or run.get("length") == 0:
+            return b""
+        length = run.get("length")
+        if length is None:
+            # 运行中或管理器意外退出：读到同一段中下一次运行的开头
+            with self._lock:
+                row = self._db.execute(
+                    "SELECT MIN(offset) FROM runs WHERE segment = ? AND offset > ?",
+                    (run["segment"], run["offset"])
+                ).fetchone()
+            length = row[0] - run["offset"] if row[0] is not None else -1
+        try:
+            with open(self.segments_dir / run["segment"], 'rb') as f:
+                f.seek(run["offset"])
+                data = f.read(length)
+        except OSError:
+            return b""
+        return _decompress_members(data)
+
+    def search(self, text, script=None, since=None, until=None, limit=200, encoding="utf-8"):
+        """在指定脚本/时间范围内按内容搜索，返回命中的运行记录（从新到旧）"""
+        needle = text.encode(encoding, errors="replace") if isinstance(text, str) else text
+        matches = []
+        for run in self.find_runs(script=script, since=since, until=until, limit=None):
+            if needle in self.read_output(run):
+                matches.append(run)
+                if limit and len(matches) >= limit:
+                    break
+        return matches
+
+    # ---- 清理 ----
+
+    def total_bytes(self):
+        return sum(path.stat().st_size for path in self.segments_dir.glob("seg_*.gz"))
+
+    def prune(self, max_bytes):
+        """删除最旧的段文件及其记录，直到总大小不超过 max_bytes，返回删除的段数"""
+        with self._lock:
+            segments = sorted(self.segments_dir.glob("seg_*.gz"))
+            sizes = {path: path.stat().st_size for path in segments}
+            total = sum(sizes.values())
+            removed = 0
+            # 当前段和正在被运行写入的段始终保留
+            for path in segments:
+                if total <= max_bytes:
+                    break
+                if path == self._segment or path in self._active:
+                    continue
+                with self._db:
+                    self._db.execute("DELETE FROM runs WHERE segment = ?", (path.name,))
+                try:
+                    os.unlink(path)
+                except OSError:
+                    continue
+                total -= sizes[path]
+                removed += 1
+            return removed
+
+
+def _decompress_members(data):
+    """解压连续的 gzip 成员；末尾不完整的成员只取能解压出的部分"""
+    output = []
+    while data:
+        decompressor = zlib.decompressobj(31)
+        try:
+            output.append(decompressor.decompress(data))
+        except zlib.error:
+            break
+        if not decompressor.eof:
+            break
+        data = decompressor.unused_data
+    return b"".join(output)
+
+
+def open_run_log(settings):
+    """按设置打开运行日志；未启用或无法打开时返回 None（不影响脚本运行）"""
+    if not settings.get("run_log_enabled", True):
+        return None
+    try:
+        return RunLogStore(settings.get("run_log_path") or DEFAULT_RUN_LOG_PATH,
+                           max_bytes=settings.get("run_log_max_bytes"))
+    except Exception:
+        return None
@@ -2,6 +2,8 @@ import os
 import subprocess
 from abc import ABC, abstractmethod
 
+from src.process_tree import new_group_options
+from src.resources import ResourceLimits
 from src.utils import split_arguments
 
 class ScriptRunner(ABC):
@@ -16,6 +18,41 @@ class ScriptRunner(ABC):
         """准备运行命令"""
         pass
     
+    def resource_limits(self):
+        """脚本生效的资源限制（分类和脚本的资源配置），没有配置时返回 None"""
+        return ResourceLimits.for_script(self.config, self.script_info)
+    
+    def _popen(self, cmd, **kwargs):
+        """启动子进程：作为新进程组的组长（便于结束整个进程树），并在 exec 之前应用资源限制"""
+        options = new_group_options()
+        if "creationflags" in options:
+            kwargs["creationflags"] = kwargs.get("creationflags", 0) | options.pop("creationflags")
+        kwargs.update(options)
+        limits = self.resource_limits()
+        if not limits:
+            return self._started(subprocess.Popen(cmd, **kwargs))
+        cmd = limits.wrap_command(cmd)
+        kwargs["creationflags"] = kwargs.get("creationflags", 0) | limits.creationflags()
+        preexec_fn = limits.prepare()
+        try:
+            process = subprocess.Popen(cmd, preexec_fn=preexec_fn, **kwargs)
+        except subprocess.SubprocessError as e:
+            limits.release()
+            raise RuntimeError(f"无法应用资源限制（{limits.describe()}）: {e}") from e
+        except Exception:
+            limits.release()
+            raise
+        # 进程结束后由引擎释放 cgroup
+        process.resource_limits = limits
+        return self._started(process)
+    
+    @staticmethod
+    def _started(process):
+        # 记录进程组 ID：组长退出后仍可结束组内剩余的进程
+        if os.name == 'posix':
+            process.pgid = process.pid
+        return process
+    
     def run(self, arguments="", working_dir="", show_output=True, interactive=False):
         """运行脚本"""
         cmd = self.prepare_command(arguments, working_dir)
@@ -32,14 +69,13 @@ class ScriptRunner(ABC):
             startupinfo.wShowWindow = subprocess.SW_HIDE
         
         # 使用subprocess运行脚本
-        process = subprocess.Popen(
+        process = self._popen(
             cmd,
             stdout=subprocess.PIPE if show_output else subprocess.DEVNULL,
             stderr=subprocess.PIPE if show_output else subprocess.DEVNULL,
             stdin=subprocess.PIPE if interactive else None,
-            text=True,
-            errors="replace",
-            bufsize=1,
+            # 使用无缓冲的二进制管道，由输出管线分块读取并增量解码
+            bufsize=0,
             cwd=working_dir,
             startupinfo=startupinfo,
             creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
@@ -62,6 +98,30 @@ class PythonRunner(ScriptRunner):
         if arguments:
             cmd.extend(split_arguments(arguments))
         return cmd
+    
+    def use_warm_pool(self):
+        """是否使用预热解释器池（脚本的 warm 字段优先于全局设置）"""
+        settings = self.config.get("settings", {})
+        return bool(self.script_info.get("warm", settings.get("warm_pool_enabled", False)))
+    
+    def run(self, arguments="", working_dir="", show_output=True, interactive=False):
+        """运行脚本；启用预热池时优先在预热的解释器中运行，不可用时冷启动
+
+        预热的工作进程已经在运行，无法应用资源限制，有资源配置的脚本总是冷启动。
+        """
+        if self.use_warm_pool() and not self.resource_limits():
+            from src.warm_pool import default_pool, is_supported
+            if is_supported():
+                cmd = self.prepare_command(arguments, working_dir)
+                process = default_pool(self.config.get("settings", {})).launch(
+                    cmd[0], cmd[1], cmd[2:],
+                    cwd=working_dir or os.path.dirname(self.script_info["path"]),
+                    show_output=show_output,
+                    interactive=interactive
+                )
+                if process is not None:
+                    return process
+        return super().run(arguments, working_dir, show_output, interactive)
 
 class BatchRunner(ScriptRunner):
     """批处理脚本运行器"""
@@ -91,7 +151,7 @@ class BatchRunner(ScriptRunner):
                 return super().run(arguments, working_dir, show_output, interactive)
             else:
                 # 直接运行批处理，不捕获输出
-                process = subprocess.Popen(
+                process = self._popen(
                     cmd,
                     cwd=working_dir,
                     # 不捕获输出，让程序直接显示自己的窗口
@@ -124,7 +184,7 @@ class ExecutableRunner(ScriptRunner):
         
         try:
             # 直接运行程序，不捕获输出
-            process = subprocess.Popen(
+            process = self._popen(
                 cmd,
                 cwd=working_dir,
                 # 不捕获输出，让程序直接显示自己的窗口
@@ -177,7 +237,7 @@ class PowerShellRunner(ScriptRunner):
                 return super().run(arguments, working_dir, show_output, interactive)
             else:
                 # 直接运行脚本，不捕获输出
-                process = subprocess.Popen(
+                process = self._popen(
                     cmd,
                     cwd=working_dir,
                     stdout=None,
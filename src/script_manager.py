@@ -4,11 +4,27 @@ from tkinter import ttk, messagebox, filedialog, simpledialog
 import subprocess
 import shutil
 import os
+import queue
 from pathlib import Path
 from src.config_manager import ConfigManager
-from src.dialogs import ScriptConfigDialog, OutputWindow, EnvConfigDialog, CategoryDialog
+from src.dialogs import (ScriptConfigDialog, OutputWindow, EnvConfigDialog, CategoryDialog, RunLogDialog,
+                         ImportProfileDialog, MetricsDialog, BatchRunDialog)
 from tkinterdnd2 import DND_FILES, TkinterDnD
-from src.runners import RunnerFactory
+from src.engine import ExecutionEngine, JobSpec
+from src.registry import ScriptRegistry
+from src.tree_sync import ScriptTreeSync
+from src.virtual_list import VirtualScriptList
+from src.search_index import SearchIndex
+from src.run_log import open_run_log
+from src.metrics import open_metrics
+from src.batch import BatchRun, script_dependencies
+from src.process_tree import EXIT_ALL, EXIT_ATTACHED
+
+# 搜索框输入防抖时间（毫秒）
+SEARCH_DEBOUNCE_MS = 150
+
+# 某一类型的脚本数达到该值时使用虚拟列表（可由 virtual_list_threshold 设置覆盖）
+VIRTUAL_LIST_THRESHOLD = 5000
 
 class ScriptManager:
     def __init__(self):
@@ -16,8 +32,35 @@ class ScriptManager:
         self.root.title("脚本管理器")
         
         # 初始化配置管理器
-        self.config_manager = ConfigManager()
+        self.config_manager = ConfigManager(on_error=messagebox.showerror)
         self.config = self.config_manager.config
+        # 配置的延迟写入在 Tk 线程中执行，避免与界面修改并发
+        self.config_manager.set_scheduler(self.root.after, self.root.after_cancel)
+
+        # 脚本注册表：按 ID/分类/路径/标签索引脚本，树节点直接映射到脚本 ID
+        self.registry = ScriptRegistry(self.config)
+        self.tree_syncs = {}
+
+        # 全文检索索引在后台构建（窗口首次绘制之后开始），查询也在后台线程中执行
+        self.search_index = SearchIndex(self.registry, build=False)
+        # 后台线程池按需创建：search 用于检索和环境扫描，profile 用于导入耗时分析
+        self._executors = {}
+        self.root.after_idle(lambda: self.search_index.rebuild_async(self._executor("search")))
+        self.search_results = None
+        self._search_after = None
+        self._search_seq = 0
+        self.registry.add_listener(self._on_registry_changed)
+
+        # 执行引擎：脚本在后台工作线程中启动，事件经队列转交 Tk 线程
+        settings = self.config.get("settings", {})
+        self.run_log = open_run_log(settings)
+        self.metrics = open_metrics(settings)
+        max_jobs = settings.get("max_concurrent_jobs", 4)
+        self.engine = ExecutionEngine(self.config, max_workers=max_jobs, run_log=self.run_log,
+                                      metrics=self.metrics)
+        self.engine_events = queue.Queue()
+        self.engine.subscribe(lambda event, job: self.engine_events.put((event, job)))
+        self.output_windows = {}
 
         # 恢复窗口大小设置（只保存 WxH，不保存位置）
         window_size = self.config.get("settings", {}).get("window_size", "750x500")
@@ -66,6 +109,18 @@ class ScriptManager:
         
         # 创建右键菜单
         self.create_context_menu()
+
+        # 开始处理执行引擎事件
+        self.process_engine_events()
+
+    def _executor(self, name):
+        """按名称取得后台线程池，首次使用时创建"""
+        executor = self._executors.get(name)
+        if executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+            self._executors[name] = executor
+        return executor
     
     def create_menu(self):
         """创建菜单栏"""
@@ -79,9 +134,12 @@ class ScriptManager:
         file_menu.add_command(label="编辑脚本", command=self.edit_script_config, accelerator="Ctrl+E")
         file_menu.add_command(label="删除脚本", command=self.remove_script, accelerator="Delete")
         file_menu.add_separator()
+        file_menu.add_command(label="批量运行所选", command=self.run_batch, accelerator="Ctrl+B")
+        file_menu.add_command(label="结束全部运行中的脚本", command=self.terminate_all_jobs)
+        file_menu.add_separator()
         file_menu.add_command(label="编辑分类", command=self.edit_categories)
         file_menu.add_separator()
-        file_menu.add_command(label="退出", command=self.root.quit, accelerator="Alt+F4")
+        file_menu.add_command(label="退出", command=self.on_app_close, accelerator="Alt+F4")
         
         # 环境菜单
         env_menu = tk.Menu(menubar, tearoff=0)
@@ -89,11 +147,20 @@ class ScriptManager:
         env_menu.add_command(label="添加环境", command=self.add_env)
         env_menu.add_command(label="删除环境", command=self.remove_env)
         env_menu.add_command(label="测试环境", command=self.test_env)
+        env_menu.add_separator()
+        env_menu.add_command(label="扫描环境", command=self.scan_envs)
+        
+        # 查看菜单
+        view_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="查看", menu=view_menu)
+        view_menu.add_command(label="运行记录", command=self.show_run_log)
+        view_menu.add_command(label="运行统计", command=self.show_metrics)
         
         # 绑定快捷键
         self.root.bind("<Control-n>", lambda e: self.add_script())
         self.root.bind("<Control-e>", lambda e: self.edit_script_config())
         self.root.bind("<Delete>", lambda e: self.remove_script())
+        self.root.bind("<Control-b>", lambda e: self.run_batch())
     
     def create_toolbar(self):
         """创建工具栏"""
@@ -120,21 +187,16 @@ class ScriptManager:
         self.script_notebook = ttk.Notebook(left_frame)
         self.script_notebook.pack(fill='both', expand=True)
         
-        # 为每种脚本类型创建页面
+        # 为每种脚本类型创建页面；页面内容在首次显示时创建（见 ensure_script_page）
         self.script_pages = {}
         self.script_trees = {}
+        self.script_scrollbars = {}
         
         for script_type, info in self.script_types.items():
             page = ttk.Frame(self.script_notebook)
             self.script_notebook.add(page, text=f"{info['icon']} {info['name']}")
             self.script_pages[script_type] = page
-            
-            # 创建树形视图
-            tree = self.create_script_tree(page, script_type)
-            self.script_trees[script_type] = tree
-            
-            # 创建按钮框
-            self.create_script_buttons(page, script_type)
+        self.ensure_script_page(self.get_current_script_type())
         
         # 右侧配置面板
         right_paned = ttk.PanedWindow(main_paned, orient=tk.VERTICAL)
@@ -153,6 +215,39 @@ class ScriptManager:
         # 绑定notebook切换事件
         self.script_notebook.bind('<<NotebookTabChanged>>', self.on_tab_changed)
     
+    def ensure_script_page(self, script_type):
+        """创建脚本类型页面的树形视图和按钮（只在首次显示时创建），返回树形视图"""
+        tree = self.script_trees.get(script_type)
+        if tree is None:
+            page = self.script_pages[script_type]
+            tree = self.create_script_tree(page, script_type)
+            self.script_trees[script_type] = tree
+            values_of = lambda script, st=script_type: self._tree_values(script, st)
+            if self._use_virtual_list(script_type):
+                # 脚本很多时只创建可见窗口大小的行，滚动/展开时从注册表取数据
+                self.tree_syncs[script_type] = VirtualScriptList(
+                    tree, self.registry, script_type, values_of=values_of,
+                    scrollbar=self.script_scrollbars[script_type]
+                )
+            else:
+                self.tree_syncs[script_type] = ScriptTreeSync(
+                    tree, self.registry, script_type, values_of=values_of
+                )
+            self.create_script_buttons(page, script_type)
+        return tree
+
+    def _use_virtual_list(self, script_type):
+        """该类型的脚本数是否达到虚拟列表的阈值（阈值为 None 时不使用虚拟列表）"""
+        threshold = self.config.get("settings", {}).get("virtual_list_threshold", VIRTUAL_LIST_THRESHOLD)
+        if threshold is None:
+            return False
+        count = 0
+        for _ in self.registry.items(script_type):
+            count += 1
+            if count >= threshold:
+                return True
+        return count >= threshold
+    
     def create_script_tree(self, parent, script_type):
         """创建脚本树形视图"""
         # 创建树形视图和滚动条的容器
@@ -163,11 +258,13 @@ class ScriptManager:
         inner_frame = ttk.Frame(tree_frame)
         inner_frame.pack(fill='both', expand=True)
         
-        tree = ttk.Treeview(inner_frame, selectmode='browse')
+        # 支持多选（Ctrl/Shift），用于批量运行
+        tree = ttk.Treeview(inner_frame, selectmode='extended')
         
         # 创建滚动条
         y_scrollbar = ttk.Scrollbar(inner_frame, orient='vertical', command=tree.yview)
         x_scrollbar = ttk.Scrollbar(inner_frame, orient='horizontal', command=tree.xview)
+        self.script_scrollbars[script_type] = y_scrollbar
         
         # 配置树形视图的滚动
         tree.configure(
@@ -202,6 +299,7 @@ class ScriptManager:
         # 绑定事件
         tree.bind('<<TreeviewSelect>>', lambda e: self.on_script_select(e, script_type))
         tree.bind('<Double-1>', lambda e: self.run_script())
+        tree.bind('<Button-3>', self.show_context_menu)
         
         # 启用拖放功能
         tree.drop_target_register(DND_FILES)
@@ -251,82 +349,90 @@ class ScriptManager:
         self.desc_text.config(state='disabled')
     
     def create_run_config_panel(self, parent):
-        """创建运行配置面板"""
-        # 创建不同类型脚本的配置框架
+        """创建运行配置面板（各类型的配置框架在首次显示时创建）"""
+        self.config_parent = parent
         self.config_frames = {}
         self.config_widgets = {}
         
         # 创建保存设置复选框（全局）
         self.save_var = tk.BooleanVar(value=False)
         
-        for script_type, info in self.script_types.items():
-            frame = ttk.Frame(parent)
-            self.config_frames[script_type] = frame
-            # 初始化当前类型的控件字典
-            widgets = {}
-            self.config_widgets[script_type] = widgets
+        # 显示当前标签页对应类型的配置
+        self.show_config_frame(self.get_current_script_type())
+    
+    def ensure_config_frame(self, script_type):
+        """创建指定类型的配置框架（只创建一次），返回其控件字典"""
+        widgets = self.config_widgets.get(script_type)
+        if widgets is not None:
+            return widgets
+        info = self.script_types[script_type]
+        frame = ttk.Frame(self.config_parent)
+        self.config_frames[script_type] = frame
+        # 初始化当前类型的控件字典
+        widgets = {}
+        self.config_widgets[script_type] = widgets
+        
+        if info["needs_env"]:
+            # Python环境选择
+            env_frame = ttk.Frame(frame)
+            env_frame.pack(fill='x', padx=5, pady=2)
+            ttk.Label(env_frame, text="Python环境:").pack(side=tk.LEFT)
+            widgets['env_combo'] = ttk.Combobox(env_frame, state='readonly')
+            widgets['env_combo'].pack(side=tk.LEFT, fill='x', expand=True)
+        
+        if info["supports_output"] or info["supports_interactive"]:
+            # 命令行参数
+            args_frame = ttk.Frame(frame)
+            args_frame.pack(fill='x', padx=5, pady=2)
+            ttk.Label(args_frame, text="命令行参数:").pack(side=tk.LEFT)
+            widgets['args_entry'] = ttk.Entry(args_frame)
+            widgets['args_entry'].pack(side=tk.LEFT, fill='x', expand=True)
             
-            if info["needs_env"]:
-                # Python环境选择
-                env_frame = ttk.Frame(frame)
-                env_frame.pack(fill='x', padx=5, pady=2)
-                ttk.Label(env_frame, text="Python环境:").pack(side=tk.LEFT)
-                widgets['env_combo'] = ttk.Combobox(env_frame, state='readonly')
-                widgets['env_combo'].pack(side=tk.LEFT, fill='x', expand=True)
+            # 工作目录
+            dir_frame = ttk.Frame(frame)
+            dir_frame.pack(fill='x', padx=5, pady=2)
+            ttk.Label(dir_frame, text="工作目录:").pack(side=tk.LEFT)
+            widgets['dir_entry'] = ttk.Entry(dir_frame)
+            widgets['dir_entry'].pack(side=tk.LEFT, fill='x', expand=True)
+            ttk.Button(dir_frame, text="浏览", 
+                      command=self.browse_dir).pack(side=tk.RIGHT)
             
-            if info["supports_output"] or info["supports_interactive"]:
-                # 命令行参数
-                args_frame = ttk.Frame(frame)
-                args_frame.pack(fill='x', padx=5, pady=2)
-                ttk.Label(args_frame, text="命令行参数:").pack(side=tk.LEFT)
-                widgets['args_entry'] = ttk.Entry(args_frame)
-                widgets['args_entry'].pack(side=tk.LEFT, fill='x', expand=True)
-                
-                # 工作目录
-                dir_frame = ttk.Frame(frame)
-                dir_frame.pack(fill='x', padx=5, pady=2)
-                ttk.Label(dir_frame, text="工作目录:").pack(side=tk.LEFT)
-                widgets['dir_entry'] = ttk.Entry(dir_frame)
-                widgets['dir_entry'].pack(side=tk.LEFT, fill='x', expand=True)
-                ttk.Button(dir_frame, text="浏览", 
-                          command=self.browse_dir).pack(side=tk.RIGHT)
-                
-                # 运行选项
-                opt_frame = ttk.Frame(frame)
-                opt_frame.pack(fill='x', padx=5, pady=2)
-                
-                if info["supports_output"]:
-                    widgets['show_output_var'] = tk.BooleanVar(value=True)
-                    ttk.Checkbutton(opt_frame, text="显示输出",
-                                  variable=widgets['show_output_var']).pack(side=tk.LEFT)
-                
-                if info["supports_interactive"]:
-                    widgets['interactive_var'] = tk.BooleanVar(value=False)
-                    ttk.Checkbutton(opt_frame, text="交互模式",
-                                  variable=widgets['interactive_var']).pack(side=tk.LEFT, padx=10)
-                
-                # 添加保存设置复选框
-                ttk.Checkbutton(opt_frame, text="保存为默认设置",
-                              variable=self.save_var).pack(side=tk.LEFT, padx=10)
+            # 运行选项
+            opt_frame = ttk.Frame(frame)
+            opt_frame.pack(fill='x', padx=5, pady=2)
             
-            # 运行按钮
-            btn_frame = ttk.Frame(frame)
-            btn_frame.pack(fill='x', padx=5, pady=5)
-            ttk.Button(btn_frame, text="运行脚本",
-                      command=self.run_script).pack(side=tk.RIGHT)
-            ttk.Button(btn_frame, text="用编辑器打开",
-                      command=self.open_in_editor).pack(side=tk.LEFT, padx=5)
-            ttk.Button(btn_frame, text="打开所在文件夹",
-                      command=self.open_script_location).pack(side=tk.LEFT)
-        
-        # 默认显示Python配置
-        self.show_config_frame("python")
-
-        # 初始化环境下拉框内容（即便没有环境管理页面也要能工作）
-        self.update_env_list()
+            if info["supports_output"]:
+                widgets['show_output_var'] = tk.BooleanVar(value=True)
+                ttk.Checkbutton(opt_frame, text="显示输出",
+                              variable=widgets['show_output_var']).pack(side=tk.LEFT)
+            
+            if info["supports_interactive"]:
+                widgets['interactive_var'] = tk.BooleanVar(value=False)
+                ttk.Checkbutton(opt_frame, text="交互模式",
+                              variable=widgets['interactive_var']).pack(side=tk.LEFT, padx=10)
+            
+            # 添加保存设置复选框
+            ttk.Checkbutton(opt_frame, text="保存为默认设置",
+                          variable=self.save_var).pack(side=tk.LEFT, padx=10)
+        
+        # 运行按钮
+        btn_frame = ttk.Frame(frame)
+        btn_frame.pack(fill='x', padx=5, pady=5)
+        ttk.Button(btn_frame, text="运行脚本",
+                  command=self.run_script).pack(side=tk.RIGHT)
+        ttk.Button(btn_frame, text="用编辑器打开",
+                  command=self.open_in_editor).pack(side=tk.LEFT, padx=5)
+        ttk.Button(btn_frame, text="打开所在文件夹",
+                  command=self.open_script_location).pack(side=tk.LEFT)
+        
+        if 'env_combo' in widgets:
+            # 初始化环境下拉框内容
+            widgets['env_combo']['values'] = self._env_names()
+        return widgets
     
     def show_config_frame(self, script_type):
         """显示指定类型的配置框架"""
+        self.ensure_config_frame(script_type)
         # 隐藏所有配置框架
         for frame in self.config_frames.values():
             frame.pack_forget()
@@ -347,6 +453,7 @@ class ScriptManager:
                 break
         
         if script_type:
+            self.ensure_script_page(script_type)
             self.show_config_frame(script_type)
             self.update_script_list()
     
@@ -354,60 +461,83 @@ class ScriptManager:
         """创建右键菜单"""
         self.context_menu = tk.Menu(self.root, tearoff=0)
         self.context_menu.add_command(label="运行", command=self.run_script)
+        self.context_menu.add_command(label="批量运行所选", command=self.run_batch)
         self.context_menu.add_command(label="编辑", command=self.edit_script_config)
         self.context_menu.add_command(label="打开所在文件夹", command=self.open_script_location)
         self.context_menu.add_command(label="用编辑器打开", command=self.open_in_editor)
+        self.context_menu.add_command(label="导入耗时分析", command=self.show_import_profile)
         self.context_menu.add_command(label="删除", command=self.remove_script)
-        
-        # 绑定右键菜单
-        for tree in self.script_trees.values():
-            tree.bind('<Button-3>', self.show_context_menu)
     
     def show_context_menu(self, event):
         """显示右键菜单"""
         tree = event.widget
         item = tree.identify_row(event.y)
         if item:
-            tree.selection_set(item)
+            # 在已选中的行上右键时保留多选
+            if item not in tree.selection():
+                tree.selection_set(item)
             self.context_menu.post(event.x_root, event.y_root)
     
     def filter_scripts(self, *args):
-        """根据搜索条件过滤脚本"""
-        search_text = self.search_var.get().lower()
-        self.update_script_list(search_text)
+        """根据搜索条件过滤脚本（防抖后在后台线程中查询索引）"""
+        if self._search_after is not None:
+            self.root.after_cancel(self._search_after)
+        self._search_after = self.root.after(SEARCH_DEBOUNCE_MS, self._run_search)
+
+    def _run_search(self):
+        """提交检索任务"""
+        self._search_after = None
+        self._search_seq += 1
+        query = self.search_var.get().strip()
+        if not query or not self.search_index.ready:
+            # 没有查询或索引尚未就绪时直接刷新（后者退化为名称子串过滤）
+            self.search_results = None
+            self.update_script_list()
+            return
+        future = self._executor("search").submit(self.search_index.search, query)
+        self._poll_search(future, self._search_seq)
+
+    def _poll_search(self, future, seq):
+        """等待检索结果；已被新的查询取代的结果直接丢弃"""
+        if seq != self._search_seq:
+            return
+        if not future.done():
+            self.root.after(15, lambda: self._poll_search(future, seq))
+            return
+        try:
+            self.search_results = [sid for sid, _ in future.result()]
+        except Exception:
+            self.search_results = None
+        self.update_script_list()
+
+    def _on_registry_changed(self, action, sid):
+        """脚本变更后重新执行当前查询，使搜索结果保持最新"""
+        if self.search_var.get().strip():
+            self.filter_scripts()
     
-    def update_script_list(self, filter_text=""):
-        """更新脚本列表"""
+    def update_script_list(self):
+        """更新脚本列表（增量同步，只处理可见性发生变化的节点）"""
+        filter_text = self.search_var.get().strip().lower()
         current_type = self.get_current_script_type()
-        tree = self.script_trees[current_type]
-        tree.delete(*tree.get_children())
-        
-        scripts_by_category = self.config.get("scripts", {}) or {}
+        self.ensure_script_page(current_type)
+        sync = self.tree_syncs[current_type]
 
-        # 获取当前类型的脚本（按用户设置的分类顺序展示）
-        for category in self._ordered_categories():
-            scripts = [
-                s
-                for s in scripts_by_category.get(category, [])
-                if s.get("script_type", "python") == current_type
-            ]
-            
-            if scripts:
-                category_node = tree.insert("", "end", text=category, open=True)
-                for script in scripts:
-                    if filter_text and filter_text not in script["name"].lower():
-                        continue
-                    
-                    values = [script.get("description", "")]
-                    if current_type == "python":
-                        values.insert(0, script.get("env", ""))
-                    
-                    tree.insert(
-                        category_node,
-                        "end",
-                        text=script["name"],
-                        values=tuple(values)
-                    )
+        if not filter_text:
+            sync.set_matcher(None)
+        elif self.search_results is not None:
+            sync.set_results(self.search_results)
+        else:
+            sync.set_matcher(lambda sid, script: filter_text in script.get("name", "").lower())
+
+        # 按用户设置的分类顺序展示
+        sync.sync(self._ordered_categories())
+
+    def _tree_values(self, script, script_type):
+        """树节点的列值"""
+        values = [script.get("description", "")]
+        if script_type == "python":
+            values.insert(0, script.get("env", ""))
+        return tuple(values)
     
     def get_current_script_type(self):
         """获取当前选中的脚本类型"""
@@ -438,36 +568,25 @@ class ScriptManager:
         categories.sort(key=sort_key)
         return categories
 
+    def _get_selected_sid(self, script_type=None):
+        """获取当前选中脚本在注册表中的 ID，未选中脚本时返回 None"""
+        script_type = script_type or self.get_current_script_type()
+        sync = self.tree_syncs.get(script_type)
+        if sync is None:
+            return None
+        sid = sync.selected_sid()
+        return sid if sid in self.registry else None
+
     def _get_selected_script(self):
         """获取当前选中的脚本信息。
 
         返回 (script, category, script_type)。如果未选择脚本，则 script 为 None。
         """
         current_type = self.get_current_script_type()
-        tree = self.script_trees[current_type]
-        selection = tree.selection()
-        if not selection:
-            return None, None, current_type
-
-        item = selection[0]
-        parent = tree.parent(item)
-        if not parent:
+        sid = self._get_selected_sid(current_type)
+        if sid is None:
             return None, None, current_type
-
-        script_name = tree.item(item).get("text")
-        category = tree.item(parent).get("text")
-
-        script_list = (self.config.get("scripts", {}) or {}).get(category, [])
-        script = next(
-            (
-                s
-                for s in script_list
-                if s.get("name") == script_name
-                and s.get("script_type", "python") == current_type
-            ),
-            None,
-        )
-        return script, category, current_type
+        return self.registry.get(sid), self.registry.category_of(sid), current_type
 
     def _get_selected_env_name(self):
         """尝试从界面状态中获取一个 Python 环境名称。"""
@@ -503,32 +622,9 @@ class ScriptManager:
     
     def on_script_select(self, event, script_type):
         """处理脚本选择事件"""
-        tree = event.widget
-        selection = tree.selection()
-        if not selection:
-            return
-        
-        item = selection[0]
-        parent = tree.parent(item)
-        
-        # 如果选中的是分类节点，则返回
-        if not parent:
-            return
-        
-        # 获取脚本信息
-        script_name = tree.item(item)["text"]
-        category = tree.item(parent)["text"]
-        
-        script_list = (self.config.get("scripts", {}) or {}).get(category, [])
-        script = next(
-            (
-                s
-                for s in script_list
-                if s.get("name") == script_name
-                and s.get("script_type", "python") == script_type
-            ),
-            None,
-        )
+        # 分类节点不在映射中，直接返回
+        sid = self._get_selected_sid(script_type)
+        script = self.registry.get(sid) if sid is not None else None
         
         if script:
             # 更新信息面板
@@ -539,7 +635,7 @@ class ScriptManager:
             self.desc_text.config(state='disabled')
             
             # 获取当前类型的控件
-            widgets = self.config_widgets[script_type]
+            widgets = self.ensure_config_frame(script_type)
             
             # 更新运行配置
             if script_type == "python" and "env_combo" in widgets:
@@ -638,11 +734,12 @@ class ScriptManager:
                     "category": dialog.category,
                     "script_type": script_type
                 }
+                if dialog.after:
+                    script_info["after"] = dialog.after
+                if dialog.timeout:
+                    script_info["timeout"] = dialog.timeout
                 
-                category = script_info["category"]
-                if category not in self.config["scripts"]:
-                    category = self.config["settings"]["default_category"]
-                self.config["scripts"][category].append(script_info)
+                self.registry.add(script_info, script_info["category"])
                 self.config_manager.save_config()
                 self.update_script_list()
             
@@ -651,16 +748,13 @@ class ScriptManager:
     
     def remove_script(self):
         """删除选中的脚本"""
-        script, category, _ = self._get_selected_script()
-        if not script:
+        sid = self._get_selected_sid()
+        if sid is None:
             return
 
-        script_name = script.get("name", "")
+        script_name = self.registry.get(sid).get("name", "")
         if messagebox.askyesno("确认", f"确定要删除脚本 {script_name} 吗?"):
-            try:
-                self.config.get("scripts", {}).get(category, []).remove(script)
-            except Exception:
-                pass
+            self.registry.remove(sid)
             self.config_manager.save_config()
             self.update_script_list()
             return
@@ -674,7 +768,7 @@ class ScriptManager:
         
         try:
             # 获取对应的运行器
-            widgets = self.config_widgets[current_type]
+            widgets = self.ensure_config_frame(current_type)
             info = self.script_types[current_type]
 
             # 运行时脚本信息（避免在未勾选“保存”为默认设置时修改配置）
@@ -687,9 +781,6 @@ class ScriptManager:
                 if selected_env:
                     script_to_run["env"] = selected_env
 
-            runner_class = RunnerFactory.get_runner(script_to_run.get("script_type", "python"))
-            runner = runner_class(script_to_run, self.config)
-            
             # 准备参数
             arguments = ""
             working_dir = os.path.dirname(script["path"])
@@ -735,34 +826,137 @@ class ScriptManager:
                     save_data["interactive"] = interactive
                 
                 if save_data:
-                    script.update(save_data)
+                    self.registry.update(self.registry.id_of(script), save_data)
                     self.config_manager.save_config()
             
-            # 运行脚本
-            process = runner.run(
+            # 提交到执行引擎，输出窗口在任务启动后创建
+            self.engine.submit(JobSpec(
+                script_to_run,
                 arguments=arguments,
                 working_dir=working_dir,
                 show_output=show_output,  # 使用实际的复选框状态
                 interactive=interactive
-            )
-            
-            # 只在需要时创建输出窗口
-            if show_output:
-                output_window = OutputWindow(
-                    self.root, 
-                    script_to_run.get("name", ""),
-                    interactive
-                )
-                output_window.display_output(process)
+            ))
         
         except Exception as e:
             messagebox.showerror("错误", f"运行脚本时出错: {str(e)}")
+
+    def run_batch(self):
+        """批量运行选中的脚本（选中分类时运行该分类下显示的全部脚本），输出合并显示在一个窗口中"""
+        script_type = self.get_current_script_type()
+        sync = self.tree_syncs.get(script_type)
+        sids = [sid for sid in (sync.selected_sids() if sync is not None else []) if sid in self.registry]
+        if not sids:
+            messagebox.showwarning("警告", "请先选择要运行的脚本或分类")
+            return
+        scripts = [self.registry.get(sid) for sid in sids]
+        settings = self.config.get("settings", {})
+        dialog = BatchRunDialog(self.root, [s.get("name", "") for s in scripts],
+                                max_parallel=settings.get("batch_max_parallel", 4))
+        if not dialog.result:
+            return
+        
+        try:
+            # 使用各脚本保存的参数和工作目录
+            batch = BatchRun(self.engine, scripts, mode=dialog.mode, max_parallel=dialog.max_parallel,
+                             continue_on_failure=dialog.continue_on_failure)
+        except ValueError as e:
+            messagebox.showerror("错误", str(e))
+            return
+        output_window = OutputWindow(self.root, f"批量运行（{len(scripts)} 个脚本）",
+                                     scrollback_lines=settings.get("scrollback_lines"),
+                                     kill_grace=self.engine.grace_period)
+        output_window.display_batch(batch)
+        batch.start()
+
+    def terminate_all_jobs(self):
+        """结束所有运行中的脚本及其子进程（包括不捕获输出的程序）"""
+        jobs = self.engine.running_jobs()
+        if not jobs:
+            messagebox.showinfo("提示", "没有正在运行的脚本")
+            return
+        names = "、".join(job.name for job in jobs[:5]) + (" 等" if len(jobs) > 5 else "")
+        if messagebox.askokcancel("确认", f"确定结束 {len(jobs)} 个正在运行的脚本（{names}）及其子进程吗？"):
+            self.engine.terminate_all()
+
+    def process_engine_events(self):
+        """在 Tk 线程中处理执行引擎事件"""
+        try:
+            while True:
+                event, job = self.engine_events.get_nowait()
+                if job.spec.batch_id is not None:
+                    # 批量运行中的任务由批量运行窗口统一显示
+                    continue
+                if event == "started" and job.spec.show_output:
+                    output_window = OutputWindow(
+                        self.root, job.name, job.spec.interactive,
+                        scrollback_lines=self.config.get("settings", {}).get("scrollback_lines"),
+                        kill_grace=self.engine.grace_period
+                    )
+                    output_window.job = job
+                    output_window.display_output(job.process, job.pump, job.output)
+                    self.output_windows[job.id] = output_window
+                elif event == "failed":
+                    messagebox.showerror("错误", f"运行脚本时出错: {str(job.error)}")
+                elif event == "finished":
+                    self.output_windows.pop(job.id, None)
+        except queue.Empty:
+            pass
+        self.root.after(50, self.process_engine_events)
+    
+    def show_import_profile(self):
+        """查看/重新分析选中 Python 脚本的导入耗时"""
+        script, category, current_type = self._get_selected_script()
+        if not script:
+            messagebox.showwarning("警告", "请先选择脚本")
+            return
+        if current_type != "python":
+            messagebox.showinfo("提示", "只能分析 Python 脚本")
+            return
+        sid = self.registry.id_of(script)
+        
+        def analyze(use_cprofile):
+            # 使用保存的参数和工作目录在后台完整运行一次
+            run_script = dict(script)
+            from src.import_profiler import profile_script
+            return self._executor("profile").submit(
+                profile_script, run_script, self.config,
+                arguments=run_script.get("arguments", ""),
+                working_dir=run_script.get("working_dir", ""),
+                use_cprofile=use_cprofile
+            )
+        
+        def on_result(profile):
+            # 分析结果保存在脚本条目中
+            if sid in self.registry:
+                self.registry.update(sid, {"import_profile": profile})
+                self.config_manager.save_config()
+        
+        ImportProfileDialog(self.root, script.get("name", ""), script.get("import_profile"),
+                            analyze, on_result)
+    
+    def show_metrics(self):
+        """查看各脚本的运行耗时和资源统计"""
+        if self.metrics is None:
+            messagebox.showinfo("提示", "运行统计未启用")
+            return
+        MetricsDialog(self.root, self.metrics)
+    
+    def show_run_log(self):
+        """查看历史运行记录（默认筛选当前选中的脚本）"""
+        if self.run_log is None:
+            messagebox.showinfo("提示", "运行日志未启用")
+            return
+        script = self._get_selected_script()[0]
+        RunLogDialog(self.root, self.run_log, script.get("name", "") if script else "")
     
     def edit_script_config(self):
         """编辑脚本配置"""
-        script, script_category, _ = self._get_selected_script()
-        if not script:
+        sid = self._get_selected_sid()
+        if sid is None:
             return
+        script = self.registry.get(sid)
+        script_category = self.registry.category_of(sid)
 
         dialog = ScriptConfigDialog(
             self.root,
@@ -774,6 +968,8 @@ class ScriptManager:
             category=script_category,
             categories=(self.config.get("scripts", {}) or {}).keys(),
             script_type=script.get("script_type", "python"),
+            after=script_dependencies(script),
+            timeout=script.get("timeout"),
         )
 
         if not dialog.result:
@@ -782,34 +978,31 @@ class ScriptManager:
         # 分类可能是用户手动输入的，确保存在
         new_category = dialog.category or script_category
         if new_category not in (self.config.get("scripts", {}) or {}):
-            self.config.setdefault("scripts", {})[new_category] = []
+            self.registry.add_category(new_category)
             # 若用户没有显式排序，新增分类追加到末尾（"其他"永远最后）
             if new_category != "其他":
                 order = self.config.setdefault("settings", {}).setdefault("category_order", [])
                 if new_category not in order:
                     order.append(new_category)
 
-        # 如果分类改变，需要移动脚本
-        if new_category != script_category:
-            try:
-                self.config["scripts"][script_category].remove(script)
-            except Exception:
-                pass
-            self.config["scripts"][new_category].append(script)
-            script_category = new_category
-
-        # 直接更新脚本信息
+        # 更新脚本信息（分类改变时注册表会移动脚本）
         new_type = getattr(dialog, "script_type", script.get("script_type", "python"))
-        script.update(
-            {
-                "name": dialog.script_name,
-                "script_type": new_type,
-                "env": dialog.selected_env if new_type == "python" else "",
-                "description": dialog.description,
-                "category": new_category,
-                "path": getattr(dialog, "path", script.get("path", "")),
-            }
-        )
+        changes = {
+            "name": dialog.script_name,
+            "script_type": new_type,
+            "env": dialog.selected_env if new_type == "python" else "",
+            "description": dialog.description,
+            "path": getattr(dialog, "path", script.get("path", "")),
+        }
+        # 与添加脚本一致：可选字段有值时才写入，清空后从条目中删除
+        removed = []
+        for key in ("after", "timeout"):
+            value = getattr(dialog, key)
+            if value:
+                changes[key] = value
+            else:
+                removed.append(key)
+        self.registry.update(sid, changes, category=new_category, removed=removed)
 
         self.config_manager.save_config()
         self.update_script_list()
@@ -869,36 +1062,72 @@ class ScriptManager:
             messagebox.showwarning("提示", f"未找到名为 {env_name} 的环境")
             return
 
+        # 只获取版本；环境未变化时直接使用缓存，不启动解释器
+        from src.env_info import default_cache
+        future = default_cache().probe_async(env.get("path", ""), packages=False)
+        self._poll_env_test(future)
+    
+    def _poll_env_test(self, future):
+        """等待后台环境测试完成后显示结果"""
+        if not future.done():
+            self.root.after(50, self._poll_env_test, future)
+            return
         try:
-            result = subprocess.run(
-                [env.get("path", ""), "--version"],
-                capture_output=True,
-                text=True,
-            )
-            version = (result.stdout or result.stderr).strip()
-            messagebox.showinfo("环境测试", f"环境正常\n{version}")
+            info = future.result()
+            messagebox.showinfo("环境测试", f"环境正常\n{info.get('version', '')}")
         except Exception as e:
             messagebox.showerror("错误", f"测试环境时出错: {str(e)}")
     
+    def scan_envs(self):
+        """在后台并行扫描并检查所有 Python 环境"""
+        if getattr(self, "_env_scan", None) is not None and not self._env_scan.done():
+            return
+        settings = self.config.get("settings", {})
+        from src.env_discovery import DEFAULT_VENV_ROOTS, discover_environments
+        roots = list(DEFAULT_VENV_ROOTS) + list(settings.get("env_search_paths") or [])
+        self._env_scan = self._executor("search").submit(
+            discover_environments, self.config, venv_roots=roots,
+            timeout=settings.get("env_probe_timeout", 10)
+        )
+        self.root.config(cursor="watch")
+        self._poll_env_scan()
+    
+    def _poll_env_scan(self):
+        """扫描完成后一次性合并新环境并显示汇总"""
+        if not self._env_scan.done():
+            self.root.after(100, self._poll_env_scan)
+            return
+        self.root.config(cursor="")
+        try:
+            report = self._env_scan.result()
+        except Exception as e:
+            messagebox.showerror("错误", f"扫描环境时出错: {str(e)}")
+            return
+        from src.env_discovery import merge_environments
+        if merge_environments(self.config, report):
+            self.config_manager.save_config()
+            self.update_env_list()
+        messagebox.showinfo("扫描环境", report.summary())
+    
     def browse_dir(self):
         """选择工作目录"""
         dir_path = filedialog.askdirectory(title="选择工作目录")
         if dir_path:
-            self.config_widgets[self.get_current_script_type()]['dir_entry'].delete(0, tk.END)
-            self.config_widgets[self.get_current_script_type()]['dir_entry'].insert(0, dir_path)
+            self.ensure_config_frame(self.get_current_script_type())['dir_entry'].delete(0, tk.END)
+            self.ensure_config_frame(self.get_current_script_type())['dir_entry'].insert(0, dir_path)
     
     def handle_drop(self, event):
         """处理文件拖放"""
         files = self.root.tk.splitlist(event.data)
         # 将文件路径添加到参数中
-        current_args = self.config_widgets[self.get_current_script_type()]['args_entry'].get().strip()
+        current_args = self.ensure_config_frame(self.get_current_script_type())['args_entry'].get().strip()
         file_paths = ' '.join(f'"{f}"' if ' ' in f else f for f in files)
         
         if current_args:
-            self.config_widgets[self.get_current_script_type()]['args_entry'].delete(0, tk.END)
-            self.config_widgets[self.get_current_script_type()]['args_entry'].insert(0, f"{current_args} {file_paths}")
+            self.ensure_config_frame(self.get_current_script_type())['args_entry'].delete(0, tk.END)
+            self.ensure_config_frame(self.get_current_script_type())['args_entry'].insert(0, f"{current_args} {file_paths}")
         else:
-            self.config_widgets[self.get_current_script_type()]['args_entry'].insert(0, file_paths)
+            self.ensure_config_frame(self.get_current_script_type())['args_entry'].insert(0, file_paths)
     
     def create_env_page(self, parent):
         """创建Python环境管理页面"""
@@ -945,6 +1174,7 @@ class ScriptManager:
         ttk.Button(btn_frame, text="添加环境", command=self.add_env).pack(side=tk.LEFT, padx=2)
         ttk.Button(btn_frame, text="删除环境", command=self.remove_env).pack(side=tk.LEFT, padx=2)
         ttk.Button(btn_frame, text="测试环境", command=self.test_env).pack(side=tk.LEFT, padx=2)
+        ttk.Button(btn_frame, text="扫描环境", command=self.scan_envs).pack(side=tk.LEFT, padx=2)
         
         # 更新环境列表
         self.update_env_list()
@@ -957,9 +1187,12 @@ class ScriptManager:
         # 绑定右键菜单
         self.env_tree.bind('<Button-3>', self.show_env_context_menu)
     
+    def _env_names(self):
+        return [e.get("name") for e in (self.config.get("python_environments", []) or []) if e.get("name")]
+
     def update_env_list(self):
         """更新环境列表"""
-        env_names = [e.get("name") for e in (self.config.get("python_environments", []) or []) if e.get("name")]
+        env_names = self._env_names()
 
         # 1) 如果存在环境列表（env_tree），同步刷新
         if hasattr(self, "env_tree"):
@@ -1005,12 +1238,11 @@ class ScriptManager:
             for category in old_categories - new_categories:
                 # 将该分类下的脚本移动到"其他"分类
                 if category != "其他":  # 不允许删除"其他"分类
-                    scripts = self.config["scripts"].pop(category)
-                    self.config["scripts"]["其他"].extend(scripts)
+                    self.registry.remove_category(category, move_to="其他")
             
             # 处理新增的分类
             for category in new_categories - old_categories:
-                self.config["scripts"][category] = []
+                self.registry.add_category(category)
             
             # 保存分类顺序
             self.config["settings"]["category_order"] = dialog.category_order
@@ -1109,6 +1341,18 @@ class ScriptManager:
         if self.interactive_var.get():
             self.show_output_var.set(True)  # 如果选择交互模式,则自动勾选显示输出
 
+    def reap_on_exit(self):
+        """按 exit_policy 设置结束仍在运行的脚本（连同子进程），最多等待宽限期"""
+        policy = self.config.get("settings", {}).get("exit_policy", EXIT_ATTACHED)
+        if policy not in (EXIT_ATTACHED, EXIT_ALL):
+            return
+        try:
+            # 等待进程退出期间先隐藏窗口
+            self.root.withdraw()
+            self.engine.terminate_all(detached=policy == EXIT_ALL, wait=True)
+        except Exception:
+            pass
+
     def on_app_close(self):
         """窗口关闭时保存必要的界面状态。"""
         try:
@@ -1118,10 +1362,21 @@ class ScriptManager:
             if size:
                 self.config.setdefault("settings", {})["window_size"] = size
                 self.config_manager.save_config()
+            # 退出前写入所有待保存的修改
+            self.config_manager.flush()
         except Exception:
             # 关闭时不阻塞退出
             pass
         finally:
+            # 取消尚未启动的任务，再按 exit_policy 结束仍在运行的脚本
+            self.engine.shutdown()
+            self.reap_on_exit()
+            for executor in self._executors.values():
+                executor.shutdown(wait=False)
+            from src.env_info import shutdown_default_cache
+            from src.warm_pool import shutdown_default_pool
+            shutdown_default_cache()
+            shutdown_default_pool()
             try:
                 self.root.destroy()
             except Exception:
@@ -0,0 +1,256 @@
+import bisect
+import re
+import threading
+
+# 各字段的权重：名称最重要，其次是标签和描述
+FIELD_WEIGHTS = {
+    "name": 5.0,
+    "tags": 3.0,
+    "description": 2.0,
+    "path": 1.0,
+    "arguments": 1.0,
+}
+
+# 下划线也作为分隔符，便于匹配 snake_case 名称中的单词
+_TOKEN_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
+# 模糊匹配时三元组至少需要命中的比例
+MIN_TRIGRAM_RATIO = 0.34
+
+# 精确/前缀命中少于该数量时才进行模糊匹配
+FUZZY_THRESHOLD = 50
+
+# 出现在过多词元中的三元组区分度很低，模糊匹配时跳过
+MAX_GRAM_TOKENS = 2000
+
+
+def tokenize(text):
+    """把文本拆分为小写词元"""
+    return _TOKEN_RE.findall(str(text or "").lower())
+
+
+def trigrams(token):
+    """词元的三元组（两端补空格，便于匹配词首/词尾）"""
+    padded = f" {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _field_text(script, field):
+    value = script.get(field)
+    if isinstance(value, (list, tuple)):
+        return " ".join(str(v) for v in value)
+    return str(value or "")
+
+
+class SearchIndex:
+    """脚本全文检索索引（倒排词元 + 三元组）
+
+    覆盖名称、描述、标签、路径和参数。查询按词元精确匹配、前缀匹配、
+    三元组模糊匹配和子串匹配依次打分，多个查询词之间为“与”关系。
+    索引可以在后台线程中查询；修改和查询之间由锁保护。
+    """
+
+    def __init__(self, registry=None, build=True):
+        self._lock = threading.RLock()
+        self._reset_structures()
+        self._building = False
+        self._backlog = []
+        self.ready = False
+        self.registry = registry
+        if registry is not None:
+            registry.add_listener(self._on_registry_changed)
+            if build:
+                self.rebuild()
+
+    def _reset_structures(self):
+        self._postings = {}      # 词元 -> {ID: 权重}
+        self._grams = {}         # 三元组 -> {词元}
+        self._doc_tokens = {}    # ID -> {词元: 权重}
+        self._doc_type = {}      # ID -> 脚本类型
+        self._sorted_tokens = None
+
+    # ---- 维护 ----
+
+    def rebuild(self):
+        """同步重建索引"""
+        self.build_from(list(self.registry.items()) if self.registry is not None else [])
+
+    def rebuild_async(self, executor):
+        """在后台线程中重建索引
+
+        脚本快照在调用线程中获取；构建期间的注册表变更先记录下来，
+        构建完成后按顺序重放，构建不会阻塞调用线程。
+        """
+        items = list(self.registry.items()) if self.registry is not None else []
+        with self._lock:
+            self._building = True
+            self._backlog = []
+            self.ready = False
+        return executor.submit(self.build_from, items)
+
+    def build_from(self, items):
+        """用 [(ID, 脚本)] 构建新索引并替换当前索引"""
+        fresh = SearchIndex()
+        for sid, script in items:
+            fresh._add(sid, script)
+        with self._lock:
+            self._postings = fresh._postings
+            self._grams = fresh._grams
+            self._doc_tokens = fresh._doc_tokens
+            self._doc_type = fresh._doc_type
+            self._sorted_tokens = None
+            backlog, self._backlog = self._backlog, []
+            self._building = False
+            for sid, script in backlog:
+                self._remove(sid)
+                if script is not None:
+                    self._add(sid, script)
+            self.ready = True
+
+    def _on_registry_changed(self, action, sid):
+        if action == "reset":
+            self.rebuild()
+        elif action == "remove":
+            self.update(sid, None)
+        else:
+            self.update(sid, self.registry.get(sid))
+
+    def update(self, sid, script):
+        """添加或更新一个脚本（script 为 None 表示删除）"""
+        with self._lock:
+            if self._building:
+                self._backlog.append((sid, script))
+                return
+            self._remove(sid)
+            if script is not None:
+                self._add(sid, script)
+
+    def remove(self, sid):
+        self.update(sid, None)
+
+    def _add(self, sid, script):
+        doc = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            text = _field_text(script, field)
+            if not text:
+                continue
+            for token in tokenize(text):
+                if doc.get(token, 0) < weight:
+                    doc[token] = weight
+        for token, weight in doc.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                self._sorted_tokens = None
+                for gram in trigrams(token):
+                    self._grams.setdefault(gram, set()).add(token)
+            postings[sid] = weight
+        self._doc_tokens[sid] = doc
+        self._doc_type[sid] = script.get("script_type", "python")
+
+    def _remove(self, sid):
+        doc = self._doc_tokens.pop(sid, None)
+        self._doc_type.pop(sid, None)
+        if not doc:
+            return
+        for token in doc:
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(sid, None)
+            if not postings:
+                del self._postings[token]
+                self._sorted_tokens = None
+                for gram in trigrams(token):
+                    tokens = self._grams.get(gram)
+                    if tokens is not None:
+                        tokens.discard(token)
+                        if not tokens:
+                            del self._grams[gram]
+
+    def __len__(self):
+        return len(self._doc_tokens)
+
+    # ---- 查询 ----
+
+    def search(self, query, script_type=None, limit=None):
+        """查询脚本，返回按得分从高到低排序的 [(ID, 得分)]"""
+        terms = tokenize(query)
+        if not terms:
+            return []
+        with self._lock:
+            total = None
+            for term in terms:
+                scores = self._score_term(term)
+                if total is None:
+                    total = scores
+                else:
+                    total = {sid: total[sid] + score for sid, score in scores.items() if sid in total}
+                if not total:
+                    return []
+            if script_type is not None:
+                total = {sid: score for sid, score in total.items()
+                         if self._doc_type.get(sid) == script_type}
+        ranked = sorted(total.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit] if limit else ranked
+
+    def _score_term(self, term):
+        scores = {}
+
+        def add(postings, factor):
+            for sid, weight in postings.items():
+                score = weight * factor
+                if scores.get(sid, 0) < score:
+                    scores[sid] = score
+
+        # 1) 精确词元
+        postings = self._postings.get(term)
+        if postings:
+            add(postings, 3.0)
+
+        # 2) 前缀匹配
+        if self._sorted_tokens is None:
+            self._sorted_tokens = sorted(self._postings)
+        tokens = self._sorted_tokens
+        i = bisect.bisect_left(tokens, term)
+        while i < len(tokens) and tokens[i].startswith(term):
+            if tokens[i] != term:
+                add(self._postings[tokens[i]], 2.0)
+            i += 1
+
+        # 3) 三元组模糊匹配（容忍拼写错误），仅在精确/前缀命中较少时进行
+        if len(term) >= 3 and len(scores) < FUZZY_THRESHOLD:
+            term_grams = trigrams(term)
+            overlap = {}
+            for gram in term_grams:
+                tokens_with_gram = self._grams.get(gram, ())
+                if len(tokens_with_gram) > MAX_GRAM_TOKENS:
+                    continue
+                for token in tokens_with_gram:
+                    overlap[token] = overlap.get(token, 0) + 1
+            for token, count in overlap.items():
+                ratio = count / max(len(term_grams), len(token))
+                if ratio >= MIN_TRIGRAM_RATIO and token != term and not token.startswith(term):
+                    add(self._postings[token], ratio)
+
+        # 4) 子串匹配（如中文词中间的片段、路径片段）
+        for token in self._tokens_containing(term, scan=not scores):
+            for sid in self._postings[token]:
+                if sid not in scores:
+                    scores[sid] = 0.5
+        return scores
+
+    def _tokens_containing(self, term, scan):
+        """包含 term 的词元
+
+        查询词只由词元字符组成，在文本中出现时必然位于某个词元内部。长度不少于 3 时
+        取 term 中最少见的三元组，只检查含有它的词元；更短的查询词无法用三元组定位，
+        只在 scan 为 True（前面的匹配都没有命中）时逐个检查词元。
+        """
+        if len(term) >= 3:
+            candidates = min((self._grams.get(term[i:i + 3], ()) for i in range(len(term) - 2)), key=len)
+        elif scan:
+            candidates = self._postings
+        else:
+            return []
+        return [token for token in candidates if term in token]
@@ -0,0 +1,386 @@
+import heapq
+import itertools
+import os
+import selectors
+import subprocess
+import threading
+import time
+from collections import deque
+
+# 单次读取的最大字节数
+CHUNK_SIZE = 64 * 1024
+
+
+def is_supported():
+    """当前平台能否用 selectors 监视管道（Windows 上 select 只支持套接字）"""
+    return os.name == "posix"
+
+
+def _pidfd_supported():
+    """Linux 5.3+ 且 Python 3.9+ 时可用 pidfd 等待任意进程退出"""
+    if not hasattr(os, "pidfd_open"):
+        return False
+    try:
+        os.close(os.pidfd_open(os.getpid()))
+    except OSError:
+        return False
+    return True
+
+
+def exit_code(status):
+    """把 wait 状态转换为 returncode（与 subprocess 一致：被信号终止时为负的信号值）"""
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def reap(process, block=True):
+    """回收 Popen 子进程，返回 (退出码, 资源使用)
+
+    POSIX 下用 os.wait4 同时得到 CPU 时间和峰值内存。block 为 False 且进程
+    尚未退出时返回 None。已在其他地方被回收（如 Popen.poll）时资源使用为 None。
+    """
+    if process.returncode is not None:
+        return process.returncode, None
+    if not hasattr(os, "wait4"):
+        if block:
+            return process.wait(), None
+        returncode = process.poll()
+        return None if returncode is None else (returncode, None)
+    try:
+        pid, status, rusage = os.wait4(process.pid, 0 if block else os.WNOHANG)
+    except ChildProcessError:
+        # 退出码由 Popen 记录
+        returncode = process.wait() if block else process.poll()
+        return None if returncode is None else (returncode, None)
+    if pid == 0:
+        return None
+    process.returncode = exit_code(status)
+    return process.returncode, rusage
+
+
+def _ignore_signal(signum, frame):
+    pass
+
+
+class _Timer:
+    """call_later 返回的句柄"""
+
+    __slots__ = ("deadline", "seq", "callback", "args", "cancelled")
+
+    def __init__(self, deadline, seq, callback, args):
+        self.deadline = deadline
+        self.seq = seq
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def __lt__(self, other):
+        return (self.deadline, self.seq) < (other.deadline, other.seq)
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class ProcessSupervisor:
+    """进程监视器：在一个线程中用 selectors 多路复用所有子进程的输出管道和退出事件
+
+    每个管道设为非阻塞后注册到同一个选择器，可读时读取一块数据交给回调，
+    读到 EOF 时注销并关闭管道。无论同时运行多少脚本，只占用一个线程。
+
+    进程退出通过 pidfd（Linux）通知：pidfd 可读即进程已退出，随后用 wait4
+    回收并取得资源使用。pidfd 不可用时改用 SIGCHLD：信号通过
+    signal.set_wakeup_fd 写入唤醒管道，醒来后对监视中的子进程逐个
+    waitpid(WNOHANG)。两者都不需要定时轮询，没有进程退出时不会被唤醒。
+    预热池进程不是本进程的子进程，其退出码由工作进程通过套接字发送，
+    监视器把工作进程的套接字注册到选择器中等待这条消息。
+
+    回调在监视线程中执行，必须很快返回（只做解码、入队等工作），
+    否则会拖慢其他进程的输出。
+    """
+
+    def __init__(self, chunk_size=CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.pidfd_supported = _pidfd_supported()
+        self._selector = selectors.DefaultSelector()
+        self._lock = threading.Lock()
+        self._calls = deque()   # 需要在监视线程中执行的操作
+        self._timers = []       # call_later 的定时器（堆）
+        self._timer_ids = itertools.count()
+        self._children = {}     # SIGCHLD 方式监视的子进程: pid -> (process, callback)
+        self._sigchld = False
+        self._thread = None
+        self._closed = False
+        # 自唤醒管道：其他线程注册管道后写入一个字节，使 select 立即返回
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        os.set_blocking(self._wake_w, False)
+        self._selector.register(self._wake_r, selectors.EVENT_READ, None)
+
+    # ---- 线程间调用 ----
+
+    def call_soon(self, callback, *args):
+        """在监视线程中执行 callback(*args)"""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("进程监视器已关闭")
+            self._calls.append((callback, args))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True, name="process-supervisor")
+                self._thread.start()
+        try:
+            os.write(self._wake_w, b"\0")
+        except BlockingIOError:
+            # 唤醒管道已满，监视线程必然会醒来
+            pass
+
+    def call_later(self, delay, callback, *args):
+        """delay 秒后在监视线程中执行 callback(*args)，返回可 cancel() 的句柄"""
+        timer = _Timer(time.monotonic() + delay, next(self._timer_ids), callback, args)
+        self.call_soon(heapq.heappush, self._timers, timer)
+        return timer
+
+    def _run_calls(self):
+        try:
+            while os.read(self._wake_r, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        while True:
+            with self._lock:
+                if not self._calls:
+                    break
+                callback, args = self._calls.popleft()
+            self._invoke(callback, *args)
+        # 唤醒也可能来自 SIGCHLD
+        if self._children:
+            self._reap_children()
+
+    def _run_timers(self):
+        now = time.monotonic()
+        while self._timers and self._timers[0].deadline <= now:
+            timer = heapq.heappop(self._timers)
+            if not timer.cancelled:
+                self._invoke(timer.callback, *timer.args)
+
+    @staticmethod
+    def _invoke(callback, *args):
+        try:
+            callback(*args)
+        except Exception:
+            pass
+
+    # ---- 管道 ----
+
+    def add_reader(self, pipe, on_data, on_eof):
+        """监视管道输出：on_data(bytes) 处理每块数据，EOF 时关闭管道并调用 on_eof()
+
+        管道没有文件描述符或平台不支持时返回 False，调用方应改用线程读取。
+        """
+        if not is_supported():
+            return False
+        try:
+            fd = pipe.fileno()
+        except (AttributeError, OSError, ValueError):
+            return False
+        os.set_blocking(fd, False)
+        self.call_soon(self._register, fd, ("pipe", pipe, on_data, on_eof))
+        return True
+
+    def _register(self, fd, data):
+        self._selector.register(fd, selectors.EVENT_READ, data)
+
+    def _on_readable(self, fd, pipe, on_data, on_eof):
+        try:
+            data = os.read(fd, self.chunk_size)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if data:
+            self._invoke(on_data, data)
+            return
+        self._selector.unregister(fd)
+        try:
+            pipe.close()
+        except Exception:
+            pass
+        self._invoke(on_eof)
+
+    def reader_count(self):
+        """当前监视的管道和进程数"""
+        return len(self._selector.get_map()) - 1 + len(self._children)
+
+    # ---- 进程退出 ----
+
+    def install_sigchld_wakeup(self):
+        """pidfd 不可用时启用 SIGCHLD 通知，返回是否可用
+
+        signal 模块要求在主线程中调用；SIGCHLD 或 wakeup fd 已被其他代码
+        （如 asyncio）占用时不做修改。
+        """
+        if self.pidfd_supported or self._sigchld:
+            return True
+        if not is_supported() or threading.current_thread() is not threading.main_thread():
+            return False
+        import signal
+        if signal.getsignal(signal.SIGCHLD) not in (signal.SIG_DFL, None):
+            return False
+        try:
+            previous = signal.set_wakeup_fd(self._wake_w, warn_on_full_buffer=False)
+        except ValueError:
+            return False
+        if previous != -1:
+            signal.set_wakeup_fd(previous)
+            return False
+        signal.signal(signal.SIGCHLD, _ignore_signal)
+        self._sigchld = True
+        return True
+
+    def watch_exit(self, process, callback):
+        """进程退出时在监视线程中调用 callback(returncode, rusage)，返回是否已接管
+
+        Popen 子进程由本监视器回收（wait4），调用方不应再 wait()。
+        预热池进程（非本进程的子进程）的 PID 可能在退出后被复用，不用 pidfd 监视，
+        而是等待工作进程通过套接字发送的退出消息。
+        返回 False 时（平台不支持）调用方需自行等待。
+        """
+        if not is_supported():
+            return False
+        if not isinstance(process, subprocess.Popen):
+            try:
+                fd = process.worker.sock.fileno()
+            except (AttributeError, OSError):
+                return False
+            self.call_soon(self._add_warm, fd, process, callback)
+            return True
+        if self.pidfd_supported:
+            try:
+                fd = os.pidfd_open(process.pid)
+            except ProcessLookupError:
+                # 进程已被回收
+                self.call_soon(self._exited, process, callback)
+                return True
+            except OSError:
+                fd = None
+            if fd is not None:
+                self.call_soon(self._register, fd, ("exit", process, callback))
+                return True
+        if self._sigchld:
+            self.call_soon(self._add_child, process, callback)
+            return True
+        return False
+
+    def _add_child(self, process, callback):
+        self._children[process.pid] = (process, callback)
+        # 注册前可能已经退出，信号不会再来
+        self._reap_children()
+
+    def _reap_children(self):
+        for pid, (process, callback) in list(self._children.items()):
+            result = reap(process, block=False)
+            if result is not None:
+                del self._children[pid]
+                self._invoke(callback, *result)
+
+    def _on_exit(self, fd, process, callback):
+        self._selector.unregister(fd)
+        os.close(fd)
+        self._exited(process, callback)
+
+    def _exited(self, process, callback):
+        self._invoke(callback, *reap(process))
+
+    def _add_warm(self, fd, process, callback):
+        # 退出消息可能已随 PID 一起读入工作进程的缓冲区，套接字不会再变为可读
+        if process.poll() is not None:
+            self._invoke(callback, process.returncode, process.rusage)
+            return
+        self._register(fd, ("warm", process, callback))
+
+    def _on_warm_message(self, fd, process, callback):
+        # poll 只读取已到达的数据，消息不完整时等待下一次可读
+        if process.poll() is None:
+            return
+        self._selector.unregister(fd)
+        self._invoke(callback, process.returncode, process.rusage)
+
+    # ---- 主循环 ----
+
+    def _run(self):
+        while not self._closed:
+            timeout = None
+            if self._timers:
+                timeout = max(0.0, self._timers[0].deadline - time.monotonic())
+            try:
+                events = self._selector.select(timeout)
+            except OSError:
+                if self._closed:
+                    return
+                raise
+            for key, _ in events:
+                if key.data is None:
+                    self._run_calls()
+                elif key.data[0] == "pipe":
+                    self._on_readable(key.fd, *key.data[1:])
+                elif key.data[0] == "warm":
+                    self._on_warm_message(key.fd, *key.data[1:])
+                else:
+                    self._on_exit(key.fd, *key.data[1:])
+            if self._timers:
+                self._run_timers()
+
+    def close(self):
+        """停止监视线程（仍在监视的管道和进程不再处理）"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        try:
+            os.write(self._wake_w, b"\0")
+        except OSError:
+            pass
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(1)
+        if self._sigchld:
+            import signal
+            try:
+                signal.set_wakeup_fd(-1)
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            except ValueError:
+                pass
+        self._selector.close()
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+
+
+_default_supervisor = None
+_default_lock = threading.Lock()
+
+
+def default_supervisor():
+    """进程内共享的进程监视器；平台不支持时返回 None"""
+    global _default_supervisor
+    if not is_supported():
+        return None
+    with _default_lock:
+        if _default_supervisor is None:
+            _default_supervisor = ProcessSupervisor()
+        return _default_supervisor
+
+
+def call_later(delay, callback, *args):
+    """delay 秒后调用 callback(*args)，返回可 cancel() 的句柄
+
+    有进程监视器时由其定时器执行，否则使用 threading.Timer。
+    """
+    supervisor = default_supervisor()
+    if supervisor is not None:
+        try:
+            return supervisor.call_later(delay, callback, *args)
+        except RuntimeError:
+            pass
+    timer = threading.Timer(delay, callback, args)
+    timer.daemon = True
+    timer.start()
+    return timer
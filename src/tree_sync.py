@@ -0,0 +1,185 @@
+class ScriptTreeSync:
+    """把注册表中某一类型的脚本增量同步到 Treeview
+
+    每个脚本只创建一次树节点，之后过滤/刷新只对可见性发生变化的分类调用
+    set_children（一次调用重排该分类下的可见节点，其余节点被 detach），
+    不再每次删除并重建整棵树。
+    """
+
+    def __init__(self, tree, registry, script_type, values_of=None):
+        self.tree = tree
+        self.registry = registry
+        self.script_type = script_type
+        self.values_of = values_of or (lambda script: (script.get("description", ""),))
+        self.sid_items = {}        # 脚本 ID -> 树节点
+        self.item_sids = {}        # 树节点 -> 脚本 ID
+        self.category_items = {}   # 分类 -> 树节点
+        self.visible = {}          # 分类 -> 当前可见的脚本 ID 元组
+        self.category_order = []   # 当前显示的分类顺序
+        self.matcher = None
+        self.results = None
+        self._built = False
+        registry.add_listener(self._on_registry_changed)
+
+    def close(self):
+        self.registry.remove_listener(self._on_registry_changed)
+
+    # ---- 节点管理 ----
+
+    def _script_item(self, sid):
+        item = self.sid_items.get(sid)
+        if item is None:
+            script = self.registry.get(sid)
+            category_item = self._category_item(self.registry.category_of(sid))
+            item = self.tree.insert(category_item, "end", text=script.get("name", ""),
+                                    values=tuple(self.values_of(script)))
+            # 新节点先脱离树，由 sync 决定是否显示
+            self.tree.detach(item)
+            self.sid_items[sid] = item
+            self.item_sids[item] = sid
+        return item
+
+    def _category_item(self, category):
+        item = self.category_items.get(category)
+        if item is None:
+            item = self.tree.insert("", "end", text=category, open=True)
+            self.tree.detach(item)
+            self.category_items[category] = item
+            self.visible[category] = ()
+        return item
+
+    def _drop_script(self, sid):
+        item = self.sid_items.pop(sid, None)
+        if item is not None:
+            self.item_sids.pop(item, None)
+            self.tree.delete(item)
+
+    def _on_registry_changed(self, action, sid):
+        if action == "reset":
+            self.reset()
+            return
+        if not self._built:
+            return
+        if action == "remove":
+            self._drop_script(sid)
+            return
+        script = self.registry.get(sid)
+        if script is None or script.get("script_type", "python") != self.script_type:
+            # 类型被修改为其他类型，节点移交给对应的同步器
+            self._drop_script(sid)
+            return
+        item = self.sid_items.get(sid)
+        if item is not None:
+            self.tree.item(item, text=script.get("name", ""),
+                           values=tuple(self.values_of(script)))
+        # 新增或移动分类的脚本在下次 sync 时放到正确位置
+
+    def reset(self):
+        """丢弃所有节点，下次 sync 时重建"""
+        # 先全部脱离再删除，已 detach 的节点也能被清理
+        items = [item for item in list(self.sid_items.values()) + list(self.category_items.values())
+                 if self.tree.exists(item)]
+        if items:
+            self.tree.detach(*items)
+            self.tree.delete(*items)
+        self.sid_items.clear()
+        self.item_sids.clear()
+        self.category_items.clear()
+        self.visible.clear()
+        self.category_order = []
+        self._built = False
+
+    # ---- 同步 ----
+
+    def sid_of(self, item):
+        """树节点 -> 脚本 ID（分类节点返回 None）"""
+        return self.item_sids.get(item)
+
+    def item_of(self, sid):
+        return self.sid_items.get(sid)
+
+    def selected_sid(self):
+        """当前选中的脚本 ID（未选中或选中分类时返回 None）"""
+        selection = self.tree.selection()
+        return self.sid_of(selection[0]) if selection else None
+
+    def selected_sids(self):
+        """所有选中的脚本 ID；选中分类时包含该分类下当前显示的全部脚本"""
+        categories = {item: category for category, item in self.category_items.items()}
+        result = {}
+        for item in self.tree.selection():
+            sid = self.item_sids.get(item)
+            if sid is not None:
+                result[sid] = None
+            elif item in categories:
+                result.update(dict.fromkeys(self.visible.get(categories[item], ())))
+        return list(result)
+
+    def set_matcher(self, matcher):
+        """设置过滤函数 matcher(sid, script) -> bool，None 表示显示全部"""
+        self.matcher = matcher
+        self.results = None
+
+    def set_results(self, ranked_sids):
+        """按检索结果显示：只显示给定的脚本，分类内按给定顺序（相关度）排列
+
+        ranked_sids 为 None 时恢复为显示全部。
+        """
+        self.results = list(ranked_sids) if ranked_sids is not None else None
+        self.matcher = None
+
+    def _group_results(self):
+        grouped = {}
+        registry = self.registry
+        for sid in self.results:
+            script = registry.get(sid)
+            if script is not None and script.get("script_type", "python") == self.script_type:
+                grouped.setdefault(registry.category_of(sid), []).append(sid)
+        return grouped
+
+    def sync(self, categories):
+        """按给定分类顺序同步树，只更新可见性发生变化的分类，返回变化的分类数"""
+        registry = self.registry
+        matcher = self.matcher
+        grouped = self._group_results() if self.results is not None else None
+        changed = 0
+        shown_categories = []
+
+        for category in categories:
+            sids = registry.ids_in(category, self.script_type)
+            if not sids:
+                if self.visible.get(category):
+                    self.tree.set_children(self.category_items[category])
+                    self.visible[category] = ()
+                continue
+            shown_categories.append(category)
+            if grouped is not None:
+                wanted = tuple(grouped.get(category, ()))
+            elif matcher is None:
+                wanted = tuple(sids)
+            else:
+                wanted = tuple(sid for sid in sids if matcher(sid, registry.get(sid)))
+            if wanted != self.visible.get(category):
+                category_item = self._category_item(category)
+                self.tree.set_children(category_item, *[self._script_item(sid) for sid in wanted])
+                # 移动分类的脚本：节点所在父节点已经随 set_children 更新
+                self.visible[category] = wanted
+                changed += 1
+
+        # 没有脚本的分类（或已删除的分类）从树上移除
+        for category in list(self.category_items):
+            if category not in shown_categories and category not in categories:
+                item = self.category_items.pop(category)
+                self.visible.pop(category, None)
+                if self.tree.exists(item):
+                    for child in self.tree.get_children(item):
+                        self.tree.detach(child)
+                    self.tree.delete(item)
+
+        if shown_categories != self.category_order:
+            self.tree.set_children("", *[self._category_item(c) for c in shown_categories])
+            self.category_order = shown_categories
+            changed += 1
+
+        self._built = True
+        return changed
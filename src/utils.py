@@ -1,6 +1,5 @@
 import os
 import shlex
-import subprocess
 from pathlib import Path
 
 
@@ -32,29 +31,13 @@ def split_arguments(arg_string: str):
     return parts
 
 def get_python_info(python_path):
-    """获取Python环境信息"""
+    """获取Python环境信息
+    
+    结果按解释器路径和 site-packages 修改时间缓存，环境未变化时立即返回。
+    """
+    from src.env_info import default_cache
     try:
-        # 获取Python版本
-        version_result = subprocess.run(
-            [python_path, "--version"],
-            capture_output=True,
-            text=True
-        )
-        # 有些环境会把版本输出到 stderr
-        version = (version_result.stdout or version_result.stderr).strip()
-        
-        # 获取已安装的包列表
-        pip_result = subprocess.run(
-            [python_path, "-m", "pip", "list"],
-            capture_output=True,
-            text=True
-        )
-        packages = (pip_result.stdout or pip_result.stderr).strip()
-        
-        return {
-            "version": version,
-            "packages": packages
-        }
+        return default_cache().get(python_path)
     except Exception as e:
         return {
             "version": "获取失败",
@@ -0,0 +1,369 @@
+from bisect import bisect_right
+
+# 行高无法从样式或已显示的行得到时使用的默认值（像素）
+DEFAULT_ROW_HEIGHT = 20
+
+# 分类行前的展开/折叠标记
+OPEN_MARK = "▼"
+CLOSED_MARK = "▶"
+
+
+class VirtualScriptList:
+    """虚拟化的脚本列表：Treeview 中只保留可见窗口大小的一组行
+
+    与 ScriptTreeSync 接口相同（sync / set_matcher / set_results / sid_of /
+    selected_sid / selected_sids / close），但不为每个脚本创建树节点。分类和脚本被展平成
+    一个逻辑行序列（分类行 + 展开分类中的脚本行），滚动、展开/折叠时只改写
+    固定数量的行节点的文字和列值，节点数和刷新开销与脚本总数无关。
+
+    滚动条由本类驱动：Treeview 自身的 yscrollcommand 被替换，滚动条的
+    command 指向 yview。分类行单击即展开/折叠。选中状态按逻辑行记录，
+    滚出窗口的选中行在滚回时恢复。
+    """
+
+    def __init__(self, tree, registry, script_type, values_of=None, scrollbar=None):
+        self.tree = tree
+        self.registry = registry
+        self.script_type = script_type
+        self.values_of = values_of or (lambda script: (script.get("description", ""),))
+        self.scrollbar = scrollbar
+        self.visible = {}          # 分类 -> 当前可见的脚本 ID 元组
+        self.category_order = []   # 当前显示的分类顺序
+        self.closed = set()        # 已折叠的分类
+        self.matcher = None
+        self.results = None
+        self.top = 0               # 窗口第一行在逻辑行序列中的位置
+        self.marked = {}           # 选中的逻辑行 (分类, 脚本 ID) -> None，保持选中顺序
+        self._starts = []          # 每个显示的分类在逻辑行序列中的起始位置
+        self._total = 0
+        self._slots = []           # 行节点
+        self._slot_rows = {}       # 行节点 -> (分类, 脚本 ID)，分类行的脚本 ID 为 None
+        self._slot_keys = {}       # 行节点 -> 上次写入的内容，用于跳过未变化的行
+        self._page = 0
+        registry.add_listener(self._on_registry_changed)
+
+        # Treeview 不再自行滚动，滚动条和滚轮都改为移动窗口
+        tree.configure(yscrollcommand="")
+        if scrollbar is not None:
+            scrollbar.configure(command=self.yview)
+        tree.bind("<Configure>", lambda e: self._render(), add="+")
+        tree.bind("<MouseWheel>", self._on_wheel, add="+")
+        tree.bind("<Button-4>", lambda e: self._scroll_by(-3), add="+")
+        tree.bind("<Button-5>", lambda e: self._scroll_by(3), add="+")
+        tree.bind("<ButtonRelease-1>", self._on_click, add="+")
+        tree.bind("<<TreeviewSelect>>", lambda e: self._update_marked(), add="+")
+        tree.bind("<Up>", lambda e: self.move_selection(-1), add="+")
+        tree.bind("<Down>", lambda e: self.move_selection(1), add="+")
+        tree.bind("<Prior>", lambda e: self.move_selection(-max(1, self._page - 1)), add="+")
+        tree.bind("<Next>", lambda e: self.move_selection(max(1, self._page - 1)), add="+")
+
+    def close(self):
+        self.registry.remove_listener(self._on_registry_changed)
+
+    # ---- 逻辑行 ----
+
+    def __len__(self):
+        """逻辑行数（分类行 + 展开分类中的脚本行）"""
+        return self._total
+
+    def _layout(self):
+        """根据可见脚本和折叠状态计算各分类的起始行"""
+        starts = []
+        total = 0
+        for category in self.category_order:
+            starts.append(total)
+            total += 1
+            if category not in self.closed:
+                total += len(self.visible.get(category, ()))
+        self._starts = starts
+        self._total = total
+
+    def row_at(self, index):
+        """第 index 个逻辑行，返回 (分类, 脚本 ID)；分类行的脚本 ID 为 None"""
+        if index < 0 or index >= self._total:
+            return None
+        pos = bisect_right(self._starts, index) - 1
+        category = self.category_order[pos]
+        offset = index - self._starts[pos]
+        if offset == 0:
+            return category, None
+        return category, self.visible[category][offset - 1]
+
+    def index_of(self, sid):
+        """脚本所在的逻辑行，脚本不可见（被过滤或分类折叠）时返回 None"""
+        category = self.registry.category_of(sid)
+        if category is None or category in self.closed:
+            return None
+        try:
+            pos = self.category_order.index(category)
+            return self._starts[pos] + 1 + self.visible[category].index(sid)
+        except (KeyError, ValueError):
+            return None
+
+    # ---- 注册表变化 ----
+
+    def _on_registry_changed(self, action, sid):
+        if action == "reset":
+            self.reset()
+            return
+        if action == "remove":
+            self.marked = {row: None for row in self.marked if row[1] != sid}
+        # 已显示的行在下次渲染时重写；新增、删除和移动的脚本由下次 sync 处理
+        self._slot_keys.clear()
+        self._render()
+
+    def reset(self):
+        """清空逻辑行，下次 sync 时重新计算"""
+        self.visible.clear()
+        self.category_order = []
+        self.marked = {}
+        self.top = 0
+        self._layout()
+        self._slot_keys.clear()
+        self._render()
+
+    # ---- 过滤 ----
+
+    def sid_of(self, item):
+        """行节点 -> 脚本 ID（分类行返回 None）"""
+        row = self._slot_rows.get(item)
+        return row[1] if row is not None else None
+
+    def item_of(self, sid):
+        """脚本当前所在的行节点，不在可见窗口内时返回 None"""
+        for item, row in self._slot_rows.items():
+            if row[1] == sid:
+                return item
+        return None
+
+    def _update_marked(self):
+        """把 Treeview 的选中状态合并到逻辑行选中集合（窗口外的选中行保持不变）"""
+        window = set(self._slot_rows.values())
+        marked = {row: None for row in self.marked if row not in window}
+        for item in self.tree.selection():
+            row = self._slot_rows.get(item)
+            if row is not None:
+                marked[row] = None
+        self.marked = marked
+
+    def selected_sid(self):
+        """当前选中的脚本 ID（选中分类行时返回 None）；选中的脚本滚出窗口后仍然返回它"""
+        self._update_marked()
+        selection = self.tree.selection()
+        if selection:
+            return self.sid_of(selection[0])
+        return next((row[1] for row in self.marked if row[1] is not None), None)
+
+    def selected_sids(self):
+        """所有选中的脚本 ID；选中分类行时包含该分类下当前显示的全部脚本"""
+        self._update_marked()
+        result = {}
+        for category, sid in self.marked:
+            if sid is None:
+                result.update(dict.fromkeys(self.visible.get(category, ())))
+            else:
+                result[sid] = None
+        return list(result)
+
+    def set_matcher(self, matcher):
+        """设置过滤函数 matcher(sid, script) -> bool，None 表示显示全部"""
+        self.matcher = matcher
+        self.results = None
+
+    def set_results(self, ranked_sids):
+        """按检索结果显示：只显示给定的脚本，分类内按给定顺序（相关度）排列"""
+        self.results = list(ranked_sids) if ranked_sids is not None else None
+        self.matcher = None
+
+    def _group_results(self):
+        grouped = {}
+        registry = self.registry
+        for sid in self.results:
+            script = registry.get(sid)
+            if script is not None and script.get("script_type", "python") == self.script_type:
+                grouped.setdefault(registry.category_of(sid), []).append(sid)
+        return grouped
+
+    def sync(self, categories):
+        """按给定分类顺序重新计算逻辑行并刷新可见窗口，返回变化的分类数"""
+        registry = self.registry
+        matcher = self.matcher
+        grouped = self._group_results() if self.results is not None else None
+        changed = 0
+        shown_categories = []
+        visible = {}
+
+        for category in categories:
+            sids = registry.ids_in(category, self.script_type)
+            if not sids:
+                continue
+            shown_categories.append(category)
+            if grouped is not None:
+                wanted = tuple(grouped.get(category, ()))
+            elif matcher is None:
+                wanted = tuple(sids)
+            else:
+                wanted = tuple(sid for sid in sids if matcher(sid, registry.get(sid)))
+            if wanted != self.visible.get(category):
+                changed += 1
+            visible[category] = wanted
+
+        if shown_categories != self.category_order:
+            changed += 1
+        self.visible = visible
+        self.category_order = shown_categories
+        self.closed &= set(shown_categories)
+        # 被过滤掉的行不再保持选中
+        self.marked = {row: None for row in self.marked
+                       if (row[1] is None and row[0] in visible)
+                       or (row[1] is not None and row[1] in visible.get(row[0], ()))}
+        if changed:
+            self._layout()
+            self._slot_keys.clear()
+            self._render()
+        return changed
+
+    # ---- 渲染 ----
+
+    def _measure(self):
+        """可见窗口能容纳的行数"""
+        tree = self.tree
+        row_height, first_y = 0, 0
+        bbox = tree.bbox(self._slots[0]) if self._slots and tree.exists(self._slots[0]) else ""
+        if bbox:
+            _, first_y, _, row_height = bbox
+        if not row_height:
+            try:
+                from tkinter import ttk
+                row_height = int(ttk.Style(tree).lookup("Treeview", "rowheight") or 0)
+            except Exception:
+                row_height = 0
+            row_height = row_height or DEFAULT_ROW_HEIGHT
+            first_y = row_height  # 表头大约占一行
+        height = tree.winfo_height()
+        if height <= 1:
+            # 尚未显示时按请求的高度估算
+            height = first_y + int(tree.cget("height")) * row_height
+        return max(1, (height - first_y) // row_height)
+
+    def _row_content(self, row):
+        category, sid = row
+        if sid is None:
+            mark = CLOSED_MARK if category in self.closed else OPEN_MARK
+            count = len(self.visible.get(category, ()))
+            return f"{mark} {category} ({count})", (), ("category",)
+        script = self.registry.get(sid)
+        if script is None:
+            return "", (), ()
+        return "    " + script.get("name", ""), tuple(self.values_of(script)), ()
+
+    def _render(self):
+        """把逻辑行窗口 [top, top + page) 写入行节点"""
+        tree = self.tree
+        page = self._measure()
+        self._page = page
+        self.top = max(0, min(self.top, self._total - page))
+        while len(self._slots) < page:
+            self._slots.append(tree.insert("", "end", text=""))
+
+        shown = []
+        selected_items = []
+        for i, item in enumerate(self._slots[:page]):
+            row = self.row_at(self.top + i)
+            if row is None:
+                break
+            shown.append(item)
+            self._slot_rows[item] = row
+            if row in self.marked:
+                selected_items.append(item)
+            if self._slot_keys.get(item) != row:
+                text, values, tags = self._row_content(row)
+                tree.item(item, text=text, values=values, tags=tags)
+                self._slot_keys[item] = row
+        for item in self._slots[len(shown):]:
+            self._slot_rows.pop(item, None)
+            self._slot_keys.pop(item, None)
+        tree.set_children("", *shown)
+
+        # 选中状态跟随逻辑行而不是行节点
+        if set(tree.selection()) != set(selected_items):
+            tree.selection_set(selected_items)
+
+        if self.scrollbar is not None:
+            if self._total:
+                self.scrollbar.set(self.top / self._total,
+                                   min(1.0, (self.top + page) / self._total))
+            else:
+                self.scrollbar.set(0.0, 1.0)
+
+    # ---- 滚动与交互 ----
+
+    def yview(self, *args):
+        """滚动条回调：("moveto", 比例) 或 ("scroll", 数量, "units"/"pages")"""
+        if not args:
+            return
+        if args[0] == "moveto":
+            self.top = int(float(args[1]) * self._total)
+        elif args[0] == "scroll":
+            count = int(args[1])
+            if len(args) > 2 and args[2] == "pages":
+                count *= max(1, self._page - 1)
+            self.top += count
+        self._render()
+
+    def see(self, index):
+        """滚动使第 index 个逻辑行可见"""
+        if index < self.top:
+            self.top = index
+        elif index >= self.top + self._page:
+            self.top = index - self._page + 1
+        self._render()
+
+    def _scroll_by(self, rows):
+        self.top += rows
+        self._render()
+        return "break"
+
+    def _on_wheel(self, event):
+        # Windows 上 delta 为 120 的倍数，macOS 上为较小的整数
+        delta = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        return self._scroll_by(-3 * delta if delta else 0)
+
+    def _on_click(self, event):
+        """单击分类行时展开/折叠该分类"""
+        row = self._slot_rows.get(self.tree.identify_row(event.y))
+        if row is not None and row[1] is None:
+            self.toggle(row[0])
+
+    def toggle(self, category):
+        if category in self.closed:
+            self.closed.discard(category)
+        else:
+            self.closed.add(category)
+        self._layout()
+        self._slot_keys.clear()
+        self._render()
+
+    def move_selection(self, delta):
+        """键盘上下移动选中的脚本（跳过分类行），必要时滚动窗口"""
+        current = self.selected_sid()
+        index = self.index_of(current) if current is not None else None
+        if index is None:
+            index = self.top - 1 if delta > 0 else self.top + self._page
+        step = 1 if delta > 0 else -1
+        remaining = abs(delta)
+        target = None
+        while remaining:
+            index += step
+            row = self.row_at(index)
+            if row is None:
+                break
+            if row[1] is not None:
+                target = row[1]
+                remaining -= 1
+        if target is not None:
+            self.marked = {(self.registry.category_of(target), target): None}
+            self.see(self.index_of(target))
+            # 选中的行节点可能没有变化（窗口随之滚动），需要显式通知选中的脚本已改变
+            self.tree.event_generate("<<TreeviewSelect>>")
+        return "break"
@@ -0,0 +1,309 @@
+import array
+import json
+import os
+import select
+import socket
+import subprocess
+import threading
+from pathlib import Path
+
+# 工作进程脚本（在目标环境中运行，只依赖标准库）
+WORKER_SCRIPT = str(Path(__file__).with_name("warm_worker.py"))
+
+# 默认预先导入的模块
+DEFAULT_PRELOAD = [
+    "argparse", "collections", "datetime", "json", "logging", "pathlib",
+    "re", "shutil", "subprocess", "tempfile", "typing"
+]
+
+# 等待工作进程回复子进程 PID 的超时（秒）
+LAUNCH_TIMEOUT = 5
+
+
+def is_supported():
+    """预热池依赖 fork 和 Unix 套接字传递文件描述符，仅支持 POSIX"""
+    return os.name == 'posix' and hasattr(os, "fork") and hasattr(socket, "AF_UNIX")
+
+
+class WarmWorker:
+    """一个预热的解释器工作进程"""
+
+    def __init__(self, python_path, preload):
+        self.python_path = python_path
+        parent, child = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.process = subprocess.Popen(
+                [python_path, WORKER_SCRIPT, str(child.fileno()), ",".join(preload)],
+                pass_fds=(child.fileno(),),
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                start_new_session=True
+            )
+        except BaseException:
+            parent.close()
+            raise
+        finally:
+            child.close()
+        self.sock = parent
+        self.ready = False
+        self.busy = False
+        self.dead = False
+        self.preloaded = []
+        self._buffer = bytearray()
+        self._lock = threading.Lock()
+
+    def receive(self, timeout=None):
+        """读取一条消息；超时返回 None，连接关闭时返回 {"eof": True}"""
+        while b"\n" not in self._buffer:
+            readable, _, _ = select.select([self.sock], [], [], timeout)
+            if not readable:
+                return None
+            try:
+                data = self.sock.recv(65536)
+            except OSError:
+                data = b""
+            if not data:
+                self.dead = True
+                return {"eof": True}
+            self._buffer.extend(data)
+        line, _, rest = bytes(self._buffer).partition(b"\n")
+        self._buffer[:] = rest
+        return json.loads(line.decode("utf-8"))
+
+    def check_ready(self):
+        """非阻塞地检查工作进程是否已完成预加载"""
+        if not self.ready and not self.dead:
+            message = self.receive(timeout=0)
+            if message is not None and message.get("ready"):
+                self.ready = True
+                self.preloaded = message.get("preloaded", [])
+        return self.ready and not self.dead
+
+    def launch(self, request, fds):
+        """发送运行请求并返回子进程 PID，失败时返回 None"""
+        data = (json.dumps(request) + "\n").encode("utf-8")
+        try:
+            self.sock.sendmsg([data], [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array("i", fds))])
+        except OSError:
+            self.dead = True
+            return None
+        message = self.receive(timeout=LAUNCH_TIMEOUT)
+        if not message or "pid" not in message:
+            self.dead = True
+            return None
+        return message["pid"]
+
+    def close(self):
+        self.dead = True
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+        # 关闭套接字后工作进程会自行退出
+        try:
+            self.process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        except Exception:
+            pass
+
+
+class WarmProcess:
+    """由预热工作进程 fork 出的脚本进程，接口与 subprocess.Popen 相同（常用部分）"""
+
+    def __init__(self, pool, worker, pid, args, stdin=None, stdout=None, stderr=None):
+        self.pool = pool
+        self.worker = worker
+        self.pid = pid
+        self.pgid = pid  # 脚本进程启动后调用 setsid
+        self.args = args
+        self.stdin = stdin
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode = None
+        self.rusage = None
+        self.warm = True
+
+    def _handle(self, message):
+        if message is None:
+            return
+        if message.get("eof"):
+            # 工作进程意外退出，无法得知子进程的退出码
+            self.returncode = -1
+        elif "exit" in message:
+            self.returncode = message["exit"]
+            self.rusage = message.get("rusage")
+        else:
+            return
+        self.pool.release(self.worker)
+
+    def poll(self):
+        if self.returncode is None and self.worker._lock.acquire(blocking=False):
+            try:
+                if self.returncode is None:
+                    self._handle(self.worker.receive(timeout=0))
+            finally:
+                self.worker._lock.release()
+        return self.returncode
+
+    def wait(self, timeout=None):
+        with self.worker._lock:
+            if self.returncode is None:
+                message = self.worker.receive(timeout=timeout)
+                if message is None:
+                    raise subprocess.TimeoutExpired(self.args, timeout)
+                self._handle(message)
+        return self.returncode
+
+    def send_signal(self, sig):
+        if self.returncode is None:
+            try:
+                os.kill(self.pid, sig)
+            except ProcessLookupError:
+                pass
+
+    def terminate(self):
+        import signal
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self):
+        import signal
+        self.send_signal(signal.SIGKILL)
+
+
+class WarmPool:
+    """按 Python 环境维护的预热解释器池
+
+    每个环境最多 size 个工作进程，工作进程启动时预先导入常用模块。
+    运行脚本时从空闲且已就绪的工作进程 fork 子进程；没有可用的工作进程时
+    返回 None，由调用方回退为冷启动，同时在后台补充工作进程。
+    """
+
+    def __init__(self, size=2, preload=None):
+        self.size = max(1, int(size or 1))
+        self.preload = list(preload if preload is not None else DEFAULT_PRELOAD)
+        self._workers = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _key(self, python_path):
+        return os.path.normcase(os.path.abspath(python_path))
+
+    def warm(self, python_path):
+        """为环境补足工作进程（不等待其就绪）"""
+        with self._lock:
+            self._fill(python_path)
+
+    def _fill(self, python_path):
+        if self._closed:
+            return
+        workers = self._workers.setdefault(self._key(python_path), [])
+        workers[:] = [w for w in workers if not w.dead]
+        while len(workers) < self.size:
+            try:
+                workers.append(WarmWorker(python_path, self.preload))
+            except OSError:
+                break
+
+    def acquire(self, python_path):
+        """取得一个空闲且已就绪的工作进程，没有时返回 None"""
+        with self._lock:
+            self._fill(python_path)
+            for worker in self._workers.get(self._key(python_path), []):
+                if not worker.busy and worker.check_ready():
+                    worker.busy = True
+                    return worker
+        return None
+
+    def release(self, worker):
+        with self._lock:
+            worker.busy = False
+            if worker.dead or self._closed:
+                worker.close()
+                self._fill(worker.python_path)
+
+    def launch(self, python_path, script, argv=(), cwd=None, env=None,
+               show_output=True, interactive=False):
+        """在预热的工作进程中运行脚本，返回 WarmProcess；不可用时返回 None"""
+        if not is_supported():
+            return None
+        worker = self.acquire(python_path)
+        if worker is None:
+            return None
+
+        child_fds, local = [], {}
+        try:
+            if interactive:
+                read_fd, write_fd = os.pipe()
+                child_fds.append(read_fd)
+                local["stdin"] = open(write_fd, 'wb', buffering=0)
+            else:
+                child_fds.append(os.open(os.devnull, os.O_RDONLY))
+            for name in ("stdout", "stderr"):
+                if show_output:
+                    read_fd, write_fd = os.pipe()
+                    child_fds.append(write_fd)
+                    local[name] = open(read_fd, 'rb', buffering=0)
+                else:
+                    child_fds.append(os.open(os.devnull, os.O_WRONLY))
+
+            request = {
+                "script": script,
+                "argv": list(argv),
+                "cwd": cwd or os.path.dirname(os.path.abspath(script)),
+                "env": dict(os.environ if env is None else env)
+            }
+            pid = worker.launch(request, child_fds)
+        except BaseException:
+            for stream in local.values():
+                stream.close()
+            self.release(worker)
+            raise
+        finally:
+            # 子进程端的描述符已传给工作进程，本进程不再持有
+            for fd in child_fds:
+                os.close(fd)
+
+        if pid is None:
+            for stream in local.values():
+                stream.close()
+            self.release(worker)
+            return None
+        return WarmProcess(self, worker, pid, [python_path, script] + list(argv), **local)
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+            workers = [w for ws in self._workers.values() for w in ws]
+            self._workers.clear()
+        for worker in workers:
+            if not worker.busy:
+                worker.close()
+            else:
+                # 正在运行脚本的工作进程在脚本结束后读到 EOF 自行退出
+                try:
+                    worker.sock.shutdown(socket.SHUT_WR)
+                except OSError:
+                    pass
+
+
+_default_pool = None
+_default_lock = threading.Lock()
+
+
+def default_pool(settings=None):
+    """全局共享的预热池（按设置中的大小和预加载模块创建）"""
+    global _default_pool
+    with _default_lock:
+        if _default_pool is None:
+            settings = settings or {}
+            _default_pool = WarmPool(size=settings.get("warm_pool_size", 2),
+                                     preload=settings.get("warm_pool_preload") or None)
+        return _default_pool
+
+
+def shutdown_default_pool():
+    with _default_lock:
+        if _default_pool is not None:
+            _default_pool.shutdown()
@@ -0,0 +1,163 @@
+"""预热解释器工作进程（在目标 Python 环境中运行，只依赖标准库）
+
+启动后先导入常用模块，然后在与管理器之间的 Unix 套接字上等待请求。
+每个请求附带子进程的 stdin/stdout/stderr 文件描述符（SCM_RIGHTS），
+工作进程 fork 出子进程，由子进程用 runpy 执行脚本；工作进程本身从不
+运行用户代码，可以反复使用。
+
+消息为以换行结尾的 JSON：
+    管理器 -> 工作进程  {"script", "argv", "cwd", "env"}（附带 3 个描述符）
+    工作进程 -> 管理器  {"ready": true, "preloaded": [...]}
+                        {"pid": 子进程 PID}
+                        {"exit": 退出码, "rusage": {...}}
+"""
+import array
+import importlib
+import json
+import os
+import signal
+import socket
+import sys
+
+
+def _send(sock, message):
+    sock.sendall((json.dumps(message) + "\n").encode("utf-8"))
+
+
+def _recv_request(sock, buffer):
+    """读取一个请求及其附带的描述符，连接关闭时返回 (None, [])"""
+    fds = []
+    while b"\n" not in buffer:
+        fd_array = array.array("i")
+        data, ancdata, _flags, _addr = sock.recvmsg(65536, socket.CMSG_SPACE(16 * fd_array.itemsize))
+        for level, kind, payload in ancdata:
+            if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+                fd_array.frombytes(payload[:len(payload) - (len(payload) % fd_array.itemsize)])
+        fds.extend(fd_array)
+        if not data:
+            return None, fds
+        buffer.extend(data)
+    line, _, rest = bytes(buffer).partition(b"\n")
+    buffer[:] = rest
+    return json.loads(line.decode("utf-8")), fds
+
+
+def _run_child(request, fds):
+    """在子进程中执行脚本（不返回）"""
+    code = 1
+    try:
+        # 与冷启动一致：脚本是新会话（进程组）的组长，可以整组结束
+        os.setsid()
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        for target, fd in enumerate(fds[:3]):
+            os.dup2(fd, target)
+        for fd in fds:
+            if fd > 2:
+                os.close(fd)
+
+        os.environ.clear()
+        os.environ.update(request.get("env") or {})
+        cwd = request.get("cwd")
+        if cwd:
+            os.chdir(cwd)
+        script = os.path.abspath(request["script"])
+        sys.argv = [script] + list(request.get("argv") or [])
+        # 与 python script.py 一致：sys.path[0] 为脚本所在目录
+        sys.path.insert(0, os.path.dirname(script))
+
+        import runpy
+        try:
+            runpy.run_path(script, run_name="__main__")
+            code = 0
+        except SystemExit as e:
+            if e.code is None:
+                code = 0
+            elif isinstance(e.code, int):
+                code = e.code
+            else:
+                sys.stderr.write(f"{e.code}\n")
+                code = 1
+        except BaseException as e:
+            # 与直接运行脚本一致：回溯从脚本本身的帧开始
+            import traceback
+            tb = e.__traceback__
+            while tb is not None and tb.tb_frame.f_code.co_filename != script:
+                tb = tb.tb_next
+            traceback.print_exception(type(e), e, tb or e.__traceback__)
+            code = 1
+        try:
+            import atexit
+            atexit._run_exitfuncs()
+        except Exception:
+            pass
+    finally:
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except Exception:
+                pass
+        os._exit(code & 0xFF)
+
+
+def _exit_code(status):
+    # 与 subprocess 的 returncode 一致：被信号终止时为负的信号值
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def serve(sock):
+    buffer = bytearray()
+    while True:
+        request, fds = _recv_request(sock, buffer)
+        if request is None:
+            for fd in fds:
+                os.close(fd)
+            return
+        for stream in (sys.stdout, sys.stderr):
+            stream.flush()
+        pid = os.fork()
+        if pid == 0:
+            sock.close()
+            _run_child(request, fds)
+        for fd in fds:
+            os.close(fd)
+        _send(sock, {"pid": pid})
+        _, status, usage = os.wait4(pid, 0)
+        _send(sock, {
+            "exit": _exit_code(status),
+            "rusage": {
+                "utime": usage.ru_utime,
+                "stime": usage.ru_stime,
+                "maxrss": usage.ru_maxrss
+            }
+        })
+
+
+def main():
+    fd = int(sys.argv[1])
+    preload = [name for name in (sys.argv[2] if len(sys.argv) > 2 else "").split(",") if name]
+    sock = socket.socket(fileno=fd)
+    # 不让本项目的 src 目录遮蔽目标环境中的同名模块
+    if sys.path and os.path.abspath(sys.path[0] or ".") == os.path.dirname(os.path.abspath(__file__)):
+        sys.path.pop(0)
+    # 工作进程忽略 Ctrl+C，由管理器负责终止
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    loaded = []
+    for name in preload:
+        try:
+            importlib.import_module(name)
+            loaded.append(name)
+        except Exception:
+            pass
+    _send(sock, {"ready": True, "preloaded": loaded})
+    try:
+        serve(sock)
+    except (OSError, ValueError):
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# 与 benchmarks 一致：测试直接导入项目根目录下的 src 包
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
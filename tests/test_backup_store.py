@@ -0,0 +1,27 @@
+import os
+
+from src.backup_store import BackupStore
+
+
+def test_migrate_legacy_same_timestamp_gets_unique_ids(tmp_path):
+    store = BackupStore(tmp_path, retention={"keep_last": 10000, "max_bytes": None})
+    timestamp = 1700000000
+    # 内容在两个版本之间来回切换，且修改时间相同：哈希前缀相同，只能靠序号区分
+    for i in range(200):
+        path = tmp_path / f"config_backup_{i:04d}.yaml"
+        path.write_text(f"version: {i % 2}\n", encoding="utf-8")
+        os.utime(path, (timestamp, timestamp))
+
+    assert store.migrate_legacy() == 200
+    ids = [s["id"] for s in store.list_snapshots()]
+    assert len(ids) == len(set(ids))
+    assert not list(tmp_path.glob("config_backup_*.yaml"))
+
+
+def test_add_after_migration_does_not_reuse_ids(tmp_path):
+    store = BackupStore(tmp_path, retention={"keep_last": 10000, "max_bytes": None})
+    store.add(b"a", timestamp=1700000000)
+    store.add(b"b", timestamp=1700000000)
+    store.add(b"a", timestamp=1700000000)
+    ids = [s["id"] for s in store.list_snapshots()]
+    assert len(ids) == 3 and len(set(ids)) == 3
@@ -0,0 +1,36 @@
+import os
+import stat
+
+import pytest
+
+from src.config_manager import ConfigManager
+
+pytestmark = pytest.mark.skipif(os.name != "posix", reason="文件权限位只在 POSIX 上有意义")
+
+
+def _umask():
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+def test_save_keeps_existing_mode(tmp_path):
+    path = tmp_path / "config.yaml"
+    path.write_text("settings:\n  backup_enabled: false\n", encoding="utf-8")
+    os.chmod(path, 0o644)
+    manager = ConfigManager(save_delay=0, config_path=path)
+    manager.config["settings"]["marker"] = 1
+    manager.mark_dirty()
+    manager.flush()
+
+    assert "marker" in path.read_text(encoding="utf-8")
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+
+
+def test_new_config_follows_umask(tmp_path):
+    path = tmp_path / "config.yaml"
+    manager = ConfigManager(save_delay=0, config_path=path)
+    manager.flush()
+
+    assert path.exists()
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o666 & ~_umask()
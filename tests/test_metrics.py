@@ -0,0 +1,27 @@
+import time
+
+from src.metrics import MetricsStore
+
+
+def test_record_prunes_samples_older_than_retention(tmp_path):
+    store = MetricsStore(tmp_path / "metrics.sqlite", retention_days=1)
+    now = time.time()
+    store.record("old", now - 3 * 86400, 1.0, 0)
+    store.record("new", now, 1.0, 0)
+
+    assert [s["script"] for s in store.samples(limit=None)] == ["new"]
+    store.close()
+
+
+def test_stats_uses_only_the_latest_window(tmp_path):
+    store = MetricsStore(tmp_path / "metrics.sqlite")
+    for i in range(10):
+        # 较早的 5 次失败且耗时长，最近 5 次成功
+        store.record("s", 1000 + i, 10.0 if i < 5 else 1.0, 1 if i < 5 else 0)
+
+    (stat,) = store.stats(window=5)
+    assert stat["runs"] == 5
+    assert stat["failure_rate"] == 0.0
+    assert stat["p95"] == 1.0
+    assert stat["last_run"] == 1009
+    store.close()
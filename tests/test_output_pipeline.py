@@ -0,0 +1,32 @@
+from src import output_pipeline
+from src.output_pipeline import OutputBuffer
+
+
+def test_line_longer_than_budget_is_not_split():
+    buffer = OutputBuffer()
+    long_line = "x" * 5000 + "\n"
+    buffer.append("stdout", "short\n" + long_line + "tail\n")
+
+    # 第一帧：长行放不下，留到下一帧
+    assert buffer.drain(100) == [("stdout", "short\n")]
+    # 第二帧：长行是本帧第一行，整行取出
+    assert buffer.drain(100) == [("stdout", long_line)]
+    assert buffer.drain(100) == [("stdout", "tail\n")]
+    assert not buffer
+
+
+def test_line_over_hard_cap_is_cut(monkeypatch):
+    monkeypatch.setattr(output_pipeline, "MAX_LINE_CHARS", 1000)
+    buffer = OutputBuffer()
+    buffer.append("stdout", "y" * 2500 + "\n")
+
+    chunks = [text for _, text in buffer.drain(100)]
+    assert chunks == ["y" * 1000]
+    assert buffer.pending_chars == 1501
+
+
+def test_unterminated_line_is_drained_whole():
+    buffer = OutputBuffer()
+    buffer.append("stderr", "z" * 300)
+    assert buffer.drain(100) == [("stderr", "z" * 300)]
+    assert buffer.drain(100) == []
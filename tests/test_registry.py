@@ -0,0 +1,46 @@
+from src.registry import ScriptRegistry
+
+
+def _config():
+    entry = {"name": "dup", "path": "/tmp/dup.py", "script_type": "python"}
+    return {"scripts": {"工具": [dict(entry), dict(entry)], "其他": []}}
+
+
+def test_remove_identical_entry_removes_that_object():
+    config = _config()
+    registry = ScriptRegistry(config)
+    first, second = config["scripts"]["工具"]
+    registry.remove(registry.id_of(second))
+
+    assert len(config["scripts"]["工具"]) == 1
+    assert config["scripts"]["工具"][0] is first
+    assert registry.id_of(first) is not None
+
+
+def test_move_identical_entry_keeps_index_in_sync():
+    config = _config()
+    registry = ScriptRegistry(config)
+    first, second = config["scripts"]["工具"]
+    sid = registry.id_of(second)
+    registry.update(sid, category="其他")
+
+    assert config["scripts"]["工具"] == [first] and config["scripts"]["工具"][0] is first
+    assert config["scripts"]["其他"][0] is second
+    # 索引中的每个条目都仍在配置里
+    for sid, script in registry.items():
+        category = registry.category_of(sid)
+        assert any(s is script for s in config["scripts"][category])
+
+
+def test_update_removes_fields_and_notifies():
+    config = {"scripts": {"其他": [{"name": "a", "path": "/tmp/a.py", "after": ["b"], "timeout": 5}]}}
+    registry = ScriptRegistry(config)
+    events = []
+    registry.add_listener(lambda action, sid: events.append((action, sid)))
+    sid = registry.id_of(config["scripts"]["其他"][0])
+    registry.update(sid, {"description": "x"}, removed=["after", "timeout"])
+
+    script = config["scripts"]["其他"][0]
+    assert "after" not in script and "timeout" not in script
+    assert script["description"] == "x"
+    assert events == [("update", sid)]